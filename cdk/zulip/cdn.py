@@ -0,0 +1,283 @@
+from aws_cdk import (
+    aws_cloudfront,
+    aws_iam,
+    Aws,
+    CfnCondition,
+    CfnOutput,
+    CfnParameter,
+    Fn,
+    Token
+)
+from constructs import Construct
+
+# managed policies, see https://docs.aws.amazon.com/AmazonCloudFront/latest/DeveloperGuide/using-managed-cache-policies.html
+CACHING_DISABLED_POLICY_ID = "4135ea2d-6df8-44a3-9df3-4b5a84be39ad"
+CACHING_OPTIMIZED_POLICY_ID = "658327ea-f89d-4fab-a63d-7e88639e58f6"
+ALL_VIEWER_ORIGIN_REQUEST_POLICY_ID = "216adef6-5c7f-47e4-b989-5492eafa07d3"
+CLOUDFRONT_HOSTED_ZONE_ID = "Z2FDTNDATAQYW2"
+
+# must match AVATARS_PATH in packer/zulip_bootstrap/render.py
+AVATARS_PATH = "user_avatars"
+
+STRIP_AVATARS_PREFIX_FUNCTION = f"""\
+function handler(event) {{
+  var request = event.request;
+  request.uri = request.uri.replace(/^\\/{AVATARS_PATH}\\//, '/');
+  return request;
+}}
+"""
+
+
+class Cdn(Construct):
+    """Optional CloudFront distribution in front of the ALB and the avatars bucket.
+
+    `/static/*` is cached at the edge, `/user_avatars/*` is served from the
+    avatars bucket through origin access control, and everything else
+    (including `/api/*` and `/json/*`) passes through uncached. The viewer
+    Host header is forwarded to the ALB so each realm subdomain keeps working
+    and the ALB certificate validates.
+    """
+
+    def __init__(
+            self,
+            scope: Construct,
+            id: str,
+            alb,
+            avatars_bucket_name: str,
+            hostname: str
+    ):
+        super().__init__(scope, id)
+
+        self.cdn_enable_param = CfnParameter(
+            self,
+            "CdnEnable",
+            allowed_values=[ "true", "false" ],
+            default="false",
+            description="Required: Serve Zulip through a CloudFront distribution that caches static assets and avatars at the edge. The ALB ingress CIDR must allow CloudFront."
+        )
+        self.cdn_enable_param.override_logical_id(f"{id}Enable")
+        self.cdn_certificate_arn_param = CfnParameter(
+            self,
+            "CdnCertificateArn",
+            default="",
+            description="Required (if CDN is enabled): ARN of an ACM certificate in us-east-1 covering the hostname and its realm subdomains (*.hostname)."
+        )
+        self.cdn_certificate_arn_param.override_logical_id(f"{id}CertificateArn")
+
+        self.cdn_enabled_condition = CfnCondition(
+            self,
+            "CdnEnabledCondition",
+            expression=Fn.condition_equals(self.cdn_enable_param.value, "true")
+        )
+        self.cdn_enabled_condition.override_logical_id(f"{id}EnabledCondition")
+
+        static_cache_policy = aws_cloudfront.CfnCachePolicy(
+            self,
+            "CdnStaticCachePolicy",
+            cache_policy_config=aws_cloudfront.CfnCachePolicy.CachePolicyConfigProperty(
+                default_ttl=86400,
+                max_ttl=31536000,
+                min_ttl=0,
+                name=Fn.join("-", [Aws.STACK_NAME, "static"]),
+                parameters_in_cache_key_and_forwarded_to_origin=aws_cloudfront.CfnCachePolicy.ParametersInCacheKeyAndForwardedToOriginProperty(
+                    cookies_config=aws_cloudfront.CfnCachePolicy.CookiesConfigProperty(
+                        cookie_behavior="none"
+                    ),
+                    enable_accept_encoding_brotli=True,
+                    enable_accept_encoding_gzip=True,
+                    # forwarded so the ALB certificate validates against the viewer hostname
+                    headers_config=aws_cloudfront.CfnCachePolicy.HeadersConfigProperty(
+                        header_behavior="whitelist",
+                        headers=["Host"]
+                    ),
+                    query_strings_config=aws_cloudfront.CfnCachePolicy.QueryStringsConfigProperty(
+                        query_string_behavior="all"
+                    )
+                )
+            )
+        )
+        static_cache_policy.override_logical_id(f"{id}StaticCachePolicy")
+        static_cache_policy.cfn_options.condition = self.cdn_enabled_condition
+
+        origin_access_control = aws_cloudfront.CfnOriginAccessControl(
+            self,
+            "CdnOriginAccessControl",
+            origin_access_control_config=aws_cloudfront.CfnOriginAccessControl.OriginAccessControlConfigProperty(
+                name=Fn.join("-", [Aws.STACK_NAME, "avatars"]),
+                origin_access_control_origin_type="s3",
+                signing_behavior="always",
+                signing_protocol="sigv4"
+            )
+        )
+        origin_access_control.override_logical_id(f"{id}OriginAccessControl")
+        origin_access_control.cfn_options.condition = self.cdn_enabled_condition
+
+        strip_avatars_prefix = aws_cloudfront.CfnFunction(
+            self,
+            "CdnStripAvatarsPrefixFunction",
+            auto_publish=True,
+            function_code=STRIP_AVATARS_PREFIX_FUNCTION,
+            function_config=aws_cloudfront.CfnFunction.FunctionConfigProperty(
+                comment="Map /user_avatars/<key> to the avatars bucket key",
+                runtime="cloudfront-js-2.0"
+            ),
+            name=Fn.join("-", [Aws.STACK_NAME, "avatars-prefix"])
+        )
+        strip_avatars_prefix.override_logical_id(f"{id}StripAvatarsPrefixFunction")
+        strip_avatars_prefix.cfn_options.condition = self.cdn_enabled_condition
+
+        def pass_through(path_pattern: str):
+            return aws_cloudfront.CfnDistribution.CacheBehaviorProperty(
+                allowed_methods=["GET", "HEAD", "OPTIONS", "PUT", "PATCH", "POST", "DELETE"],
+                cache_policy_id=CACHING_DISABLED_POLICY_ID,
+                compress=True,
+                origin_request_policy_id=ALL_VIEWER_ORIGIN_REQUEST_POLICY_ID,
+                path_pattern=path_pattern,
+                target_origin_id="alb",
+                viewer_protocol_policy="redirect-to-https"
+            )
+
+        self.distribution = aws_cloudfront.CfnDistribution(
+            self,
+            "CdnDistribution",
+            distribution_config=aws_cloudfront.CfnDistribution.DistributionConfigProperty(
+                aliases=[hostname, f"*.{hostname}"],
+                cache_behaviors=[
+                    aws_cloudfront.CfnDistribution.CacheBehaviorProperty(
+                        allowed_methods=["GET", "HEAD"],
+                        cache_policy_id=static_cache_policy.ref,
+                        compress=True,
+                        path_pattern="/static/*",
+                        target_origin_id="alb",
+                        viewer_protocol_policy="redirect-to-https"
+                    ),
+                    aws_cloudfront.CfnDistribution.CacheBehaviorProperty(
+                        allowed_methods=["GET", "HEAD"],
+                        cache_policy_id=CACHING_OPTIMIZED_POLICY_ID,
+                        compress=True,
+                        function_associations=[
+                            aws_cloudfront.CfnDistribution.FunctionAssociationProperty(
+                                event_type="viewer-request",
+                                function_arn=strip_avatars_prefix.attr_function_arn
+                            )
+                        ],
+                        path_pattern=f"/{AVATARS_PATH}/*",
+                        target_origin_id="avatars",
+                        viewer_protocol_policy="redirect-to-https"
+                    ),
+                    pass_through("/api/*"),
+                    pass_through("/json/*")
+                ],
+                comment=hostname,
+                default_cache_behavior=aws_cloudfront.CfnDistribution.DefaultCacheBehaviorProperty(
+                    allowed_methods=["GET", "HEAD", "OPTIONS", "PUT", "PATCH", "POST", "DELETE"],
+                    cache_policy_id=CACHING_DISABLED_POLICY_ID,
+                    compress=True,
+                    origin_request_policy_id=ALL_VIEWER_ORIGIN_REQUEST_POLICY_ID,
+                    target_origin_id="alb",
+                    viewer_protocol_policy="redirect-to-https"
+                ),
+                enabled=True,
+                http_version="http2and3",
+                origins=[
+                    aws_cloudfront.CfnDistribution.OriginProperty(
+                        custom_origin_config=aws_cloudfront.CfnDistribution.CustomOriginConfigProperty(
+                            origin_protocol_policy="https-only",
+                            origin_read_timeout=60,
+                            origin_ssl_protocols=["TLSv1.2"]
+                        ),
+                        domain_name=alb.alb.attr_dns_name,
+                        id="alb"
+                    ),
+                    aws_cloudfront.CfnDistribution.OriginProperty(
+                        domain_name=f"{avatars_bucket_name}.s3.{Aws.REGION}.amazonaws.com",
+                        id="avatars",
+                        origin_access_control_id=origin_access_control.attr_id,
+                        s3_origin_config=aws_cloudfront.CfnDistribution.S3OriginConfigProperty(
+                            origin_access_identity=""
+                        )
+                    )
+                ],
+                price_class="PriceClass_All",
+                viewer_certificate=aws_cloudfront.CfnDistribution.ViewerCertificateProperty(
+                    acm_certificate_arn=self.cdn_certificate_arn_param.value_as_string,
+                    minimum_protocol_version="TLSv1.2_2021",
+                    ssl_support_method="sni-only"
+                )
+            )
+        )
+        self.distribution.override_logical_id(f"{id}Distribution")
+        self.distribution.cfn_options.condition = self.cdn_enabled_condition
+
+        distribution_output = CfnOutput(
+            self,
+            "CdnDistributionDomainName",
+            description="CloudFront distribution serving Zulip",
+            value=self.distribution.attr_domain_name
+        )
+        distribution_output.override_logical_id(f"{id}DistributionDomainName")
+        distribution_output.condition = self.cdn_enabled_condition
+
+    def avatars_bucket_policy_document(self, avatars_bucket_name: str, public_document):
+        """Only CloudFront may read avatars when the CDN is on; otherwise keep the public policy."""
+        cdn_document = aws_iam.PolicyDocument(
+            statements=[
+                aws_iam.PolicyStatement(
+                    actions=["s3:GetObject"],
+                    resources=[f"arn:aws:s3:::{avatars_bucket_name}/*"],
+                    principals=[aws_iam.ServicePrincipal("cloudfront.amazonaws.com")],
+                    conditions={
+                        "StringEquals": {
+                            "AWS:SourceArn": f"arn:{Aws.PARTITION}:cloudfront::{Aws.ACCOUNT_ID}:distribution/{self.distribution.ref}"
+                        }
+                    }
+                )
+            ]
+        )
+        return Fn.condition_if(
+            self.cdn_enabled_condition.logical_id,
+            cdn_document,
+            public_document
+        )
+
+    def alias_target(self, otherwise_dns_name: str, otherwise_hosted_zone_id: str):
+        """Route 53 alias target: the distribution when the CDN is on, else the given target."""
+        return {
+            "dns_name": Token.as_string(
+                Fn.condition_if(
+                    self.cdn_enabled_condition.logical_id,
+                    self.distribution.attr_domain_name,
+                    otherwise_dns_name
+                )
+            ),
+            "hosted_zone_id": Token.as_string(
+                Fn.condition_if(
+                    self.cdn_enabled_condition.logical_id,
+                    CLOUDFRONT_HOSTED_ZONE_ID,
+                    otherwise_hosted_zone_id
+                )
+            )
+        }
+
+    def metadata_parameter_group(self):
+        return [
+            {
+                "Label": {
+                    "default": "CDN Configuration"
+                },
+                "Parameters": [
+                    self.cdn_enable_param.logical_id,
+                    self.cdn_certificate_arn_param.logical_id
+                ]
+            }
+        ]
+
+    def metadata_parameter_labels(self):
+        return {
+            self.cdn_enable_param.logical_id: {
+                "default": "Enable CloudFront CDN"
+            },
+            self.cdn_certificate_arn_param.logical_id: {
+                "default": "CDN Certificate ARN (us-east-1)"
+            }
+        }
@@ -0,0 +1,26 @@
+"""
+Lookups of the L1 resources inside oe_patterns_cdk_common constructs.
+
+The common Asg and AuroraPostgresql constructs do not expose their instance
+role, launch template, parameters, DB cluster or DB instances. Constructs in
+this package that extend them find those by type here.
+"""
+
+from typing import List, Type, TypeVar
+
+from constructs import Construct
+
+T = TypeVar("T")
+
+
+def find_all_cfn(construct: Construct, cfn_type: Type[T]) -> List[T]:
+    """Every `cfn_type` node under `construct`, in construct tree order."""
+    return [child for child in construct.node.find_all() if isinstance(child, cfn_type)]
+
+
+def find_cfn(construct: Construct, cfn_type: Type[T]) -> T:
+    """The first `cfn_type` node under `construct`; fails the synth if there is none."""
+    found = find_all_cfn(construct, cfn_type)
+    if not found:
+        raise LookupError(f"No {cfn_type.__name__} under {construct.node.path}")
+    return found[0]
@@ -0,0 +1,145 @@
+import re
+
+from aws_cdk import (
+    aws_rds,
+    CfnMapping,
+    CfnParameter,
+    Token
+)
+from constructs import Construct
+
+from zulip.cfn_lookup import find_all_cfn, find_cfn
+
+DEFAULT_FAMILY = "aurora-postgresql16"
+
+# values per DbSizeProfile; memory settings are in kB, durations in ms
+SIZE_PROFILES = {
+    "small": {
+        "WorkMem": "8192",
+        "MaintenanceWorkMem": "131072",
+        "LogMinDurationStatement": "1000",
+        "AutovacuumNaptime": "30",
+        "AutovacuumVacuumCostLimit": "400",
+        "AutovacuumMaxWorkers": "3"
+    },
+    "medium": {
+        "WorkMem": "16384",
+        "MaintenanceWorkMem": "262144",
+        "LogMinDurationStatement": "1000",
+        "AutovacuumNaptime": "15",
+        "AutovacuumVacuumCostLimit": "800",
+        "AutovacuumMaxWorkers": "4"
+    },
+    "large": {
+        "WorkMem": "32768",
+        "MaintenanceWorkMem": "524288",
+        "LogMinDurationStatement": "500",
+        "AutovacuumNaptime": "10",
+        "AutovacuumVacuumCostLimit": "2000",
+        "AutovacuumMaxWorkers": "6"
+    }
+}
+
+
+def parameter_group_family(engine_version) -> str:
+    """aurora-postgresqlNN for the cluster's engine version, if it is known at synth time."""
+    if isinstance(engine_version, str) and not Token.is_unresolved(engine_version):
+        match = re.match(r"^(\d+)", engine_version)
+        if match:
+            return f"aurora-postgresql{match.group(1)}"
+    return DEFAULT_FAMILY
+
+
+class DbParameterGroups(Construct):
+    """Cluster and instance parameter groups tuned for Zulip, sized by DbSizeProfile.
+
+    Per-table autovacuum settings for zerver_usermessage cannot be set in a
+    parameter group; `zulip-bootstrap tune-tables` applies them after
+    initialize-database.
+    """
+
+    def __init__(
+            self,
+            scope: Construct,
+            id: str,
+            db
+    ):
+        super().__init__(scope, id)
+
+        self.db_size_profile_param = CfnParameter(
+            self,
+            "DbSizeProfile",
+            allowed_values=list(SIZE_PROFILES),
+            default="small",
+            description="Required: Size profile for the Zulip-tuned Aurora parameter groups (work_mem, autovacuum, slow query logging). Pick the profile matching the DB instance class: small for up to 8 GiB of memory, medium for up to 32 GiB, large above that."
+        )
+        self.db_size_profile_param.override_logical_id("DbSizeProfile")
+
+        profile_map = CfnMapping(
+            self,
+            "DbSizeProfileMap",
+            mapping=SIZE_PROFILES
+        )
+        profile_map.override_logical_id("DbSizeProfileMap")
+
+        def value(key: str) -> str:
+            return profile_map.find_in_map(self.db_size_profile_param.value_as_string, key)
+
+        db_cluster = find_cfn(db, aws_rds.CfnDBCluster)
+        db_instances = find_all_cfn(db, aws_rds.CfnDBInstance)
+        family = parameter_group_family(db_cluster.engine_version)
+
+        self.cluster_parameter_group = aws_rds.CfnDBClusterParameterGroup(
+            self,
+            "DbClusterParameterGroup",
+            description="Zulip Aurora PostgreSQL cluster parameters",
+            family=family,
+            parameters={
+                "shared_preload_libraries": "pg_stat_statements",
+                "pg_stat_statements.track": "top",
+                "pg_stat_statements.max": "10000",
+                "random_page_cost": "1.1",
+                "autovacuum_naptime": value("AutovacuumNaptime"),
+                "autovacuum_vacuum_cost_limit": value("AutovacuumVacuumCostLimit"),
+                "autovacuum_max_workers": value("AutovacuumMaxWorkers"),
+                "autovacuum_vacuum_scale_factor": "0.05",
+                "autovacuum_analyze_scale_factor": "0.02"
+            }
+        )
+        self.cluster_parameter_group.override_logical_id(f"{id}Cluster")
+        db_cluster.add_property_override("DBClusterParameterGroupName", self.cluster_parameter_group.ref)
+
+        self.instance_parameter_group = aws_rds.CfnDBParameterGroup(
+            self,
+            "DbInstanceParameterGroup",
+            description="Zulip Aurora PostgreSQL instance parameters",
+            family=family,
+            parameters={
+                "work_mem": value("WorkMem"),
+                "maintenance_work_mem": value("MaintenanceWorkMem"),
+                "random_page_cost": "1.1",
+                "log_min_duration_statement": value("LogMinDurationStatement")
+            }
+        )
+        self.instance_parameter_group.override_logical_id(f"{id}Instance")
+        for db_instance in db_instances:
+            db_instance.add_property_override("DBParameterGroupName", self.instance_parameter_group.ref)
+
+    def metadata_parameter_group(self):
+        return [
+            {
+                "Label": {
+                    "default": "Database Tuning"
+                },
+                "Parameters": [
+                    self.db_size_profile_param.logical_id
+                ]
+            }
+        ]
+
+    def metadata_parameter_labels(self):
+        return {
+            self.db_size_profile_param.logical_id: {
+                "default": "DB size profile"
+            }
+        }
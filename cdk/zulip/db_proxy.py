@@ -0,0 +1,198 @@
+from aws_cdk import (
+    aws_ec2,
+    aws_iam,
+    aws_rds,
+    Aws,
+    CfnCondition,
+    CfnParameter,
+    Fn,
+    Token
+)
+from constructs import Construct
+
+from zulip.cfn_lookup import find_cfn
+
+POSTGRES_PORT = 5432
+
+
+class DbProxy(Construct):
+    """Optional RDS Proxy between the app tier and the Aurora cluster.
+
+    Every uwsgi worker, queue worker and Tornado process holds its own
+    Postgres connection; the proxy multiplexes them onto a bounded pool so the
+    app tier can grow without moving Aurora up an instance class just for
+    connection slots. Sessions that use server-side cursors or SET are pinned
+    by the proxy rather than broken, which a transaction-mode PgBouncer would
+    not do. Client and database connection counts are published by RDS Proxy
+    under AWS/RDS with the ProxyName dimension.
+    """
+
+    def __init__(
+            self,
+            scope: Construct,
+            id: str,
+            db,
+            db_secret,
+            vpc
+    ):
+        super().__init__(scope, id)
+
+        self.db_connection_mode_param = CfnParameter(
+            self,
+            "DbConnectionMode",
+            allowed_values=[ "direct", "proxy" ],
+            default="direct",
+            description="Required: Connect Zulip to the Aurora cluster 'direct'ly, or through an RDS Proxy connection pool ('proxy')."
+        )
+        self.db_connection_mode_param.override_logical_id("DbConnectionMode")
+        self.db_proxy_max_connections_percent_param = CfnParameter(
+            self,
+            "DbProxyMaxConnectionsPercent",
+            type="Number",
+            default=90,
+            min_value=1,
+            max_value=100,
+            description="Required (if DB connection mode is proxy): Maximum share of the cluster's max_connections the proxy may open."
+        )
+        self.db_proxy_max_connections_percent_param.override_logical_id(f"{id}MaxConnectionsPercent")
+
+        self.db_proxy_enabled_condition = CfnCondition(
+            self,
+            "DbProxyEnabledCondition",
+            expression=Fn.condition_equals(self.db_connection_mode_param.value, "proxy")
+        )
+        self.db_proxy_enabled_condition.override_logical_id(f"{id}EnabledCondition")
+
+        db_cluster = find_cfn(db, aws_rds.CfnDBCluster)
+
+        self.sg = aws_ec2.CfnSecurityGroup(
+            self,
+            "DbProxySg",
+            group_description=f"{id} security group",
+            vpc_id=vpc.id()
+        )
+        self.sg.override_logical_id(f"{id}Sg")
+        self.sg.cfn_options.condition = self.db_proxy_enabled_condition
+
+        db_ingress = aws_ec2.CfnSecurityGroupIngress(
+            self,
+            "DbProxyDbSgIngress",
+            from_port=POSTGRES_PORT,
+            group_id=Fn.select(0, db_cluster.vpc_security_group_ids),
+            ip_protocol="tcp",
+            source_security_group_id=self.sg.ref,
+            to_port=POSTGRES_PORT
+        )
+        db_ingress.override_logical_id(f"{id}DbSgIngress")
+        db_ingress.cfn_options.condition = self.db_proxy_enabled_condition
+
+        role = aws_iam.CfnRole(
+            self,
+            "DbProxyRole",
+            assume_role_policy_document=aws_iam.PolicyDocument(
+                statements=[
+                    aws_iam.PolicyStatement(
+                        effect=aws_iam.Effect.ALLOW,
+                        actions=["sts:AssumeRole"],
+                        principals=[aws_iam.ServicePrincipal("rds.amazonaws.com")]
+                    )
+                ]
+            ),
+            policies=[
+                aws_iam.CfnRole.PolicyProperty(
+                    policy_document=aws_iam.PolicyDocument(
+                        statements=[
+                            aws_iam.PolicyStatement(
+                                effect=aws_iam.Effect.ALLOW,
+                                actions=["secretsmanager:GetSecretValue"],
+                                resources=[db_secret.secret_arn()]
+                            )
+                        ]
+                    ),
+                    policy_name="AllowReadDbSecret"
+                )
+            ]
+        )
+        role.override_logical_id(f"{id}Role")
+        role.cfn_options.condition = self.db_proxy_enabled_condition
+
+        self.proxy = aws_rds.CfnDBProxy(
+            self,
+            "DbProxy",
+            auth=[
+                aws_rds.CfnDBProxy.AuthFormatProperty(
+                    auth_scheme="SECRETS",
+                    iam_auth="DISABLED",
+                    secret_arn=db_secret.secret_arn()
+                )
+            ],
+            db_proxy_name=Fn.join("-", [Aws.STACK_NAME, "db-proxy"]),
+            engine_family="POSTGRESQL",
+            idle_client_timeout=1800,
+            require_tls=True,
+            role_arn=role.attr_arn,
+            vpc_security_group_ids=[self.sg.ref],
+            vpc_subnet_ids=vpc.private_subnet_ids()
+        )
+        self.proxy.override_logical_id(id)
+        self.proxy.cfn_options.condition = self.db_proxy_enabled_condition
+
+        target_group = aws_rds.CfnDBProxyTargetGroup(
+            self,
+            "DbProxyTargetGroup",
+            connection_pool_configuration_info=aws_rds.CfnDBProxyTargetGroup.ConnectionPoolConfigurationInfoFormatProperty(
+                max_connections_percent=self.db_proxy_max_connections_percent_param.value_as_number,
+                max_idle_connections_percent=50
+            ),
+            db_cluster_identifiers=[db_cluster.ref],
+            db_proxy_name=self.proxy.ref,
+            target_group_name="default"
+        )
+        target_group.override_logical_id(f"{id}TargetGroup")
+        target_group.cfn_options.condition = self.db_proxy_enabled_condition
+
+    def add_ingress(self, source_sg) -> None:
+        ingress = aws_ec2.CfnSecurityGroupIngress(
+            self,
+            "DbProxySgIngress",
+            from_port=POSTGRES_PORT,
+            group_id=self.sg.ref,
+            ip_protocol="tcp",
+            source_security_group_id=source_sg.ref,
+            to_port=POSTGRES_PORT
+        )
+        ingress.override_logical_id(f"{self.node.id}SgIngress")
+        ingress.cfn_options.condition = self.db_proxy_enabled_condition
+
+    def endpoint(self) -> str:
+        """The proxy endpoint, or "" when connecting directly."""
+        return Token.as_string(
+            Fn.condition_if(
+                self.db_proxy_enabled_condition.logical_id,
+                self.proxy.attr_endpoint,
+                ""
+            )
+        )
+
+    def metadata_parameter_group(self):
+        return [
+            {
+                "Label": {
+                    "default": "Database Connection Pooling"
+                },
+                "Parameters": [
+                    self.db_connection_mode_param.logical_id,
+                    self.db_proxy_max_connections_percent_param.logical_id
+                ]
+            }
+        ]
+
+    def metadata_parameter_labels(self):
+        return {
+            self.db_connection_mode_param.logical_id: {
+                "default": "DB connection mode"
+            },
+            self.db_proxy_max_connections_percent_param.logical_id: {
+                "default": "DB Proxy max connections percent"
+            }
+        }
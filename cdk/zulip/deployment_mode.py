@@ -0,0 +1,96 @@
+from aws_cdk import (
+    CfnCondition,
+    CfnOutput,
+    CfnParameter,
+    CfnResource,
+    Fn,
+    Token
+)
+from constructs import Construct
+
+from zulip.cfn_lookup import find_all_cfn
+
+# must match LOCAL_HOST in packer/zulip_bootstrap/local_services.py
+LOCAL_HOST = "127.0.0.1"
+
+
+class DeploymentMode(Construct):
+    """Clustered or single-node topology for the broker and Redis.
+
+    'clustered' keeps Amazon MQ and ElastiCache Redis, which every app
+    instance shares. 'single-node' creates neither: the bootstrap agent adds
+    Zulip's own RabbitMQ and Redis puppet profiles to the instance, so queue
+    publishes and Redis calls stay on localhost without TLS or a cross-AZ
+    round trip. Only one app instance can run in that mode.
+    """
+
+    def __init__(
+            self,
+            scope: Construct,
+            id: str
+    ):
+        super().__init__(scope, id)
+
+        self.deployment_mode_param = CfnParameter(
+            self,
+            "DeploymentMode",
+            allowed_values=[ "clustered", "single-node" ],
+            default="clustered",
+            description="Required: 'clustered' uses Amazon MQ for RabbitMQ and ElastiCache for Redis, shared by all app instances. 'single-node' runs RabbitMQ and Redis on the one app instance instead, which is cheaper and faster for small installs but cannot scale out."
+        )
+        self.deployment_mode_param.override_logical_id("DeploymentMode")
+
+        self.clustered_condition = CfnCondition(
+            self,
+            "DeploymentModeClusteredCondition",
+            expression=Fn.condition_equals(self.deployment_mode_param.value, "clustered")
+        )
+        self.clustered_condition.override_logical_id(f"{id}ClusteredCondition")
+        self.single_node_condition = CfnCondition(
+            self,
+            "DeploymentModeSingleNodeCondition",
+            expression=Fn.condition_equals(self.deployment_mode_param.value, "single-node")
+        )
+        self.single_node_condition.override_logical_id(f"{id}SingleNodeCondition")
+
+    def clustered_only(self, *constructs) -> None:
+        """Create every resource and output under `constructs` only in clustered mode.
+
+        Call it after anything else has added resources to them (e.g. security
+        group ingress from the app tier). Resources elsewhere that reference
+        them need their own condition or `if_clustered`.
+        """
+        combined = {}
+
+        def clustered(existing):
+            if existing is None or existing is self.clustered_condition:
+                return self.clustered_condition
+            if existing.node.path not in combined:
+                combined[existing.node.path] = CfnCondition(
+                    self,
+                    f"{existing.node.id}Clustered",
+                    expression=Fn.condition_and(existing, self.clustered_condition)
+                )
+            return combined[existing.node.path]
+
+        for construct in constructs:
+            for child in find_all_cfn(construct, CfnResource):
+                child.cfn_options.condition = clustered(child.cfn_options.condition)
+            for output in find_all_cfn(construct, CfnOutput):
+                output.condition = clustered(output.condition)
+
+    def if_clustered(self, clustered_value: str, single_node_value: str) -> str:
+        return Token.as_string(
+            Fn.condition_if(
+                self.clustered_condition.logical_id,
+                clustered_value,
+                single_node_value
+            )
+        )
+
+    def metadata_parameter_labels(self):
+        return {
+            self.deployment_mode_param.logical_id: {
+                "default": "Deployment mode"
+            }
+        }
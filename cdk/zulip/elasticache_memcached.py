@@ -0,0 +1,164 @@
+from aws_cdk import (
+    aws_ec2,
+    aws_elasticache,
+    CfnCondition,
+    CfnParameter,
+    Fn,
+    Token
+)
+from constructs import Construct
+
+MEMCACHED_PORT = 11211
+
+
+class ElasticacheMemcached(Construct):
+    """Optional ElastiCache Memcached cluster shared by every app instance.
+
+    Without it each instance caches in its own local memcached, which serves
+    stale data as soon as the Auto Scaling group runs more than one instance.
+    ElastiCache Memcached has no SASL support, so only the app security group
+    may reach it.
+    """
+
+    def __init__(
+            self,
+            scope: Construct,
+            id: str,
+            vpc,
+            allowed_instance_types = [
+                "cache.t4g.micro",
+                "cache.t4g.small",
+                "cache.t4g.medium",
+                "cache.m7g.large",
+                "cache.m7g.xlarge",
+                "cache.r7g.large",
+                "cache.r7g.xlarge"
+            ],
+            default_instance_type = "cache.t4g.micro"
+    ):
+        super().__init__(scope, id)
+
+        self.memcached_enable_param = CfnParameter(
+            self,
+            "MemcachedEnable",
+            allowed_values=[ "true", "false" ],
+            default="false",
+            description="Required: Use a shared ElastiCache Memcached cluster instead of memcached on each instance. Enable this before running more than one app instance."
+        )
+        self.memcached_enable_param.override_logical_id(f"{id}Enable")
+        self.memcached_cache_node_type_param = CfnParameter(
+            self,
+            "MemcachedCacheNodeType",
+            allowed_values=allowed_instance_types,
+            default=default_instance_type,
+            description="Required: Instance type for the Memcached cache nodes."
+        )
+        self.memcached_cache_node_type_param.override_logical_id(f"{id}CacheNodeType")
+        self.memcached_num_cache_nodes_param = CfnParameter(
+            self,
+            "MemcachedNumCacheNodes",
+            type="Number",
+            default=1,
+            min_value=1,
+            max_value=20,
+            description="Required: Number of Memcached cache nodes. Zulip writes every key to all nodes, so more than 1 adds availability rather than capacity."
+        )
+        self.memcached_num_cache_nodes_param.override_logical_id(f"{id}NumCacheNodes")
+
+        self.memcached_enabled_condition = CfnCondition(
+            self,
+            "MemcachedEnabledCondition",
+            expression=Fn.condition_equals(self.memcached_enable_param.value, "true")
+        )
+        self.memcached_enabled_condition.override_logical_id(f"{id}EnabledCondition")
+        multi_node_condition = CfnCondition(
+            self,
+            "MemcachedMultiNodeCondition",
+            expression=Fn.condition_not(
+                Fn.condition_equals(self.memcached_num_cache_nodes_param.value_as_string, "1")
+            )
+        )
+        multi_node_condition.override_logical_id(f"{id}MultiNodeCondition")
+
+        self.sg = aws_ec2.CfnSecurityGroup(
+            self,
+            "MemcachedSg",
+            group_description=f"{id} security group",
+            vpc_id=vpc.id()
+        )
+        self.sg.override_logical_id(f"{id}Sg")
+        self.sg.cfn_options.condition = self.memcached_enabled_condition
+
+        subnet_group = aws_elasticache.CfnSubnetGroup(
+            self,
+            "MemcachedSubnetGroup",
+            description=f"{id} subnet group",
+            subnet_ids=vpc.private_subnet_ids()
+        )
+        subnet_group.override_logical_id(f"{id}SubnetGroup")
+        subnet_group.cfn_options.condition = self.memcached_enabled_condition
+
+        self.elasticache_cluster = aws_elasticache.CfnCacheCluster(
+            self,
+            "MemcachedCluster",
+            az_mode=Token.as_string(
+                Fn.condition_if(multi_node_condition.logical_id, "cross-az", "single-az")
+            ),
+            cache_node_type=self.memcached_cache_node_type_param.value_as_string,
+            cache_subnet_group_name=subnet_group.ref,
+            engine="memcached",
+            num_cache_nodes=self.memcached_num_cache_nodes_param.value_as_number,
+            port=MEMCACHED_PORT,
+            vpc_security_group_ids=[self.sg.ref]
+        )
+        self.elasticache_cluster.override_logical_id(f"{id}Cluster")
+        self.elasticache_cluster.cfn_options.condition = self.memcached_enabled_condition
+
+    def add_ingress(self, source_sg) -> None:
+        ingress = aws_ec2.CfnSecurityGroupIngress(
+            self,
+            "MemcachedSgIngress",
+            from_port=MEMCACHED_PORT,
+            group_id=self.sg.ref,
+            ip_protocol="tcp",
+            source_security_group_id=source_sg.ref,
+            to_port=MEMCACHED_PORT
+        )
+        ingress.cfn_options.condition = self.memcached_enabled_condition
+
+    def cluster_id(self) -> str:
+        """The cache cluster id, or "" when the local memcached is used."""
+        return Token.as_string(
+            Fn.condition_if(
+                self.memcached_enabled_condition.logical_id,
+                self.elasticache_cluster.ref,
+                ""
+            )
+        )
+
+    def metadata_parameter_group(self):
+        return [
+            {
+                "Label": {
+                    "default": "Memcached Configuration"
+                },
+                "Parameters": [
+                    self.memcached_enable_param.logical_id,
+                    self.memcached_cache_node_type_param.logical_id,
+                    self.memcached_num_cache_nodes_param.logical_id
+                ]
+            }
+        ]
+
+    def metadata_parameter_labels(self):
+        return {
+            self.memcached_enable_param.logical_id: {
+                "default": "Use shared ElastiCache Memcached"
+            },
+            self.memcached_cache_node_type_param.logical_id: {
+                "default": "Memcached Cache Node Type"
+            },
+            self.memcached_num_cache_nodes_param.logical_id: {
+                "default": "Memcached Number of Cache Nodes"
+            }
+        }
@@ -0,0 +1,99 @@
+from aws_cdk import (
+    aws_ec2,
+    CfnCondition,
+    CfnParameter,
+    CfnRule,
+    CfnRuleAssertion,
+    Fn,
+    Stack
+)
+from constructs import Construct
+
+from zulip.cfn_lookup import find_all_cfn, find_cfn
+
+GRAVITON_FAMILIES = ["t4g", "m7g", "m7gd", "c7g", "c7gd", "r7g", "r7gd", "m8g", "c8g", "r8g"]
+GRAVITON_INSTANCE_TYPES = ["t4g.medium", "t4g.large", "t4g.xlarge", "t4g.2xlarge"] + [
+    f"{family}.{size}"
+    for family in GRAVITON_FAMILIES if family != "t4g"
+    for size in ["large", "xlarge", "2xlarge", "4xlarge"]
+]
+
+
+class Graviton(Construct):
+    """arm64 instance types for the app Auto Scaling groups.
+
+    The common Asg construct bakes in one AMI. This adds the Graviton
+    families to its instance type parameter and an arm64 AMI parameter, and
+    picks the launch template's image by the family of the selected instance
+    type, so the web and queue-worker groups (which share the launch
+    template) boot the matching build.
+    """
+
+    def __init__(
+            self,
+            scope: Construct,
+            id: str,
+            asg,
+            ami_id: str,
+            ami_id_param_name_suffix: str
+    ):
+        super().__init__(scope, id)
+
+        stack = Stack.of(self)
+        asg_params = {
+            stack.resolve(child.logical_id): child
+            for child in find_all_cfn(asg, CfnParameter)
+        }
+        instance_type_param = asg_params["AsgInstanceType"]
+        x86_64_ami_id_param = asg_params[f"AsgAmiId{ami_id_param_name_suffix}"]
+        if instance_type_param.allowed_values:
+            instance_type_param.allowed_values = list(instance_type_param.allowed_values) + GRAVITON_INSTANCE_TYPES
+
+        self.arm64_ami_id_param = CfnParameter(
+            self,
+            "AsgArm64AmiId",
+            default=ami_id,
+            description="Optional: arm64 AMI to use when the instance type is a Graviton type (e.g. m7g.large). Leave at the default to use the Graviton build of this release."
+        )
+        self.arm64_ami_id_param.override_logical_id(f"AsgArm64AmiId{ami_id_param_name_suffix}")
+
+        family = Fn.select(0, Fn.split(".", instance_type_param.value_as_string))
+        self.arm64_condition = CfnCondition(
+            self,
+            "AsgArm64Condition",
+            # Fn::Or takes at most 10 conditions
+            expression=Fn.condition_or(*[
+                Fn.condition_equals(family, graviton_family)
+                for graviton_family in GRAVITON_FAMILIES
+            ])
+        )
+        self.arm64_condition.override_logical_id("AsgArm64Condition")
+
+        CfnRule(
+            self,
+            "AsgArm64AmiRule",
+            rule_condition=Fn.condition_contains(GRAVITON_INSTANCE_TYPES, instance_type_param.value_as_string),
+            assertions=[
+                CfnRuleAssertion(
+                    assert_=Fn.condition_not(Fn.condition_equals(self.arm64_ami_id_param.value_as_string, "")),
+                    assert_description="A Graviton instance type needs an arm64 AMI ID."
+                )
+            ]
+        ).override_logical_id("AsgArm64AmiRule")
+
+        launch_template = find_cfn(asg, aws_ec2.CfnLaunchTemplate)
+        launch_template.add_property_override(
+            "LaunchTemplateData.ImageId",
+            Fn.condition_if(
+                self.arm64_condition.logical_id,
+                self.arm64_ami_id_param.value_as_string,
+                x86_64_ami_id_param.value_as_string
+            )
+        )
+
+    def metadata_parameter_labels(self):
+        return {
+            self.arm64_ami_id_param.logical_id: {
+                "default": "arm64 AMI ID"
+            }
+        }
@@ -0,0 +1,234 @@
+from aws_cdk import (
+    aws_autoscaling,
+    aws_cloudwatch,
+    aws_ec2,
+    Aws,
+    CfnCondition,
+    CfnCreationPolicy,
+    CfnParameter,
+    CfnResourceSignal,
+    Fn
+)
+from constructs import Construct
+
+from zulip.cfn_lookup import find_cfn
+
+# must match ROLE_TAG in packer/zulip_bootstrap/roles.py
+ROLE_TAG = "oe:patterns:zulip:role"
+
+
+class QueueWorkerAsg(Construct):
+    """Optional second Auto Scaling group that runs only Zulip's queue workers.
+
+    Instances are launched from the web tier's launch template and tagged with
+    the queue_worker role; the bootstrap agent turns off Django and Tornado on
+    them and turns off the queue workers on the web tier. The group scales on
+    the broker-wide MessageCount reported by Amazon MQ.
+    """
+
+    def __init__(
+            self,
+            scope: Construct,
+            id: str,
+            asg,
+            rabbitmq
+    ):
+        super().__init__(scope, id)
+
+        self.queue_worker_asg_enable_param = CfnParameter(
+            self,
+            "QueueWorkerAsgEnable",
+            allowed_values=[ "true", "false" ],
+            default="false",
+            description="Required: Run Zulip's queue workers in a separate Auto Scaling group, scaled on RabbitMQ queue depth, instead of on the web instances. Requires the shared Memcached cluster (MemcachedEnable=true)."
+        )
+        self.queue_worker_asg_enable_param.override_logical_id(f"{id}Enable")
+        self.queue_worker_asg_min_size_param = CfnParameter(
+            self,
+            "QueueWorkerAsgMinSize",
+            type="Number",
+            default=1,
+            min_value=1,
+            description="Required: Minimum number of queue-worker instances."
+        )
+        self.queue_worker_asg_min_size_param.override_logical_id(f"{id}MinSize")
+        self.queue_worker_asg_max_size_param = CfnParameter(
+            self,
+            "QueueWorkerAsgMaxSize",
+            type="Number",
+            default=4,
+            min_value=1,
+            description="Required: Maximum number of queue-worker instances."
+        )
+        self.queue_worker_asg_max_size_param.override_logical_id(f"{id}MaxSize")
+        self.queue_worker_asg_scale_out_messages_param = CfnParameter(
+            self,
+            "QueueWorkerAsgScaleOutMessageCount",
+            type="Number",
+            default=1000,
+            min_value=1,
+            description="Required: Add a queue-worker instance while more than this many messages are waiting in RabbitMQ."
+        )
+        self.queue_worker_asg_scale_out_messages_param.override_logical_id(f"{id}ScaleOutMessageCount")
+        self.queue_worker_asg_scale_in_messages_param = CfnParameter(
+            self,
+            "QueueWorkerAsgScaleInMessageCount",
+            type="Number",
+            default=100,
+            min_value=1,
+            description="Required: Remove a queue-worker instance once fewer than this many messages have been waiting for 15 minutes."
+        )
+        self.queue_worker_asg_scale_in_messages_param.override_logical_id(f"{id}ScaleInMessageCount")
+
+        self.queue_worker_asg_enabled_condition = CfnCondition(
+            self,
+            "QueueWorkerAsgEnabledCondition",
+            expression=Fn.condition_equals(self.queue_worker_asg_enable_param.value, "true")
+        )
+        self.queue_worker_asg_enabled_condition.override_logical_id(f"{id}EnabledCondition")
+
+        launch_template = find_cfn(asg, aws_ec2.CfnLaunchTemplate)
+
+        self.asg = aws_autoscaling.CfnAutoScalingGroup(
+            self,
+            "QueueWorkerAsg",
+            launch_template=aws_autoscaling.CfnAutoScalingGroup.LaunchTemplateSpecificationProperty(
+                launch_template_id=launch_template.ref,
+                version=launch_template.attr_latest_version_number
+            ),
+            max_size=self.queue_worker_asg_max_size_param.value_as_string,
+            min_size=self.queue_worker_asg_min_size_param.value_as_string,
+            tags=[
+                aws_autoscaling.CfnAutoScalingGroup.TagPropertyProperty(
+                    key="Name",
+                    propagate_at_launch=True,
+                    value=f"{Aws.STACK_NAME}/{id}"
+                ),
+                aws_autoscaling.CfnAutoScalingGroup.TagPropertyProperty(
+                    key=ROLE_TAG,
+                    propagate_at_launch=True,
+                    value="queue_worker"
+                )
+            ],
+            vpc_zone_identifier=asg.asg.vpc_zone_identifier
+        )
+        self.asg.override_logical_id(id)
+        self.asg.cfn_options.condition = self.queue_worker_asg_enabled_condition
+        self.asg.cfn_options.creation_policy = CfnCreationPolicy(
+            resource_signal=CfnResourceSignal(
+                count=self.queue_worker_asg_min_size_param.value_as_number,
+                timeout="PT30M"
+            )
+        )
+        # cycle the workers on launch template changes the same way as the web tier
+        self.asg.cfn_options.update_policy = asg.asg.cfn_options.update_policy
+        # initialize-database runs on the web tier first
+        self.asg.add_dependency(asg.asg)
+
+        scale_out_policy = aws_autoscaling.CfnScalingPolicy(
+            self,
+            "QueueWorkerScaleOutPolicy",
+            adjustment_type="ChangeInCapacity",
+            auto_scaling_group_name=self.asg.ref,
+            estimated_instance_warmup=600,
+            policy_type="StepScaling",
+            step_adjustments=[
+                aws_autoscaling.CfnScalingPolicy.StepAdjustmentProperty(
+                    metric_interval_lower_bound=0,
+                    scaling_adjustment=1
+                )
+            ]
+        )
+        scale_out_policy.override_logical_id(f"{id}ScaleOutPolicy")
+        scale_out_policy.cfn_options.condition = self.queue_worker_asg_enabled_condition
+
+        scale_in_policy = aws_autoscaling.CfnScalingPolicy(
+            self,
+            "QueueWorkerScaleInPolicy",
+            adjustment_type="ChangeInCapacity",
+            auto_scaling_group_name=self.asg.ref,
+            policy_type="StepScaling",
+            step_adjustments=[
+                aws_autoscaling.CfnScalingPolicy.StepAdjustmentProperty(
+                    metric_interval_upper_bound=0,
+                    scaling_adjustment=-1
+                )
+            ]
+        )
+        scale_in_policy.override_logical_id(f"{id}ScaleInPolicy")
+        scale_in_policy.cfn_options.condition = self.queue_worker_asg_enabled_condition
+
+        broker_dimension = aws_cloudwatch.CfnAlarm.DimensionProperty(
+            name="Broker",
+            value=rabbitmq.broker.broker_name
+        )
+        scale_out_alarm = aws_cloudwatch.CfnAlarm(
+            self,
+            "QueueWorkerBacklogHighAlarm",
+            alarm_actions=[scale_out_policy.ref],
+            alarm_description="RabbitMQ backlog is growing; add a queue-worker instance",
+            comparison_operator="GreaterThanThreshold",
+            dimensions=[broker_dimension],
+            evaluation_periods=2,
+            metric_name="MessageCount",
+            namespace="AWS/AmazonMQ",
+            period=60,
+            statistic="Maximum",
+            threshold=self.queue_worker_asg_scale_out_messages_param.value_as_number,
+            treat_missing_data="notBreaching"
+        )
+        scale_out_alarm.override_logical_id(f"{id}BacklogHighAlarm")
+        scale_out_alarm.cfn_options.condition = self.queue_worker_asg_enabled_condition
+
+        scale_in_alarm = aws_cloudwatch.CfnAlarm(
+            self,
+            "QueueWorkerBacklogLowAlarm",
+            alarm_actions=[scale_in_policy.ref],
+            alarm_description="RabbitMQ backlog has drained; remove a queue-worker instance",
+            comparison_operator="LessThanThreshold",
+            dimensions=[broker_dimension],
+            evaluation_periods=15,
+            metric_name="MessageCount",
+            namespace="AWS/AmazonMQ",
+            period=60,
+            statistic="Maximum",
+            threshold=self.queue_worker_asg_scale_in_messages_param.value_as_number,
+            treat_missing_data="breaching"
+        )
+        scale_in_alarm.override_logical_id(f"{id}BacklogLowAlarm")
+        scale_in_alarm.cfn_options.condition = self.queue_worker_asg_enabled_condition
+
+    def metadata_parameter_group(self):
+        return [
+            {
+                "Label": {
+                    "default": "Queue Worker Auto Scaling Group"
+                },
+                "Parameters": [
+                    self.queue_worker_asg_enable_param.logical_id,
+                    self.queue_worker_asg_min_size_param.logical_id,
+                    self.queue_worker_asg_max_size_param.logical_id,
+                    self.queue_worker_asg_scale_out_messages_param.logical_id,
+                    self.queue_worker_asg_scale_in_messages_param.logical_id
+                ]
+            }
+        ]
+
+    def metadata_parameter_labels(self):
+        return {
+            self.queue_worker_asg_enable_param.logical_id: {
+                "default": "Enable queue-worker ASG"
+            },
+            self.queue_worker_asg_min_size_param.logical_id: {
+                "default": "Queue-worker ASG Min Size"
+            },
+            self.queue_worker_asg_max_size_param.logical_id: {
+                "default": "Queue-worker ASG Max Size"
+            },
+            self.queue_worker_asg_scale_out_messages_param.logical_id: {
+                "default": "Queue-worker scale-out message count"
+            },
+            self.queue_worker_asg_scale_in_messages_param.logical_id: {
+                "default": "Queue-worker scale-in message count"
+            }
+        }
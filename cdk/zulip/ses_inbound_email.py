@@ -0,0 +1,387 @@
+from aws_cdk import (
+    aws_iam,
+    aws_lambda,
+    aws_s3,
+    aws_ses,
+    aws_sns,
+    aws_sqs,
+    Aws,
+    CfnCondition,
+    CfnCustomResource,
+    CfnParameter,
+    Fn,
+    Token
+)
+from constructs import Construct
+
+from zulip.cfn_lookup import find_cfn
+
+INCOMING_PREFIX = "incoming/"
+
+# SES allows one active receipt rule set per account and region
+ACTIVATE_RULE_SET_CODE = """\
+import boto3
+import cfnresponse
+
+def handler(event, context):
+    ses = boto3.client("ses")
+    name = event["ResourceProperties"]["RuleSetName"]
+    try:
+        if event["RequestType"] in ("Create", "Update"):
+            ses.set_active_receipt_rule_set(RuleSetName=name)
+        else:
+            active = ses.describe_active_receipt_rule_set().get("Metadata", {}).get("Name")
+            if active == name:
+                ses.set_active_receipt_rule_set()
+        cfnresponse.send(event, context, cfnresponse.SUCCESS, {}, name)
+    except Exception as e:
+        cfnresponse.send(event, context, cfnresponse.FAILED, {"Error": str(e)}, name)
+"""
+
+
+class SesInboundEmail(Construct):
+    """Incoming email through SES instead of the NLB and postfix on the app instances.
+
+    With IncomingEmailMode=ses, an SES receipt rule for the Zulip hostname
+    stores each message in a private bucket and notifies an SNS topic that
+    feeds an SQS queue. `zulip-bootstrap email-ingest` on the web instances
+    consumes the queue in batches and posts the messages to Zulip's email
+    mirror locally, so no instance accepts SMTP and mail bursts queue up
+    instead of tying up web workers. The default mode, nlb, keeps the NLB
+    on port 25 in front of postfix.
+    """
+
+    def __init__(
+            self,
+            scope: Construct,
+            id: str,
+            enable_incoming_email_param: CfnParameter,
+            hostname: str
+    ):
+        super().__init__(scope, id)
+
+        self.incoming_email_mode_param = CfnParameter(
+            self,
+            "IncomingEmailMode",
+            allowed_values=[ "nlb", "ses" ],
+            default="nlb",
+            description="Required (if Enable incoming email is true): Receive email through a Network Load Balancer on port 25 to postfix on the app instances ('nlb'), or through SES receipt rules, S3 and SQS ('ses'). SES receiving is only available in some regions."
+        )
+        self.incoming_email_mode_param.override_logical_id("IncomingEmailMode")
+        self.incoming_email_rule_set_name_param = CfnParameter(
+            self,
+            "IncomingEmailReceiptRuleSetName",
+            default="",
+            description="Optional (if incoming email mode is ses): Name of the account's active SES receipt rule set to add Zulip's rule to. If not specified, a new rule set is created and made active, which replaces any rule set already active in this region."
+        )
+        self.incoming_email_rule_set_name_param.override_logical_id("IncomingEmailReceiptRuleSetName")
+
+        self.nlb_condition = CfnCondition(
+            self,
+            "IncomingEmailNlbCondition",
+            expression=Fn.condition_and(
+                Fn.condition_equals(enable_incoming_email_param.value, "true"),
+                Fn.condition_equals(self.incoming_email_mode_param.value, "nlb")
+            )
+        )
+        self.nlb_condition.override_logical_id("IncomingEmailNlbCondition")
+        self.ses_condition = CfnCondition(
+            self,
+            "IncomingEmailSesCondition",
+            expression=Fn.condition_and(
+                Fn.condition_equals(enable_incoming_email_param.value, "true"),
+                Fn.condition_equals(self.incoming_email_mode_param.value, "ses")
+            )
+        )
+        self.ses_condition.override_logical_id("IncomingEmailSesCondition")
+        create_rule_set_condition = CfnCondition(
+            self,
+            "IncomingEmailCreateRuleSetCondition",
+            expression=Fn.condition_and(
+                self.ses_condition,
+                Fn.condition_equals(self.incoming_email_rule_set_name_param.value, "")
+            )
+        )
+        create_rule_set_condition.override_logical_id("IncomingEmailCreateRuleSetCondition")
+
+        self.bucket = aws_s3.CfnBucket(
+            self,
+            "IncomingEmailBucket",
+            bucket_encryption=aws_s3.CfnBucket.BucketEncryptionProperty(
+                server_side_encryption_configuration=[
+                    aws_s3.CfnBucket.ServerSideEncryptionRuleProperty(
+                        server_side_encryption_by_default=aws_s3.CfnBucket.ServerSideEncryptionByDefaultProperty(
+                            sse_algorithm="AES256"
+                        )
+                    )
+                ]
+            ),
+            # delivered messages are deleted by the consumer; this only catches what never was
+            lifecycle_configuration=aws_s3.CfnBucket.LifecycleConfigurationProperty(
+                rules=[
+                    aws_s3.CfnBucket.RuleProperty(
+                        expiration_in_days=14,
+                        status="Enabled"
+                    )
+                ]
+            ),
+            public_access_block_configuration=aws_s3.CfnBucket.PublicAccessBlockConfigurationProperty(
+                block_public_acls=True,
+                block_public_policy=True,
+                ignore_public_acls=True,
+                restrict_public_buckets=True
+            )
+        )
+        self.bucket.override_logical_id("IncomingEmailBucket")
+        self.bucket.cfn_options.condition = self.ses_condition
+
+        bucket_policy = aws_s3.CfnBucketPolicy(
+            self,
+            "IncomingEmailBucketPolicy",
+            bucket=self.bucket.ref,
+            policy_document=aws_iam.PolicyDocument(
+                statements=[
+                    aws_iam.PolicyStatement(
+                        actions=["s3:PutObject"],
+                        resources=[f"{self.bucket.attr_arn}/{INCOMING_PREFIX}*"],
+                        principals=[aws_iam.ServicePrincipal("ses.amazonaws.com")],
+                        conditions={"StringEquals": {"AWS:SourceAccount": Aws.ACCOUNT_ID}}
+                    )
+                ]
+            )
+        )
+        bucket_policy.override_logical_id("IncomingEmailBucketPolicy")
+        bucket_policy.cfn_options.condition = self.ses_condition
+
+        dead_letter_queue = aws_sqs.CfnQueue(
+            self,
+            "IncomingEmailDeadLetterQueue",
+            message_retention_period=1209600
+        )
+        dead_letter_queue.override_logical_id("IncomingEmailDeadLetterQueue")
+        dead_letter_queue.cfn_options.condition = self.ses_condition
+
+        self.queue = aws_sqs.CfnQueue(
+            self,
+            "IncomingEmailQueue",
+            receive_message_wait_time_seconds=20,
+            redrive_policy={
+                "deadLetterTargetArn": dead_letter_queue.attr_arn,
+                "maxReceiveCount": 5
+            },
+            visibility_timeout=300
+        )
+        self.queue.override_logical_id("IncomingEmailQueue")
+        self.queue.cfn_options.condition = self.ses_condition
+
+        topic = aws_sns.CfnTopic(self, "IncomingEmailTopic")
+        topic.override_logical_id("IncomingEmailTopic")
+        topic.cfn_options.condition = self.ses_condition
+
+        topic_policy = aws_sns.CfnTopicPolicy(
+            self,
+            "IncomingEmailTopicPolicy",
+            policy_document=aws_iam.PolicyDocument(
+                statements=[
+                    aws_iam.PolicyStatement(
+                        actions=["sns:Publish"],
+                        resources=[topic.ref],
+                        principals=[aws_iam.ServicePrincipal("ses.amazonaws.com")],
+                        conditions={"StringEquals": {"AWS:SourceAccount": Aws.ACCOUNT_ID}}
+                    )
+                ]
+            ),
+            topics=[topic.ref]
+        )
+        topic_policy.override_logical_id("IncomingEmailTopicPolicy")
+        topic_policy.cfn_options.condition = self.ses_condition
+
+        queue_policy = aws_sqs.CfnQueuePolicy(
+            self,
+            "IncomingEmailQueuePolicy",
+            policy_document=aws_iam.PolicyDocument(
+                statements=[
+                    aws_iam.PolicyStatement(
+                        actions=["sqs:SendMessage"],
+                        resources=[self.queue.attr_arn],
+                        principals=[aws_iam.ServicePrincipal("sns.amazonaws.com")],
+                        conditions={"ArnEquals": {"aws:SourceArn": topic.ref}}
+                    )
+                ]
+            ),
+            queues=[self.queue.ref]
+        )
+        queue_policy.override_logical_id("IncomingEmailQueuePolicy")
+        queue_policy.cfn_options.condition = self.ses_condition
+
+        subscription = aws_sns.CfnSubscription(
+            self,
+            "IncomingEmailSubscription",
+            endpoint=self.queue.attr_arn,
+            protocol="sqs",
+            topic_arn=topic.ref
+        )
+        subscription.override_logical_id("IncomingEmailSubscription")
+        subscription.cfn_options.condition = self.ses_condition
+        subscription.add_dependency(queue_policy)
+
+        rule_set = aws_ses.CfnReceiptRuleSet(
+            self,
+            "IncomingEmailReceiptRuleSet",
+            rule_set_name=Fn.join("-", [Aws.STACK_NAME, "incoming-email"])
+        )
+        rule_set.override_logical_id("IncomingEmailReceiptRuleSet")
+        rule_set.cfn_options.condition = create_rule_set_condition
+
+        rule = aws_ses.CfnReceiptRule(
+            self,
+            "IncomingEmailReceiptRule",
+            rule=aws_ses.CfnReceiptRule.RuleProperty(
+                actions=[
+                    aws_ses.CfnReceiptRule.ActionProperty(
+                        s3_action=aws_ses.CfnReceiptRule.S3ActionProperty(
+                            bucket_name=self.bucket.ref,
+                            object_key_prefix=INCOMING_PREFIX,
+                            topic_arn=topic.ref
+                        )
+                    )
+                ],
+                enabled=True,
+                recipients=[hostname],
+                scan_enabled=True,
+                tls_policy="Optional"
+            ),
+            rule_set_name=Token.as_string(
+                Fn.condition_if(
+                    create_rule_set_condition.logical_id,
+                    rule_set.ref,
+                    self.incoming_email_rule_set_name_param.value_as_string
+                )
+            )
+        )
+        rule.override_logical_id("IncomingEmailReceiptRule")
+        rule.cfn_options.condition = self.ses_condition
+        # SES checks that it may write to the bucket and publish to the topic
+        rule.add_dependency(bucket_policy)
+        rule.add_dependency(topic_policy)
+
+        activate_role = aws_iam.CfnRole(
+            self,
+            "IncomingEmailActivateRuleSetRole",
+            assume_role_policy_document=aws_iam.PolicyDocument(
+                statements=[
+                    aws_iam.PolicyStatement(
+                        effect=aws_iam.Effect.ALLOW,
+                        actions=["sts:AssumeRole"],
+                        principals=[aws_iam.ServicePrincipal("lambda.amazonaws.com")]
+                    )
+                ]
+            ),
+            managed_policy_arns=[
+                f"arn:{Aws.PARTITION}:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
+            ],
+            policies=[
+                aws_iam.CfnRole.PolicyProperty(
+                    policy_document=aws_iam.PolicyDocument(
+                        statements=[
+                            aws_iam.PolicyStatement(
+                                effect=aws_iam.Effect.ALLOW,
+                                actions=[
+                                    "ses:DescribeActiveReceiptRuleSet",
+                                    "ses:SetActiveReceiptRuleSet"
+                                ],
+                                resources=["*"]
+                            )
+                        ]
+                    ),
+                    policy_name="AllowActivateReceiptRuleSet"
+                )
+            ]
+        )
+        activate_role.override_logical_id("IncomingEmailActivateRuleSetRole")
+        activate_role.cfn_options.condition = create_rule_set_condition
+
+        activate_function = aws_lambda.CfnFunction(
+            self,
+            "IncomingEmailActivateRuleSetFunction",
+            code=aws_lambda.CfnFunction.CodeProperty(
+                zip_file=ACTIVATE_RULE_SET_CODE
+            ),
+            handler="index.handler",
+            role=activate_role.attr_arn,
+            runtime="python3.12",
+            timeout=60
+        )
+        activate_function.override_logical_id("IncomingEmailActivateRuleSetFunction")
+        activate_function.cfn_options.condition = create_rule_set_condition
+
+        activate_rule_set = CfnCustomResource(
+            self,
+            "IncomingEmailActivateRuleSet",
+            service_token=activate_function.attr_arn
+        )
+        activate_rule_set.add_property_override("RuleSetName", rule_set.ref)
+        activate_rule_set.override_logical_id("IncomingEmailActivateRuleSet")
+        activate_rule_set.cfn_options.condition = create_rule_set_condition
+        activate_rule_set.add_dependency(rule)
+
+    def add_consumer(self, asg) -> None:
+        """Let the web instances consume the queue and read and delete the stored messages."""
+        role = find_cfn(asg, aws_iam.CfnRole)
+        policy = aws_iam.CfnPolicy(
+            self,
+            "IncomingEmailConsumerPolicy",
+            policy_document=aws_iam.PolicyDocument(
+                statements=[
+                    aws_iam.PolicyStatement(
+                        effect=aws_iam.Effect.ALLOW,
+                        actions=[
+                            "sqs:ChangeMessageVisibility",
+                            "sqs:DeleteMessage",
+                            "sqs:GetQueueAttributes",
+                            "sqs:ReceiveMessage",
+                            # requeues partially delivered messages for the failed recipients
+                            "sqs:SendMessage"
+                        ],
+                        resources=[self.queue.attr_arn]
+                    ),
+                    aws_iam.PolicyStatement(
+                        effect=aws_iam.Effect.ALLOW,
+                        actions=["s3:DeleteObject", "s3:GetObject"],
+                        resources=[f"{self.bucket.attr_arn}/{INCOMING_PREFIX}*"]
+                    )
+                ]
+            ),
+            policy_name="AllowConsumeIncomingEmail",
+            roles=[role.ref]
+        )
+        policy.override_logical_id("IncomingEmailConsumerPolicy")
+        policy.cfn_options.condition = self.ses_condition
+
+    def queue_url(self) -> str:
+        """The queue URL, or "" unless incoming email goes through SES."""
+        return Token.as_string(
+            Fn.condition_if(
+                self.ses_condition.logical_id,
+                self.queue.ref,
+                ""
+            )
+        )
+
+    def mx_records(self, nlb_records):
+        """SES's inbound endpoint for this region in ses mode, else `nlb_records`."""
+        return Fn.condition_if(
+            self.ses_condition.logical_id,
+            [f"10 inbound-smtp.{Aws.REGION}.amazonaws.com"],
+            nlb_records
+        )
+
+    def metadata_parameter_labels(self):
+        return {
+            self.incoming_email_mode_param.logical_id: {
+                "default": "Incoming email mode"
+            },
+            self.incoming_email_rule_set_name_param.logical_id: {
+                "default": "Existing SES receipt rule set name"
+            }
+        }
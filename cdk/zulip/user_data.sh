@@ -1,214 +1,129 @@
 #!/bin/bash
 
-# aws cloudwatch
-sed -i 's/ASG_APP_LOG_GROUP_PLACEHOLDER/${AsgAppLogGroup}/g' /opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json
-sed -i 's/ASG_SYSTEM_LOG_GROUP_PLACEHOLDER/${AsgSystemLogGroup}/g' /opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json
-systemctl enable amazon-cloudwatch-agent
-systemctl start amazon-cloudwatch-agent
-
-# reprovision if access key is rotated
-# access key serial: ${SesInstanceUserAccessKeySerial}
-
 mkdir -p /opt/oe/patterns
 
-# secretsmanager
-SECRET_ARN="${DbSecretArn}"
-echo $SECRET_ARN > /opt/oe/patterns/secret-arn.txt
-SECRET_NAME=$(aws secretsmanager list-secrets --query "SecretList[?ARN=='$SECRET_ARN'].Name" --output text)
-echo $SECRET_NAME > /opt/oe/patterns/secret-name.txt
-
-aws ssm get-parameter \
-    --name "/aws/reference/secretsmanager/$SECRET_NAME" \
-    --with-decryption \
-    --query Parameter.Value \
-| jq -r . > /opt/oe/patterns/secret.json
-
-DB_PASSWORD=$(cat /opt/oe/patterns/secret.json | jq -r .password)
-DB_USERNAME=$(cat /opt/oe/patterns/secret.json | jq -r .username)
-
-RABBITMQ_SECRET_ARN="${RabbitMQSecretArn}"
-echo $RABBITMQ_SECRET_ARN > /opt/oe/patterns/rabbitmq-secret-arn.txt
-RABBITMQ_SECRET_NAME=$(aws secretsmanager list-secrets --query "SecretList[?ARN=='$RABBITMQ_SECRET_ARN'].Name" --output text)
-echo $RABBITMQ_SECRET_NAME > /opt/oe/patterns/rabbitmq-secret-name.txt
-
-aws ssm get-parameter \
-    --name "/aws/reference/secretsmanager/$RABBITMQ_SECRET_NAME" \
-    --with-decryption \
-    --query Parameter.Value \
-| jq -r . > /opt/oe/patterns/rabbitmq_secret.json
-
-RABBITMQ_PASSWORD=$(cat /opt/oe/patterns/rabbitmq_secret.json | jq -r .password)
-RABBITMQ_USERNAME=$(cat /opt/oe/patterns/rabbitmq_secret.json | jq -r .username)
-RABBITMQ_ID=$(echo "${RabbitMQBroker.Arn}" | awk -F: '{print $NF}')
-# AWS moved Amazon MQ endpoints from .amazonaws.com to .on.aws; derive the real host from DescribeBroker
-RABBITMQ_HOST=$(aws mq describe-broker --broker-id "$RABBITMQ_ID" --region ${AWS::Region} \
-    --query 'BrokerInstances[0].Endpoints[0]' --output text \
-  | sed -E 's|^amqps?://||; s|:[0-9]+$||')
-
-/root/check-secrets.py ${AWS::Region} ${InstanceSecretName}
-
-aws ssm get-parameter \
-    --name "/aws/reference/secretsmanager/${InstanceSecretName}" \
-    --with-decryption \
-    --query Parameter.Value \
-| jq -r . > /opt/oe/patterns/instance.json
+# time each boot phase; durations are published as CloudWatch embedded
+# metrics by `zulip-bootstrap boot-metrics` just before cfn-signal
+BOOT_PHASES=/opt/oe/patterns/boot-phases.tsv
+phase() {
+  local name=$1
+  shift
+  local start=$(date +%s%3N)
+  "$@"
+  local rc=$?
+  printf '%s\t%s\t%s\t%s\n' "$name" "$start" "$(date +%s%3N)" "$rc" >> $BOOT_PHASES
+  return $rc
+}
+
+# instances of the optional queue-worker ASG signal that group instead
+SIGNAL_RESOURCE=Asg
+signal() {
+  zulip-bootstrap boot-metrics --exit-code $1
+  cfn-signal --exit-code $1 --stack ${AWS::StackName} --resource $SIGNAL_RESOURCE --region ${AWS::Region}
+}
 
-ACCESS_KEY_ID=$(cat /opt/oe/patterns/instance.json | jq -r .access_key_id)
-AVATAR_SALT=$(cat /opt/oe/patterns/instance.json | jq -r .avatar_salt)
-CAMO_KEY=$(cat /opt/oe/patterns/instance.json | jq -r .camo_key)
-SECRET_ACCESS_KEY=$(cat /opt/oe/patterns/instance.json | jq -r .secret_access_key)
-SECRET_KEY=$(cat /opt/oe/patterns/instance.json | jq -r .secret_key)
-SHARED_SECRET=$(cat /opt/oe/patterns/instance.json | jq -r .shared_secret)
-SMTP_PASSWORD=$(cat /opt/oe/patterns/instance.json | jq -r .smtp_password)
-ZULIP_ORG_ID=$(cat /opt/oe/patterns/instance.json | jq -r .zulip_org_id)
-ZULIP_ORG_KEY=$(cat /opt/oe/patterns/instance.json | jq -r .zulip_org_key)
+# aws cloudwatch
+start_cloudwatch_agent() {
+  sed -i 's/ASG_APP_LOG_GROUP_PLACEHOLDER/${AsgAppLogGroup}/g' /opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json
+  sed -i 's/ASG_SYSTEM_LOG_GROUP_PLACEHOLDER/${AsgSystemLogGroup}/g' /opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json
+  systemctl enable amazon-cloudwatch-agent
+  systemctl start amazon-cloudwatch-agent
+}
+phase cloudwatch_agent start_cloudwatch_agent
 
-cat <<EOF > /etc/zulip/zulip.conf
-[machine]
-puppet_classes = zulip::profile::app_frontend
-deploy_type = production
+# reprovision if access key is rotated
+# access key serial: ${SesInstanceUserAccessKeySerial}
 
-[postgresql]
-missing_dictionaries = true
+cat <<EOF > /opt/oe/patterns/bootstrap.json
+{
+  "region": "${AWS::Region}",
+  "stack_name": "${AWS::StackName}",
+  "hostname": "${Hostname}",
+  "hosted_zone_name": "${HostedZoneName}",
+  "db_host": "${DbCluster.Endpoint.Address}",
+  "db_secret_arn": "${DbSecretArn}",
+  "rabbitmq_secret_arn": "${RabbitMQSecretArn}",
+  "rabbitmq_broker_arn": "${RabbitMQBrokerArn}",
+  "redis_host": "${RedisHost}",
+  "instance_secret_name": "${InstanceSecretName}",
+  "assets_bucket_name": "${AssetsBucketName}",
+  "avatars_bucket_name": "${AvatarsBucketName}",
+  "admin_email": "${AdminEmail}",
+  "giphy_api_key": "${GiphyApiKey}",
+  "sentry_dsn": "${SentryDsn}",
+  "enable_incoming_email": "${EnableIncomingEmail}",
+  "enable_mobile_push_notifications": "${EnableMobilePushNotifications}",
+  "uwsgi_processes": "${UwsgiProcesses}",
+  "queue_workers_mode": "${QueueWorkersMode}",
+  "tornado_shards": "${TornadoShards}",
+  "memcached_cluster_id": "${MemcachedClusterId}",
+  "queue_worker_asg_enabled": "${QueueWorkerAsgEnable}",
+  "db_proxy_host": "${DbProxyHost}",
+  "cdn_enabled": "${CdnEnable}",
+  "nginx_profile": "${NginxProfile}",
+  "uploads_cache_size_gb": "${UploadsCacheSizeGb}",
+  "uploads_cache_placement": "${UploadsCachePlacement}",
+  "incoming_email_mode": "${IncomingEmailMode}",
+  "incoming_email_queue_url": "${IncomingEmailQueueUrl}",
+  "deployment_mode": "${DeploymentMode}"
+}
 EOF
 
-cp /etc/zulip/settings.py /etc/zulip/settings.py.orig
-cat <<EOF > /etc/zulip/settings.py
-from typing import Any, Dict, Tuple
-
-from .config import get_secret
-
-ZULIP_ADMINISTRATOR = "zulip@${HostedZoneName}"
-EXTERNAL_HOST = "${Hostname}"
-ALLOWED_HOSTS = ["*"]
-
-EMAIL_HOST = "email-smtp.${AWS::Region}.amazonaws.com"
-EMAIL_HOST_USER = "$ACCESS_KEY_ID"
-EMAIL_USE_TLS = True
-EMAIL_PORT = 587
-
-EMAIL_GATEWAY_PATTERN = ""
-EMAIL_GATEWAY_LOGIN = ""
-EMAIL_GATEWAY_IMAP_SERVER = ""
-EMAIL_GATEWAY_IMAP_PORT = 993
-EMAIL_GATEWAY_IMAP_FOLDER = "INBOX"
-
-AUTHENTICATION_BACKENDS: Tuple[str, ...] = (
-    "zproject.backends.EmailAuthBackend",  # Email and password; just requires SMTP setup
-)
-
-REMOTE_POSTGRES_HOST = "${DbCluster.Endpoint.Address}"
-
-RABBITMQ_HOST = "$RABBITMQ_HOST"
-RABBITMQ_PORT = 5671
-RABBITMQ_USE_TLS = True
-## To use another RabbitMQ user than the default "zulip", set RABBITMQ_USERNAME here.
-RABBITMQ_USERNAME = "$RABBITMQ_USERNAME"
-
-REDIS_HOST = "${RedisCluster.RedisEndpoint.Address}"
-
-MEMCACHED_LOCATION = "127.0.0.1:11211"
-## To authenticate to memcached, set memcached_password in zulip-secrets.conf,
-## and optionally change the default username "zulip@localhost" here.
-# MEMCACHED_USERNAME = "zulip@localhost"
-
-## Controls whether session cookies expire when the browser closes
-SESSION_EXPIRE_AT_BROWSER_CLOSE = False
-
-## Session cookie expiry in seconds after the last page load
-SESSION_COOKIE_AGE = 60 * 60 * 24 * 7 * 2  # 2 weeks
-
-## Controls whether or not Zulip will parse links starting with
-## "file:///" as a hyperlink (useful if you have e.g. an NFS share).
-ENABLE_FILE_LINKS = False
-
-## By default, files uploaded by users and profile pictures are stored
-## directly on the Zulip server.  You can configure files being instead
-## stored in Amazon S3 or another scalable data store here.  See docs at:
-##
-##   https://zulip.readthedocs.io/en/latest/production/upload-backends.html
-##
-## If you change LOCAL_UPLOADS_DIR to a different path, you will also
-## need to manually edit Zulip's nginx configuration to use the new
-## path.  For that reason, we recommend replacing /home/zulip/uploads
-## with a symlink instead of changing LOCAL_UPLOADS_DIR.
-# LOCAL_UPLOADS_DIR = "/home/zulip/uploads"
-S3_AUTH_UPLOADS_BUCKET = "${AssetsBucketName}"
-S3_AVATAR_BUCKET = "${AvatarsBucketName}"
-S3_REGION = "${AWS::Region}"
-# S3_ENDPOINT_URL = None
-# S3_SKIP_PROXY = True
-
-MAX_FILE_UPLOAD_SIZE = 25
-NAME_CHANGES_DISABLED = False
-AVATAR_CHANGES_DISABLED = False
-ENABLE_GRAVATAR = True
-
-# GIPHY_API_KEY = "<Your API key from GIPHY>"
-# PUSH_NOTIFICATION_BOUNCER_URL = ""
-# SENTRY_DSN = ""
-
-## The default CAMO_URI of "/external_content/" is served by the camo
-## setup in the default Zulip nginx configuration.  Setting CAMO_URI
-## to "" will disable the Camo integration.
-CAMO_URI = ""
-EOF
-if [ -n "${AdminEmail}" ]; then
-    sed -i 's|ZULIP_ADMINISTRATOR = .*|ZULIP_ADMINISTRATOR = "${AdminEmail}"|' /etc/zulip/settings.py
-fi
-if [ -n "${GiphyApiKey}" ]; then
-    sed -i 's|# GIPHY_API_KEY = .*|GIPHY_API_KEY = "${GiphyApiKey}"|' /etc/zulip/settings.py
-fi
-if [ -n "${SentryDsn}" ]; then
-    sed -i 's|# SENTRY_DSN = .*|SENTRY_DSN = "${SentryDsn}"|' /etc/zulip/settings.py
-fi
-if [ "${EnableIncomingEmail}" == "true" ]; then
-    sed -i 's|EMAIL_GATEWAY_PATTERN = .*|EMAIL_GATEWAY_PATTERN = "%s@${Hostname}"|' /etc/zulip/settings.py
-fi
-if [ "${EnableMobilePushNotifications}" == "true" ]; then
-    sed -i 's|# PUSH_NOTIFICATION_BOUNCER_URL = .*|PUSH_NOTIFICATION_BOUNCER_URL = "https://push.zulipchat.com"|' /etc/zulip/settings.py
+# web or queue_worker, from the instance's Auto Scaling group tag
+ROLE=$(zulip-bootstrap role --config /opt/oe/patterns/bootstrap.json)
+if [ "$ROLE" == "queue_worker" ]; then
+  SIGNAL_RESOURCE=QueueWorkerAsg
 fi
 
-cat <<EOF > /etc/zulip/zulip-secrets.conf
-[secrets]
-avatar_salt = $AVATAR_SALT
-rabbitmq_password = $RABBITMQ_PASSWORD
-email_password = $SMTP_PASSWORD
-shared_secret = $SHARED_SECRET
-secret_key = $SECRET_KEY
-camo_key = $CAMO_KEY
-# memcached_password = ""
-# redis_password = ""
-s3_key = $ACCESS_KEY_ID
-s3_secret_key = $SECRET_ACCESS_KEY
-zulip_org_key = $ZULIP_ORG_KEY
-zulip_org_id = $ZULIP_ORG_ID
-postgres_password = $DB_PASSWORD
-EOF
+# fetches all secrets concurrently, renders /etc/zulip and prepares the db schema
+if ! phase configure zulip-bootstrap configure --config /opt/oe/patterns/bootstrap.json; then
+  echo "Bootstrap configuration failed."
+  signal 1
+  exit 1
+fi
 
-echo "${DbCluster.Endpoint.Address}:5432:zulip:zulip:$DB_PASSWORD" > /root/.pgpass
-chmod 600 /root/.pgpass
-psql -U zulip -h ${DbCluster.Endpoint.Address} -d zulip -c "ALTER ROLE zulip SET search_path TO zulip,public"
-psql -U zulip -h ${DbCluster.Endpoint.Address} -d zulip -c "CREATE SCHEMA IF NOT EXISTS zulip AUTHORIZATION zulip"
-rm /root/.pgpass
+# the shared ElastiCache cluster replaces the local memcached
+if [ -n "${MemcachedClusterId}" ]; then
+  systemctl disable --now memcached
+  # ElastiCache publishes its own hit/miss/eviction metrics
+  rm -f /etc/collectd/collectd.conf.d/memcached.conf
+  systemctl try-restart collectd
+fi
 
 # postfix config
-/usr/sbin/make-ssl-cert generate-default-snakeoil
-echo -n '${Hostname}' > /etc/mailname
-sed -i 's/\(mydestination = localhost,\) .*/\1 ${Hostname}/' /etc/postfix/main.cf
-sed -i 's/myhostname = .*/myhostname = ${Hostname}/' /etc/postfix/main.cf
-ESCAPED_HOSTNAME=$(echo "${Hostname}" | sed 's/\([.-]\)/\\\\\1/g')
-sed -i "s|if .*|if /@$ESCAPED_HOSTNAME|" /etc/postfix/virtual
-service postfix restart
-
-sed -i "/ssl_certificate_key/a\    location /elb-check { access_log off; return 200 'ok'; add_header Content-Type text/plain; }" /etc/nginx/sites-available/zulip-enterprise
-service nginx restart
-
-su zulip -c '/home/zulip/deployments/current/scripts/setup/initialize-database'
+configure_postfix() {
+  /usr/sbin/make-ssl-cert generate-default-snakeoil
+  echo -n '${Hostname}' > /etc/mailname
+  sed -i 's/\(mydestination = localhost,\) .*/\1 ${Hostname}/' /etc/postfix/main.cf
+  sed -i 's/myhostname = .*/myhostname = ${Hostname}/' /etc/postfix/main.cf
+  ESCAPED_HOSTNAME=$(echo "${Hostname}" | sed 's/\([.-]\)/\\\\\1/g')
+  sed -i "s|if .*|if /@$ESCAPED_HOSTNAME|" /etc/postfix/virtual
+  service postfix restart
+}
+
+configure_nginx() {
+  sed -i "/ssl_certificate_key/a\    location /elb-check { access_log off; return 200 'ok'; add_header Content-Type text/plain; }" /etc/nginx/sites-available/zulip-enterprise
+  service nginx restart
+}
+
+# queue workers take no mail or HTTP traffic, and the web tier (which they
+# depend on) has already initialized and tuned the database
+if [ "$ROLE" == "web" ]; then
+  # with IncomingEmailMode=ses, SES receives mail and postfix is not exposed
+  if [ "${IncomingEmailMode}" != "ses" ]; then
+    phase postfix configure_postfix
+  fi
+  phase nginx configure_nginx
+  phase initialize_database su zulip -c '/home/zulip/deployments/current/scripts/setup/initialize-database'
+  phase tune_tables zulip-bootstrap tune-tables --config /opt/oe/patterns/bootstrap.json
+fi
 
 # turn on supervisor
-systemctl enable supervisor
-systemctl start supervisor
+start_supervisor() {
+  systemctl enable supervisor
+  systemctl start supervisor
+}
+phase supervisor start_supervisor
 success=$?
 
 HOST_ENTRY="${Hostname}"
@@ -217,47 +132,19 @@ if ! grep -q "127.0.0.1.*$HOST_ENTRY" /etc/hosts; then
     sed -i "/127.0.0.1/s/$/ $HOST_ENTRY/" /etc/hosts
 fi
 
-URL="https://${Hostname}"
-TIMEOUT=15
-MAX_RETRIES=20
-
 if [ "$success" -eq 0 ]; then
-  for ((i=1; i<=MAX_RETRIES; i++)); do
-    # Capture headers, body, and status code in one request
-    RESPONSE=$(curl -s --insecure --max-time "$TIMEOUT" -D - -w "||%{http_code}" "$URL")
-    HTTP_CODE="${!RESPONSE##*||}"
-    HTTP_DATA="${!RESPONSE%||*}"  # includes headers + body
-
-    if [ "$HTTP_CODE" -eq 200 ]; then
-      echo "Successfully reached $URL with 200 OK"
-      success=0
-      break
-    elif [ "$HTTP_CODE" -eq 302 ]; then
-      # Check for 'Location: /login/'
-      if echo "$HTTP_DATA" | grep -q -i "Location: .*\/login\/"; then
-        echo "Got 302 redirect to /login/; treating as success."
-        success=0
-        break
-      fi
-    elif [ "$HTTP_CODE" -eq 404 ]; then
-      if echo "$HTTP_DATA" | grep -q "No organization found"; then
-        echo "Got 404 but found 'No organization found'; treating as success."
-        success=0
-        break
-      fi
+  # polls every component with exponential backoff and logs whichever is not ready yet
+  phase readiness zulip-bootstrap wait-ready --config /opt/oe/patterns/bootstrap.json
+  success=$?
+  if [ "$ROLE" == "web" ]; then
+    systemctl enable --now zulip-load-metrics.timer
+    if [ -n "${IncomingEmailQueueUrl}" ]; then
+      systemctl enable --now zulip-email-ingest.service
     fi
-
-    echo "Attempt $i/$MAX_RETRIES failed with HTTP code $HTTP_CODE... retrying in $TIMEOUT seconds..."
-    sleep "$TIMEOUT"
-  done
-
-  if [ "$i" -gt "$MAX_RETRIES" ]; then
-    echo "Failed to reach $URL with a valid response after $MAX_RETRIES attempts."
-    success=1
   fi
 else
-  echo "Service failed to start. Skipping URL checks."
+  echo "Service failed to start. Skipping readiness checks."
   success=1
 fi
 
-cfn-signal --exit-code $success --stack ${AWS::StackName} --resource Asg --region ${AWS::Region}
+signal $success
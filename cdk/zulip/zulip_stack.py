@@ -10,6 +10,8 @@ from aws_cdk import (
     CfnCondition,
     CfnOutput,
     CfnParameter,
+    CfnRule,
+    CfnRuleAssertion,
     Fn,
     Stack,
     Token
@@ -29,7 +31,18 @@ from oe_patterns_cdk_common.ses import Ses
 from oe_patterns_cdk_common.util import Util
 from oe_patterns_cdk_common.vpc import Vpc
 
+from zulip.cdn import Cdn
+from zulip.cfn_lookup import find_cfn
+from zulip.db_parameter_groups import DbParameterGroups
+from zulip.db_proxy import DbProxy
+from zulip.deployment_mode import DeploymentMode, LOCAL_HOST
+from zulip.elasticache_memcached import ElasticacheMemcached
+from zulip.graviton import Graviton
+from zulip.queue_worker_asg import QueueWorkerAsg
+from zulip.ses_inbound_email import SesInboundEmail
+
 AMI_ID="ami-009563187a09bef4a" # ordinary-experts-patterns-zulip-2.0.0-20260503-0127
+AMI_ID_ARM64="" # set from the arm64 build of the next release
 NEXT_RELEASE_PREFIX="v200"
 
 if 'TEMPLATE_VERSION' in os.environ:
@@ -75,7 +88,7 @@ class ZulipStack(Stack):
             resources=[f"arn:aws:s3:::{avatars_bucket_name}/*"],
             principals=[aws_iam.AnyPrincipal()]
         )
-        aws_s3.CfnBucketPolicy(
+        avatars_bucket_policy_resource = aws_s3.CfnBucketPolicy(
             self,
             "AvatarsBucketPolicy",
             bucket=Token.as_string(
@@ -110,6 +123,25 @@ class ZulipStack(Stack):
             vpc=vpc
         )
 
+        db_parameter_groups = DbParameterGroups(
+            self,
+            "DbParameterGroup",
+            db=db
+        )
+
+        db_proxy = DbProxy(
+            self,
+            "DbProxy",
+            db=db,
+            db_secret=db_secret,
+            vpc=vpc
+        )
+
+        deployment_mode = DeploymentMode(
+            self,
+            "DeploymentMode"
+        )
+
         # REDIS
         redis = ElasticacheRedis(
             self,
@@ -117,6 +149,13 @@ class ZulipStack(Stack):
             vpc=vpc
         )
 
+        # MEMCACHED
+        memcached = ElasticacheMemcached(
+            self,
+            "Memcached",
+            vpc=vpc
+        )
+
         # RabbitMQ
         secret = Secret(self, "RabbitMQSecret")
         rabbitmq = RabbitMQ(
@@ -154,34 +193,42 @@ class ZulipStack(Stack):
             policy_name="AllowUpdateInstanceSecret"
         )
 
-        asg_describe_broker_policy = aws_iam.CfnRole.PolicyProperty(
+        asg_describe_memcached_policy = aws_iam.CfnRole.PolicyProperty(
             policy_document=aws_iam.PolicyDocument(
                 statements=[
                     aws_iam.PolicyStatement(
                         effect=aws_iam.Effect.ALLOW,
-                        actions=["mq:DescribeBroker"],
-                        resources=[rabbitmq.broker.attr_arn]
+                        actions=["elasticache:DescribeCacheClusters"],
+                        resources=[f"arn:{Aws.PARTITION}:elasticache:{Aws.REGION}:{Aws.ACCOUNT_ID}:cluster:*"]
                     )
                 ]
             ),
-            policy_name="AllowDescribeRabbitMQBroker"
+            policy_name="AllowDescribeMemcachedCluster"
         )
 
         admin_email_param = CfnParameter(
             self,
             "AdminEmail",
+            # substituted into the bootstrap.json heredoc in user_data.sh, so no
+            # quotes, backslashes, shell expansions or whitespace
+            allowed_pattern=r'^$|^[^\s"\\$`]+@[^\s"\\$`]+$',
+            constraint_description="must be empty or an email address without quotes, backslashes, '$', '`' or whitespace",
             default="",
             description="Optional: The email address to use for the Zulip administrator account. If not specified, 'zulip@{DnsHostname}' will be used. This email address will also receive error emails from the Django backend. The domain on this email address should match the domain of the Zulip site to avoid emails going to spam. This email is only used for the administrator account and is not shared anywhere else."
         )
         giphy_api_key_param = CfnParameter(
             self,
             "GiphyApiKey",
+            allowed_pattern="^[A-Za-z0-9]*$",
+            constraint_description="must be empty or a GIPHY API key (letters and digits)",
             default="",
             description="Optional: GIPHY API Key. See https://zulip.readthedocs.io/en/stable/production/giphy-gif-integration.html"
         )
         sentry_dsn_param = CfnParameter(
             self,
             "SentryDsn",
+            allowed_pattern=r'^$|^https?://[^\s"\\$`]+$',
+            constraint_description="must be empty or a Sentry DSN URL without quotes, backslashes, '$', '`' or whitespace",
             default="",
             description="Optional: Sentry Data Source Name (DSN) endpoint. See https://zulip.readthedocs.io/en/latest/subsystems/logging.html#sentry-error-logging"
         )
@@ -200,11 +247,95 @@ class ZulipStack(Stack):
             default="false",
             description="Required: Enable Mobile Push Notification Support. After settings this to 'true' you still need to register your server as described here: https://zulip.readthedocs.io/en/stable/production/mobile-push-notifications.html"
         )
+        uwsgi_processes_param = CfnParameter(
+            self,
+            "UwsgiProcesses",
+            allowed_pattern="^[0-9]*$",
+            default="",
+            description="Optional: Number of uwsgi (Django) processes per instance. If not specified, it is sized from the vCPUs and memory of the instance type."
+        )
+        queue_workers_mode_param = CfnParameter(
+            self,
+            "QueueWorkersMode",
+            allowed_values=[ "auto", "multiprocess", "threaded" ],
+            default="auto",
+            description="Required: Run Zulip queue workers as one process each ('multiprocess', faster but needs ~2GB more memory) or as threads in a single process ('threaded'). 'auto' picks multiprocess when the instance has enough memory."
+        )
+        tornado_shards_param = CfnParameter(
+            self,
+            "TornadoShards",
+            type="Number",
+            default=1,
+            min_value=1,
+            max_value=16,
+            description="Required: Number of Tornado (real-time events) processes per instance. Realms are spread across them by the first character of their subdomain; use more than 1 only for deployments hosting many realms."
+        )
+        nginx_profile_param = CfnParameter(
+            self,
+            "NginxProfile",
+            allowed_values=[ "conservative", "aggressive" ],
+            default="conservative",
+            description="Required: nginx performance profile. 'aggressive' allows more connections per worker, caches more open static files and buffers larger request bodies in memory; use it on instances that mostly serve many concurrent clients."
+        )
+        uploads_cache_size_param = CfnParameter(
+            self,
+            "UploadsCacheSizeGb",
+            type="Number",
+            default=1,
+            min_value=1,
+            description="Required: Size in GiB of the nginx cache for uploaded files proxied from S3. It is capped to 80% of the filesystem holding the cache."
+        )
+        uploads_cache_placement_param = CfnParameter(
+            self,
+            "UploadsCachePlacement",
+            allowed_values=[ "auto", "root-volume" ],
+            default="auto",
+            description="Required: Where to keep the uploads cache. 'auto' uses NVMe instance storage when the instance type has it (e.g. m6id, c6id) and the root volume otherwise."
+        )
         enable_incoming_email_condition = CfnCondition(
             self,
             "EnableIncomingEmailCondition",
             expression=Fn.condition_equals(enable_incoming_email_param.value, "true")
         )
+        ses_inbound_email = SesInboundEmail(
+            self,
+            "SesInboundEmail",
+            enable_incoming_email_param=enable_incoming_email_param,
+            hostname=dns.hostname()
+        )
+        incoming_email_nlb_condition = ses_inbound_email.nlb_condition
+        incoming_email_dns_layout_param = CfnParameter(
+            self,
+            "IncomingEmailDnsLayout",
+            allowed_values=[ "mail-host", "transition", "shared" ],
+            default="mail-host",
+            description="Required (if incoming email mode is nlb): 'mail-host' points the site's A records at the ALB and the MX record at a dedicated mail.<hostname> record on the NLB, which then only accepts SMTP. That record shadows the *.<hostname> realm wildcard, so with 'mail-host' or 'transition' an organization with the subdomain 'mail' is unreachable: do not create one, or use 'shared'. 'shared' keeps the previous layout, where web traffic also passes through the NLB. When updating a stack created with the shared layout, deploy 'transition' first (new records, NLB still forwarding web traffic for clients with the old records cached) and switch to 'mail-host' once the old records have expired."
+        )
+        incoming_email_shared_dns_condition = CfnCondition(
+            self,
+            "IncomingEmailSharedDnsCondition",
+            expression=Fn.condition_and(
+                incoming_email_nlb_condition,
+                Fn.condition_equals(incoming_email_dns_layout_param.value, "shared")
+            )
+        )
+        incoming_email_mail_host_condition = CfnCondition(
+            self,
+            "IncomingEmailMailHostCondition",
+            expression=Fn.condition_and(
+                incoming_email_nlb_condition,
+                Fn.condition_not(Fn.condition_equals(incoming_email_dns_layout_param.value, "shared"))
+            )
+        )
+        nlb_web_condition = CfnCondition(
+            self,
+            "NlbWebCondition",
+            expression=Fn.condition_and(
+                incoming_email_nlb_condition,
+                Fn.condition_not(Fn.condition_equals(incoming_email_dns_layout_param.value, "mail-host"))
+            )
+        )
+        mail_hostname = f"mail.{dns.hostname()}"
 
         # asg
         with open("zulip/user_data.sh") as f:
@@ -212,7 +343,7 @@ class ZulipStack(Stack):
         asg = Asg(
             self,
             "Asg",
-            additional_iam_role_policies=[asg_update_secret_policy, asg_describe_broker_policy],
+            additional_iam_role_policies=[asg_update_secret_policy, asg_describe_memcached_policy],
             ami_id=AMI_ID,
             ami_id_param_name_suffix=NEXT_RELEASE_PREFIX,
             allow_associate_address = True,
@@ -226,23 +357,65 @@ class ZulipStack(Stack):
             user_data_variables = {
                 "AssetsBucketName": assets_bucket.bucket_name(),
                 "AvatarsBucketName": avatars_bucket.bucket_name(),
+                "DbProxyHost": db_proxy.endpoint(),
                 "DbSecretArn": db_secret.secret_arn(),
                 "EnableIncomingEmail": enable_incoming_email_param.value_as_string,
                 "RabbitMQSecretArn": secret.secret_arn(),
+                "RabbitMQBrokerArn": deployment_mode.if_clustered(rabbitmq.broker.attr_arn, ""),
+                "RedisHost": deployment_mode.if_clustered(redis.elasticache_cluster.attr_redis_endpoint_address, LOCAL_HOST),
                 "Hostname": dns.hostname(),
                 "HostedZoneName": dns.route_53_hosted_zone_name_param.value_as_string,
-                "InstanceSecretName": Aws.STACK_NAME + "/instance/credentials"
+                "IncomingEmailQueueUrl": ses_inbound_email.queue_url(),
+                "InstanceSecretName": Aws.STACK_NAME + "/instance/credentials",
+                "MemcachedClusterId": memcached.cluster_id()
             },
             vpc=vpc
         )
+        graviton = Graviton(
+            self,
+            "Graviton",
+            asg=asg,
+            ami_id=AMI_ID_ARM64,
+            ami_id_param_name_suffix=NEXT_RELEASE_PREFIX
+        )
+
+        # the broker and Redis are referenced from the user data instead of
+        # depended on, since neither exists in single-node mode
         asg.asg.node.add_dependency(db.db_primary_instance)
-        asg.asg.node.add_dependency(rabbitmq.broker)
-        asg.asg.node.add_dependency(redis.elasticache_cluster)
         asg.asg.node.add_dependency(ses.generate_smtp_password_custom_resource)
 
         Util.add_sg_ingress(db, asg.sg)
         Util.add_sg_ingress(rabbitmq, asg.sg)
         Util.add_sg_ingress(redis, asg.sg)
+        deployment_mode.clustered_only(rabbitmq, redis)
+
+        asg_role = find_cfn(asg, aws_iam.CfnRole)
+        asg_describe_broker_policy = aws_iam.CfnPolicy(
+            self,
+            "AsgDescribeBrokerPolicy",
+            policy_document=aws_iam.PolicyDocument(
+                statements=[
+                    aws_iam.PolicyStatement(
+                        effect=aws_iam.Effect.ALLOW,
+                        actions=["mq:DescribeBroker"],
+                        resources=[rabbitmq.broker.attr_arn]
+                    )
+                ]
+            ),
+            policy_name="AllowDescribeRabbitMQBroker",
+            roles=[asg_role.ref]
+        )
+        asg_describe_broker_policy.cfn_options.condition = deployment_mode.clustered_condition
+        memcached.add_ingress(asg.sg)
+        db_proxy.add_ingress(asg.sg)
+        ses_inbound_email.add_consumer(asg)
+
+        queue_worker_asg = QueueWorkerAsg(
+            self,
+            "QueueWorkerAsg",
+            asg=asg,
+            rabbitmq=rabbitmq
+        )
 
         alb = Alb(
             self,
@@ -252,6 +425,44 @@ class ZulipStack(Stack):
             vpc=vpc
         )
 
+        # local RabbitMQ and Redis are not shared between instances
+        CfnRule(
+            self,
+            "DeploymentModeSingleNodeRule",
+            rule_condition=Fn.condition_equals(deployment_mode.deployment_mode_param.value_as_string, "single-node"),
+            assertions=[
+                CfnRuleAssertion(
+                    assert_=Fn.condition_equals(queue_worker_asg.queue_worker_asg_enable_param.value_as_string, "false"),
+                    assert_description="The queue-worker Auto Scaling group needs the clustered deployment mode."
+                )
+            ]
+        )
+        # with Django on the web instance and the queue workers on others, the
+        # per-instance memcached goes stale when another instance writes
+        CfnRule(
+            self,
+            "MemcachedSharedCacheRule",
+            rule_condition=Fn.condition_equals(queue_worker_asg.queue_worker_asg_enable_param.value_as_string, "true"),
+            assertions=[
+                CfnRuleAssertion(
+                    assert_=Fn.condition_equals(memcached.memcached_enable_param.value_as_string, "true"),
+                    assert_description="The queue-worker Auto Scaling group needs the shared ElastiCache Memcached cluster (MemcachedEnable=true)."
+                )
+            ]
+        )
+
+        cdn = Cdn(
+            self,
+            "Cdn",
+            alb=alb,
+            avatars_bucket_name=avatars_bucket_name,
+            hostname=dns.hostname()
+        )
+        avatars_bucket_policy_resource.policy_document = cdn.avatars_bucket_policy_document(
+            avatars_bucket_name,
+            aws_iam.PolicyDocument(statements=[avatars_bucket_policy])
+        )
+
         nlb = aws_elasticloadbalancingv2.CfnLoadBalancer(
             self,
             "Nlb",
@@ -259,7 +470,7 @@ class ZulipStack(Stack):
             subnets=vpc.public_subnet_ids(),
             type="network"
         )
-        nlb.cfn_options.condition = enable_incoming_email_condition
+        nlb.cfn_options.condition = incoming_email_nlb_condition
         nlb.add_dependency(alb.http_listener)
         nlb.add_dependency(alb.https_listener)
 
@@ -271,7 +482,7 @@ class ZulipStack(Stack):
             target_type="instance",
             vpc_id=vpc.id()
         )
-        email_target_group.cfn_options.condition = enable_incoming_email_condition
+        email_target_group.cfn_options.condition = incoming_email_nlb_condition
 
         email_listener = aws_elasticloadbalancingv2.CfnListener(
             self,
@@ -286,13 +497,13 @@ class ZulipStack(Stack):
             port=25,
             protocol="TCP"
         )
-        email_listener.cfn_options.condition = enable_incoming_email_condition
+        email_listener.cfn_options.condition = incoming_email_nlb_condition
 
         email_ingress_cidr_param = CfnParameter(
             self,
             "EmailIngressCidr",
             allowed_pattern=r"^((\d{1,3})\.){3}\d{1,3}/\d{1,2}$",
-            description="Required (if Enable incoming email is true): VPC IPv4 CIDR block to restrict access to inbound email processing. Set to '0.0.0.0/0' to allow all access, or set to 'X.X.X.X/32' to restrict to one IP (replace Xs with your IP), or set to another CIDR range."
+            description="Required (if Enable incoming email is true and the incoming email mode is nlb): VPC IPv4 CIDR block to restrict access to inbound email processing. Set to '0.0.0.0/0' to allow all access, or set to 'X.X.X.X/32' to restrict to one IP (replace Xs with your IP), or set to another CIDR range."
         )
 
         nlb_http_target_group = aws_elasticloadbalancingv2.CfnTargetGroup(
@@ -306,7 +517,7 @@ class ZulipStack(Stack):
             )],
             vpc_id=vpc.id()
         )
-        nlb_http_target_group.cfn_options.condition = enable_incoming_email_condition
+        nlb_http_target_group.cfn_options.condition = nlb_web_condition
 
         nlb_http_listener = aws_elasticloadbalancingv2.CfnListener(
             self,
@@ -321,7 +532,7 @@ class ZulipStack(Stack):
             port=80,
             protocol="TCP"
         )
-        nlb_http_listener.cfn_options.condition = enable_incoming_email_condition
+        nlb_http_listener.cfn_options.condition = nlb_web_condition
 
         nlb_https_target_group = aws_elasticloadbalancingv2.CfnTargetGroup(
             self,
@@ -334,7 +545,7 @@ class ZulipStack(Stack):
             )],
             vpc_id=vpc.id()
         )
-        nlb_https_target_group.cfn_options.condition = enable_incoming_email_condition
+        nlb_https_target_group.cfn_options.condition = nlb_web_condition
 
         nlb_https_listener = aws_elasticloadbalancingv2.CfnListener(
             self,
@@ -349,13 +560,13 @@ class ZulipStack(Stack):
             port=443,
             protocol="TCP"
         )
-        nlb_https_listener.cfn_options.condition = enable_incoming_email_condition
+        nlb_https_listener.cfn_options.condition = nlb_web_condition
 
         asg.asg.add_override(
             "Properties.TargetGroupARNs",
             {
                 "Fn::If": [
-                    enable_incoming_email_condition.logical_id,
+                    incoming_email_nlb_condition.logical_id,
                     [email_target_group.ref, alb.target_group.ref],
                     [alb.target_group.ref]
                 ]
@@ -371,9 +582,53 @@ class ZulipStack(Stack):
             ip_protocol="tcp",
             to_port=25
         )
-        email_sg_ingress.cfn_options.condition = enable_incoming_email_condition
+        email_sg_ingress.cfn_options.condition = incoming_email_nlb_condition
 
         # route 53
+        web_alias_target = cdn.alias_target(
+            Token.as_string(
+                Fn.condition_if(
+                    incoming_email_shared_dns_condition.logical_id,
+                    nlb.attr_dns_name,
+                    alb.alb.attr_dns_name
+                )
+            ),
+            Token.as_string(
+                Fn.condition_if(
+                    incoming_email_shared_dns_condition.logical_id,
+                    nlb.attr_canonical_hosted_zone_id,
+                    alb.alb.attr_canonical_hosted_zone_id
+                )
+            )
+        )
+        # the distribution's viewer certificate and aliases need the ACM certificate
+        CfnRule(
+            self,
+            "CdnCertificateRule",
+            rule_condition=Fn.condition_equals(cdn.cdn_enable_param.value_as_string, "true"),
+            assertions=[
+                CfnRuleAssertion(
+                    assert_=Fn.condition_not(Fn.condition_equals(cdn.cdn_certificate_arn_param.value_as_string, "")),
+                    assert_description="An ACM certificate ARN (CdnCertificateArn) is required when the CloudFront CDN is enabled."
+                )
+            ]
+        )
+        # in the shared layout the MX record points at the web hostname, which CloudFront cannot receive mail for
+        CfnRule(
+            self,
+            "CdnIncomingEmailRule",
+            rule_condition=Fn.condition_equals(cdn.cdn_enable_param.value_as_string, "true"),
+            assertions=[
+                CfnRuleAssertion(
+                    assert_=Fn.condition_or(
+                        Fn.condition_equals(enable_incoming_email_param.value_as_string, "false"),
+                        Fn.condition_equals(ses_inbound_email.incoming_email_mode_param.value_as_string, "ses"),
+                        Fn.condition_not(Fn.condition_equals(incoming_email_dns_layout_param.value_as_string, "shared"))
+                    ),
+                    assert_description="Incoming email must be disabled, use the ses mode or not use the shared DNS layout when the CloudFront CDN is enabled."
+                )
+            ]
+        )
         record_set = aws_route53.CfnRecordSetGroup(
             self,
             "RecordSetGroup",
@@ -384,20 +639,7 @@ class ZulipStack(Stack):
                     name=f"{dns.hostname_param.value_as_string}.",
                     type="A",
                     alias_target=aws_route53.CfnRecordSetGroup.AliasTargetProperty(
-                        dns_name=Token.as_string(
-                            Fn.condition_if(
-                                enable_incoming_email_condition.logical_id,
-                                nlb.attr_dns_name,
-                                alb.alb.attr_dns_name
-                            )
-                        ),
-                        hosted_zone_id=Token.as_string(
-                            Fn.condition_if(
-                                enable_incoming_email_condition.logical_id,
-                                nlb.attr_canonical_hosted_zone_id,
-                                alb.alb.attr_canonical_hosted_zone_id
-                            )
-                        )
+                        **web_alias_target
                     )
                 )
             ]
@@ -414,25 +656,27 @@ class ZulipStack(Stack):
                     name=f"*.{dns.hostname_param.value_as_string}.",
                     type="A",
                     alias_target=aws_route53.CfnRecordSetGroup.AliasTargetProperty(
-                        dns_name=Token.as_string(
-                            Fn.condition_if(
-                                enable_incoming_email_condition.logical_id,
-                                nlb.attr_dns_name,
-                                alb.alb.attr_dns_name
-                            )
-                        ),
-                        hosted_zone_id=Token.as_string(
-                            Fn.condition_if(
-                                enable_incoming_email_condition.logical_id,
-                                nlb.attr_canonical_hosted_zone_id,
-                                alb.alb.attr_canonical_hosted_zone_id
-                            )
-                        )
+                        **web_alias_target
                     )
                 )
             ]
         )
 
+        # the explicit record takes precedence over the *.<hostname> realm wildcard,
+        # so a realm with the subdomain "mail" is unreachable (see IncomingEmailDnsLayout)
+        mail_record_set = aws_route53.CfnRecordSet(
+            self,
+            "MailRecordSet",
+            hosted_zone_name=f"{dns.route_53_hosted_zone_name_param.value_as_string}.",
+            name=f"{mail_hostname}.",
+            type="A",
+            alias_target=aws_route53.CfnRecordSet.AliasTargetProperty(
+                dns_name=nlb.attr_dns_name,
+                hosted_zone_id=nlb.attr_canonical_hosted_zone_id
+            )
+        )
+        mail_record_set.cfn_options.condition = incoming_email_mail_host_condition
+
         # add MX record to support incoming email
         email_record_set = aws_route53.CfnRecordSet(
             self,
@@ -444,6 +688,16 @@ class ZulipStack(Stack):
             ],
             type="MX"
         )
+        email_record_set.add_property_override(
+            "ResourceRecords",
+            ses_inbound_email.mx_records(
+                Fn.condition_if(
+                    incoming_email_shared_dns_condition.logical_id,
+                    [f"1 {dns.hostname()}."],
+                    [f"1 {mail_hostname}."]
+                )
+            )
+        )
         email_record_set.add_property_override("TTL", 3600)
         email_record_set.cfn_options.condition = enable_incoming_email_condition
 
@@ -470,21 +724,45 @@ class ZulipStack(Stack):
                     sentry_dsn_param.logical_id,
                     enable_mobile_push_notifications_param.logical_id,
                     enable_incoming_email_param.logical_id,
+                    ses_inbound_email.incoming_email_mode_param.logical_id,
+                    ses_inbound_email.incoming_email_rule_set_name_param.logical_id,
+                    incoming_email_dns_layout_param.logical_id,
                     email_ingress_cidr_param.logical_id
                 ]
             }
         ]
+        parameter_groups += [
+            {
+                "Label": { "default": "Application Performance" },
+                "Parameters": [
+                    deployment_mode.deployment_mode_param.logical_id,
+                    uwsgi_processes_param.logical_id,
+                    queue_workers_mode_param.logical_id,
+                    tornado_shards_param.logical_id,
+                    nginx_profile_param.logical_id,
+                    uploads_cache_size_param.logical_id,
+                    uploads_cache_placement_param.logical_id
+                ]
+            }
+        ]
         parameter_groups += alb.metadata_parameter_group()
+        parameter_groups += cdn.metadata_parameter_group()
         parameter_groups += dns.metadata_parameter_group()
         parameter_groups += db.metadata_parameter_group()
         parameter_groups += db_secret.metadata_parameter_group()
+        parameter_groups += db_parameter_groups.metadata_parameter_group()
+        parameter_groups += db_proxy.metadata_parameter_group()
         parameter_groups += ses.metadata_parameter_group()
         parameter_groups += assets_bucket.metadata_parameter_group()
         parameter_groups += avatars_bucket.metadata_parameter_group()
         parameter_groups += rabbitmq.metadata_parameter_group()
         parameter_groups += secret.metadata_parameter_group()
         parameter_groups += redis.metadata_parameter_group()
-        parameter_groups += asg.metadata_parameter_group()
+        parameter_groups += memcached.metadata_parameter_group()
+        asg_parameter_groups = asg.metadata_parameter_group()
+        asg_parameter_groups[0]["Parameters"].append(graviton.arm64_ami_id_param.logical_id)
+        parameter_groups += asg_parameter_groups
+        parameter_groups += queue_worker_asg.metadata_parameter_group()
         parameter_groups += vpc.metadata_parameter_group()
 
         # AWS::CloudFormation::Interface
@@ -508,20 +786,49 @@ class ZulipStack(Stack):
                     enable_incoming_email_param.logical_id: {
                         "default": "Enable incoming email"
                     },
+                    incoming_email_dns_layout_param.logical_id: {
+                        "default": "Incoming email DNS layout"
+                    },
                     email_ingress_cidr_param.logical_id: {
                         "default": "Incoming email ingress CIDR"
                     },
+                    uwsgi_processes_param.logical_id: {
+                        "default": "uwsgi processes"
+                    },
+                    queue_workers_mode_param.logical_id: {
+                        "default": "Queue workers mode"
+                    },
+                    tornado_shards_param.logical_id: {
+                        "default": "Tornado shards"
+                    },
+                    nginx_profile_param.logical_id: {
+                        "default": "nginx profile"
+                    },
+                    uploads_cache_size_param.logical_id: {
+                        "default": "Uploads cache size (GiB)"
+                    },
+                    uploads_cache_placement_param.logical_id: {
+                        "default": "Uploads cache placement"
+                    },
                     **alb.metadata_parameter_labels(),
+                    **cdn.metadata_parameter_labels(),
                     **dns.metadata_parameter_labels(),
                     **db.metadata_parameter_labels(),
                     **db_secret.metadata_parameter_labels(),
+                    **db_parameter_groups.metadata_parameter_labels(),
+                    **db_proxy.metadata_parameter_labels(),
                     **ses.metadata_parameter_labels(),
                     **assets_bucket.metadata_parameter_labels(),
                     **avatars_bucket.metadata_parameter_labels(),
                     **rabbitmq.metadata_parameter_labels(),
                     **secret.metadata_parameter_labels(),
                     **redis.metadata_parameter_labels(),
+                    **deployment_mode.metadata_parameter_labels(),
+                    **memcached.metadata_parameter_labels(),
                     **asg.metadata_parameter_labels(),
+                    **ses_inbound_email.metadata_parameter_labels(),
+                    **queue_worker_asg.metadata_parameter_labels(),
+                    **graviton.metadata_parameter_labels(),
                     **vpc.metadata_parameter_labels()
                 }
             }
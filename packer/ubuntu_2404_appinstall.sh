@@ -10,6 +10,12 @@ chmod +x "$SCRIPT_PREINSTALL"
 ./"$SCRIPT_PREINSTALL"
 rm $SCRIPT_PREINSTALL
 
+# the same script bakes the x86_64 and arm64 (Graviton) AMIs; everything below
+# comes from apt, pip or Zulip's installer, which pick the architecture
+# themselves, so only fail fast if the preinstalled agent doesn't run here
+echo "Baking for $(dpkg --print-architecture)"
+/opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent -version
+
 #
 # Zulip configuration
 #
@@ -105,9 +111,15 @@ cat <<EOF > /opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json
             "timezone": "UTC"
           },
           {
-            "file_path": "/var/log/nginx/access.log",
+            "file_path": "/var/log/nginx/access.json.log",
+            "log_group_name": "ASG_APP_LOG_GROUP_PLACEHOLDER",
+            "log_stream_name": "{instance_id}-/var/log/nginx/access.json.log",
+            "timezone": "UTC"
+          },
+          {
+            "file_path": "/var/log/nginx/s3-cache.log",
             "log_group_name": "ASG_APP_LOG_GROUP_PLACEHOLDER",
-            "log_stream_name": "{instance_id}-/var/log/nginx/access.log",
+            "log_stream_name": "{instance_id}-/var/log/nginx/s3-cache.log",
             "timezone": "UTC"
           },
           {
@@ -122,6 +134,12 @@ cat <<EOF > /opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json
             "log_stream_name": "{instance_id}-/var/log/zulip/all-logs",
             "timezone": "UTC"
           },
+          {
+            "file_path": "/var/log/oe-zulip/metrics.log",
+            "log_group_name": "ASG_APP_LOG_GROUP_PLACEHOLDER",
+            "log_stream_name": "{instance_id}-/var/log/oe-zulip/metrics.log",
+            "timezone": "UTC"
+          },
           {
             "file_path": "/var/log/mail.log",
             "log_group_name": "ASG_APP_LOG_GROUP_PLACEHOLDER",
@@ -137,7 +155,21 @@ cat <<EOF > /opt/aws/amazon-cloudwatch-agent/etc/amazon-cloudwatch-agent.json
 EOF
 
 # Dependencies
-apt-get update && apt-get install -y gettext memcached
+apt-get update && apt-get install -y brotli gettext memcached
+
+# memcached hits, misses, evictions and bytes used, sent through collectd to
+# the CloudWatch agent (CWAgent namespace, collectd_memcached_* metrics); the
+# memory and connection limits are sized at boot by zulip-bootstrap
+mkdir -p /etc/collectd/collectd.conf.d
+cat <<EOF > /etc/collectd/collectd.conf.d/memcached.conf
+LoadPlugin memcached
+<Plugin memcached>
+  <Instance "local">
+    Host "127.0.0.1"
+    Port "11211"
+  </Instance>
+</Plugin>
+EOF
 
 # Download & unpack Zulip files
 mkdir -p /root/zulipfiles
@@ -154,69 +186,157 @@ tar -xf zulip-server-$ZULIP_VERSION.tar.gz
 
 # front-end install
 PUPPET_CLASSES='zulip::profile::app_frontend, zulip::local_mailserver, zulip::process_fts_updates' ./zulip-server-$ZULIP_VERSION/scripts/setup/install --self-signed-cert --no-init-db
+
+# brotli_static for the nginx performance profile applied at boot
+apt-get install -y libnginx-mod-http-brotli-static
+
+# pre-compress static assets so nginx serves .gz/.br siblings (gzip_static,
+# brotli_static) instead of compressing on every request
+find /home/zulip/prod-static -type f \
+  \( -name '*.js' -o -name '*.css' -o -name '*.svg' -o -name '*.json' -o -name '*.map' -o -name '*.txt' -o -name '*.html' -o -name '*.ttf' \) \
+  -size +1k -print0 | \
+  xargs -0 -P "$(nproc)" -n 64 sh -c 'for f; do gzip -k -9 -f "$f" && brotli -k -f -q 11 "$f"; done' sh
+
+# set PREWARM_AMI=false to bake a cold image for time-to-ready comparisons
+# (see test/performance/README.md)
+PREWARM_AMI=${PREWARM_AMI:-true}
+
+# precompile bytecode for the deployment and its virtualenv (installed by uv,
+# which does not compile) so the first requests after boot don't pay for it;
+# a few test fixtures are intentionally not valid Python, hence `|| true`
+if [ "$PREWARM_AMI" == "true" ]; then
+  ZULIP_DEPLOY_DIR=$(readlink -f /home/zulip/deployments/current)
+  ZULIP_VENV_DIR=$(readlink -f $ZULIP_DEPLOY_DIR/zulip-current-venv)
+  $ZULIP_VENV_DIR/bin/python3 -m compileall -q -j 0 $ZULIP_VENV_DIR || true
+  su zulip -c "$ZULIP_VENV_DIR/bin/python3 -m compileall -q -j 0 $ZULIP_DEPLOY_DIR" || true
+fi
+
+# bake-time self-check: bring the app server up against throwaway local
+# Postgres/RabbitMQ/Redis so a broken build fails the bake instead of the
+# first stack deploy, then remove every trace of the throwaway services
+zulip_self_check() {
+  dpkg-query -W -f='${Package}\n' | sort > /root/packages.before
+  apt-get install -y postgresql redis-server rabbitmq-server
+  dpkg-query -W -f='${Package}\n' | sort > /root/packages.after
+  cp /etc/zulip/settings.py /root/settings.py.baked
+  cp /etc/zulip/zulip.conf /root/zulip.conf.baked
+  cat <<EOF >> /etc/zulip/settings.py
+EXTERNAL_HOST = "localhost"
+ZULIP_ADMINISTRATOR = "zulip@localhost"
+EOF
+  crudini --set /etc/zulip/zulip.conf postgresql missing_dictionaries true
+  # the throwaway redis and memcached run without auth
+  sed -i '/^\(redis\|memcached\)_password/d' /etc/zulip/zulip-secrets.conf
+
+  su postgres -c "psql -c 'CREATE USER zulip'"
+  su postgres -c "psql -c 'CREATE DATABASE zulip OWNER zulip'"
+  su postgres -c "psql -c 'ALTER ROLE zulip SET search_path TO zulip,public'"
+  su zulip -c "psql -d zulip -c 'CREATE SCHEMA zulip AUTHORIZATION zulip'"
+  /home/zulip/deployments/current/scripts/setup/configure-rabbitmq
+  su zulip -c '/home/zulip/deployments/current/scripts/setup/initialize-database'
+  supervisorctl restart all
+
+  local ready=1
+  for i in $(seq 1 60); do
+    if curl -sk -H 'Host: localhost' https://127.0.0.1/ | grep -q "No organization found"; then
+      echo "Self-check: Zulip served the no-organization page after $i attempts"
+      ready=0
+      break
+    fi
+    sleep 2
+  done
+  if [ "$ready" -ne 0 ]; then
+    supervisorctl status || true
+    tail -n 100 /var/log/zulip/errors.log /var/log/zulip/server.log || true
+  fi
+
+  supervisorctl stop all
+  systemctl stop postgresql redis-server rabbitmq-server
+  comm -13 /root/packages.before /root/packages.after | xargs apt-get purge -y
+  rm -f /root/packages.before /root/packages.after
+  rm -rf /var/lib/postgresql /var/lib/rabbitmq /var/lib/redis /etc/postgresql
+  mv /root/settings.py.baked /etc/zulip/settings.py
+  mv /root/zulip.conf.baked /etc/zulip/zulip.conf
+  return $ready
+}
+if [ "${IN_DOCKER:-false}" != "true" ] && [ "$PREWARM_AMI" == "true" ]; then
+  zulip_self_check
+fi
+# DeploymentMode=single-node runs RabbitMQ and Redis on the instance through
+# Zulip's puppet profiles; ship the packages so boot doesn't download them,
+# but leave them off (and without the bake host's RabbitMQ node data) for
+# clustered deployments
+apt-get install -y rabbitmq-server redis-server
+systemctl disable --now rabbitmq-server redis-server
+rm -rf /var/lib/rabbitmq/mnesia
+
+# the bootstrap agent re-applies puppet at boot only if zulip.conf differs from this
+cp /etc/zulip/zulip.conf /etc/zulip/zulip.conf.applied
+
 rm -f /etc/ssl/certs/ssl-cert-snakeoil.pem
 rm -rf /var/log/zulip/*
 rm -f /etc/zulip/zulip-secrets.conf
 
 pip install boto3 --break-system-packages
-cat <<EOF > /root/check-secrets.py
-#!/usr/bin/env python3
-
-import boto3
-import json
-import subprocess
-import sys
-import uuid
-
-region_name = sys.argv[1]
-secret_name = sys.argv[2]
-
-client = boto3.client("secretsmanager", region_name=region_name)
-response = client.list_secrets(
-  Filters=[{"Key": "name", "Values": [secret_name]}]
-)
-arn = response["SecretList"][0]["ARN"]
-response = client.get_secret_value(
-  SecretId=arn
-)
-current_secret = json.loads(response["SecretString"])
-needs_update = False
-
-NEEDED_SECRETS_WITH_SIMILAR_REQUIREMENTS = [
-    "avatar_salt",
-    "camo_key",
-    "shared_secret",
-    "zulip_org_key"
-]
-for secret in NEEDED_SECRETS_WITH_SIMILAR_REQUIREMENTS:
-  if not secret in current_secret:
-    needs_update = True
-    cmd = "random_value=\$(seed=\$(date +%s%N); tr -dc '[:alnum:]' < /dev/urandom | head -c 32; echo \$seed | sha256sum | awk '{print substr(\$1, 1, 32)}'); echo \$random_value"
-    output = subprocess.run(cmd, stdout=subprocess.PIPE, shell=True).stdout.decode('utf-8').strip()
-    current_secret[secret] = output
-if not 'secret_key' in current_secret:
-    needs_update = True
-    cmd = "random_value=\$(seed=\$(date +%s%N); tr -dc 'abcdefghijklmnopqrstuvwxyz0123456789!@#$%^&*(-_=+)' < /dev/urandom | head -c 25; echo \$seed | sha256sum | awk '{print substr(\$1, 1, 25)}'); echo \$random_value"
-    output = subprocess.run(cmd, stdout=subprocess.PIPE, shell=True).stdout.decode('utf-8').strip()
-    current_secret['secret_key'] = output
-if not 'zulip_org_id' in current_secret:
-    needs_update = True
-    current_secret['zulip_org_id'] = str(uuid.uuid4())
-
-if needs_update:
-  client.update_secret(
-    SecretId=arn,
-    SecretString=json.dumps(current_secret)
-  )
-else:
-  print('Secrets already generated - no action needed.')
+
+# first-boot bootstrap agent (uploaded to /tmp/zulip_bootstrap by packer)
+mkdir -p /usr/local/lib/zulip-bootstrap
+rm -rf /usr/local/lib/zulip-bootstrap/zulip_bootstrap
+cp -r /tmp/zulip_bootstrap /usr/local/lib/zulip-bootstrap/zulip_bootstrap
+find /usr/local/lib/zulip-bootstrap -name __pycache__ -prune -exec rm -rf {} +
+rm -rf /tmp/zulip_bootstrap
+python3 -m compileall -q /usr/local/lib/zulip-bootstrap
+cat <<EOF > /usr/local/bin/zulip-bootstrap
+#!/bin/bash
+PYTHONPATH=/usr/local/lib/zulip-bootstrap exec /usr/bin/python3 -m zulip_bootstrap "\$@"
+EOF
+chmod 755 /usr/local/bin/zulip-bootstrap
+
+# per-minute Tornado load metric for web tier target tracking and per-route
+# latency histograms from the JSON access log; enabled at first boot on web
+# instances only
+cat <<EOF > /etc/systemd/system/zulip-load-metrics.service
+[Unit]
+Description=Publish Zulip Tornado load and request latency metrics
+
+[Service]
+Type=oneshot
+ExecStart=/usr/local/bin/zulip-bootstrap load-metrics
+EOF
+cat <<EOF > /etc/systemd/system/zulip-load-metrics.timer
+[Unit]
+Description=Publish Zulip Tornado load and request latency metrics every minute
+
+[Timer]
+OnActiveSec=60
+OnUnitActiveSec=60
+AccuracySec=5
+
+[Install]
+WantedBy=timers.target
+EOF
+
+# incoming email consumer for IncomingEmailMode=ses; enabled at first boot
+cat <<EOF > /etc/systemd/system/zulip-email-ingest.service
+[Unit]
+Description=Deliver incoming email received by SES to Zulip
+After=network-online.target nginx.service supervisor.service
+
+[Service]
+ExecStart=/usr/local/bin/zulip-bootstrap email-ingest
+Restart=always
+RestartSec=10
+
+[Install]
+WantedBy=multi-user.target
 EOF
-chown root:root /root/check-secrets.py
-chmod 744 /root/check-secrets.py
+systemctl daemon-reload
 
 # download RDS pem cert
 mkdir -p /home/zulip/.postgresql
 wget -O /home/zulip/.postgresql/root.crt https://truststore.pki.rds.amazonaws.com/global/global-bundle.pem
+# RDS Proxy presents an ACM certificate chained to the Amazon Root CAs
+cat /etc/ssl/certs/Amazon_Root_CA_*.pem >> /home/zulip/.postgresql/root.crt
 chown zulip:zulip /home/zulip/.postgresql/root.crt
 chmod 600 /home/zulip/.postgresql/root.crt
 
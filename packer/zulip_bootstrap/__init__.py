@@ -0,0 +1,7 @@
+"""
+First-boot bootstrap agent for the Zulip pattern.
+
+Baked into the AMI by `ubuntu_2404_appinstall.sh` and invoked from the ASG
+user data. It resolves every secret and endpoint the instance needs in
+parallel and renders Zulip's configuration files in a single pass.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from zulip_bootstrap.cli import main
+
+sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Concurrent resolution of the secrets and endpoints an instance needs at boot.
+
+All calls share one boto3 session and a pooled set of clients; the lookups are
+independent so they run side by side instead of one after another.
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from zulip_bootstrap import instance_secret, local_services
+from zulip_bootstrap.config import BootstrapConfig
+
+MAX_POOL_CONNECTIONS = 10
+LOCAL_MEMCACHED = "127.0.0.1:11211"
+
+
+@dataclass
+class BootstrapSecrets:
+    db: Dict[str, str]
+    rabbitmq: Dict[str, str]
+    instance: Dict[str, str]
+    rabbitmq_host: str
+    memcached_location: str = LOCAL_MEMCACHED
+
+
+class AwsClients:
+    """The boto3 clients used at boot, created once from a single session."""
+
+    def __init__(self, secretsmanager, mq, ec2=None, elasticache=None, sqs=None, s3=None):
+        self.secretsmanager = secretsmanager
+        self.mq = mq
+        self.ec2 = ec2
+        self.elasticache = elasticache
+        self.sqs = sqs
+        self.s3 = s3
+
+    @classmethod
+    def from_session(cls, region: str, session: Optional[Any] = None) -> "AwsClients":
+        import boto3
+        from botocore.config import Config
+
+        session = session or boto3.session.Session(region_name=region)
+        client_config = Config(
+            max_pool_connections=MAX_POOL_CONNECTIONS,
+            retries={"mode": "standard", "max_attempts": 5},
+        )
+        return cls(
+            secretsmanager=session.client("secretsmanager", config=client_config),
+            mq=session.client("mq", config=client_config),
+            ec2=session.client("ec2", config=client_config),
+            elasticache=session.client("elasticache", config=client_config),
+            sqs=session.client("sqs", config=client_config),
+            s3=session.client("s3", config=client_config),
+        )
+
+
+def get_secret_json(secretsmanager, secret_id: str) -> Dict[str, str]:
+    response = secretsmanager.get_secret_value(SecretId=secret_id)
+    return json.loads(response["SecretString"])
+
+
+def ensure_instance_secret(secretsmanager, secret_name: str) -> Dict[str, str]:
+    """Read the shared instance secret, generating and storing any missing Zulip keys."""
+    current = get_secret_json(secretsmanager, secret_name)
+    updated, changed = instance_secret.fill_missing(current)
+    if changed:
+        secretsmanager.update_secret(
+            SecretId=secret_name,
+            SecretString=json.dumps(updated),
+        )
+    return updated
+
+
+def rabbitmq_host(mq, broker_id: str) -> str:
+    """Return the broker hostname.
+
+    Amazon MQ moved endpoints from .amazonaws.com to .on.aws, so the host is
+    taken from DescribeBroker rather than derived from the broker id.
+    """
+    response = mq.describe_broker(BrokerId=broker_id)
+    endpoint = response["BrokerInstances"][0]["Endpoints"][0]
+    endpoint = re.sub(r"^amqps?://", "", endpoint)
+    return re.sub(r":[0-9]+$", "", endpoint)
+
+
+def memcached_location(elasticache, cluster_id: str) -> str:
+    """Return every node of the shared Memcached cluster as a Django cache LOCATION.
+
+    Zulip's memcached client writes to all listed servers, so the nodes are
+    sorted to give every instance the same read order.
+    """
+    response = elasticache.describe_cache_clusters(CacheClusterId=cluster_id, ShowCacheNodeInfo=True)
+    nodes = sorted(response["CacheClusters"][0]["CacheNodes"], key=lambda node: node["CacheNodeId"])
+    return ",".join(f"{node['Endpoint']['Address']}:{node['Endpoint']['Port']}" for node in nodes)
+
+
+def fetch_all(config: BootstrapConfig, clients: AwsClients) -> BootstrapSecrets:
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        db = pool.submit(get_secret_json, clients.secretsmanager, config.db_secret_arn)
+        rabbitmq = pool.submit(get_secret_json, clients.secretsmanager, config.rabbitmq_secret_arn)
+        instance = pool.submit(ensure_instance_secret, clients.secretsmanager, config.instance_secret_name)
+        host = None
+        if not (config.single_node or config.rabbitmq_host):
+            host = pool.submit(rabbitmq_host, clients.mq, config.rabbitmq_broker_id)
+        memcached = None
+        if config.memcached_cluster_id:
+            memcached = pool.submit(memcached_location, clients.elasticache, config.memcached_cluster_id)
+        return BootstrapSecrets(
+            db=db.result(),
+            rabbitmq=rabbitmq.result(),
+            instance=instance.result(),
+            rabbitmq_host=host.result() if host else config.rabbitmq_host or local_services.LOCAL_HOST,
+            memcached_location=memcached.result() if memcached else LOCAL_MEMCACHED,
+        )
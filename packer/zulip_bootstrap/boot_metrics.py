@@ -0,0 +1,61 @@
+"""
+Per-phase boot durations and time-to-ready as embedded metrics.
+
+Dimensions carry the AMI, instance type and ASG name so time-to-ready can be
+compared between AMI releases and instance sizes.
+"""
+
+from typing import Dict, List, Optional
+
+from zulip_bootstrap import emf
+from zulip_bootstrap.phases import Phase
+
+PHASE_DIMENSION_SETS = [
+    ["AutoScalingGroupName", "ImageId", "InstanceType", "Phase"],
+    ["ImageId", "Phase"],
+]
+SUMMARY_DIMENSION_SETS = [
+    ["AutoScalingGroupName", "ImageId", "InstanceType"],
+    ["ImageId"],
+]
+
+
+def kernel_boot_time_ms(proc_stat: str = "/proc/stat") -> Optional[int]:
+    with open(proc_stat) as f:
+        for line in f:
+            if line.startswith("btime "):
+                return int(line.split()[1]) * 1000
+    return None
+
+
+def build_records(
+    phases: List[Phase],
+    dimensions: Dict[str, str],
+    exit_code: int,
+    ready_ms: int,
+    boot_ms: Optional[int],
+) -> List[Dict[str, object]]:
+    records = []
+    for phase in phases:
+        records.append(emf.record(
+            {"PhaseDuration": (phase.duration_ms, "Milliseconds")},
+            dict(dimensions, Phase=phase.name),
+            PHASE_DIMENSION_SETS,
+            timestamp_ms=phase.end_ms,
+            properties={"ExitCode": phase.exit_code},
+        ))
+
+    summary: emf.Metrics = {"BootFailure": (0 if exit_code == 0 else 1, "Count")}
+    if phases:
+        first_start = min(phase.start_ms for phase in phases)
+        summary["UserDataDuration"] = (ready_ms - first_start, "Milliseconds")
+    if boot_ms is not None:
+        summary["TimeToReady"] = (ready_ms - boot_ms, "Milliseconds")
+    records.append(emf.record(
+        summary,
+        dimensions,
+        SUMMARY_DIMENSION_SETS,
+        timestamp_ms=ready_ms,
+        properties={"ExitCode": exit_code},
+    ))
+    return records
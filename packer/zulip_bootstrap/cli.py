@@ -0,0 +1,275 @@
+"""
+Command line entry point, installed on the AMI as `zulip-bootstrap`.
+"""
+
+import argparse
+import logging
+import time
+from typing import List, Optional
+
+from zulip_bootstrap import (
+    aws,
+    boot_metrics,
+    config,
+    database,
+    email_ingest,
+    emf,
+    instance_metadata,
+    latency_metrics,
+    load_metrics,
+    local_services,
+    memcached,
+    nginx,
+    phases,
+    process_model,
+    puppet,
+    readiness,
+    render,
+    roles,
+    sharding,
+    uploads_cache,
+)
+
+DEFAULT_CONFIG = "/opt/oe/patterns/bootstrap.json"
+
+log = logging.getLogger("zulip_bootstrap")
+
+
+def configure(args: argparse.Namespace) -> int:
+    """Fetch secrets, render Zulip's configuration and prepare the database."""
+    boot_config = config.load(args.config)
+    clients = aws.AwsClients.from_session(boot_config.region)
+    with phases.timed("fetch_secrets"):
+        secrets = aws.fetch_all(boot_config, clients)
+    log.info("Fetched secrets; RabbitMQ host is %s", secrets.rabbitmq_host)
+    config.save_state({
+        "rabbitmq_host": secrets.rabbitmq_host,
+        "memcached_location": secrets.memcached_location,
+    })
+
+    role = config.load_state().get("role", roles.WEB)
+    vcpus, mem_mb = process_model.detect()
+    local_memcached = not boot_config.memcached_cluster_id
+    model = process_model.plan(
+        vcpus,
+        mem_mb,
+        uwsgi_processes=int(boot_config.uwsgi_processes) if boot_config.uwsgi_processes else None,
+        queue_workers_mode=boot_config.queue_workers_mode,
+        tornado_processes=int(boot_config.tornado_shards),
+        web=role == roles.WEB,
+        queue_workers=role == roles.QUEUE_WORKER or not boot_config.queue_worker_asg_enabled,
+        memcached_mb=memcached.memory_mb(mem_mb) if local_memcached else 0,
+        local_services=boot_config.single_node,
+    )
+    log.info(
+        "Process model for %d vCPUs / %d MiB: %d uwsgi processes, multiprocess queue workers %s",
+        vcpus, mem_mb, model.uwsgi_processes, model.queue_workers_multiprocess,
+    )
+
+    if local_memcached:
+        with phases.timed("memcached_size"):
+            cache = memcached.size(vcpus, mem_mb, model, int(boot_config.tornado_shards) if role == roles.WEB else 0)
+            memcached.apply(cache)
+        log.info(
+            "memcached sized to %d MiB, %d connections, %d threads",
+            cache.memory_mb, cache.max_connections, cache.threads,
+        )
+
+    s3_disk_cache_mb = None
+    if role == roles.WEB:
+        with phases.timed("uploads_cache"):
+            device = uploads_cache.prepare(boot_config.uploads_cache_placement)
+            s3_disk_cache_mb = uploads_cache.disk_cache_mb(int(boot_config.uploads_cache_size_gb))
+        log.info("S3 uploads cache: %d MiB on %s", s3_disk_cache_mb, device or "the root volume")
+
+    with phases.timed("render_config"):
+        render.write_all(render.render_all(boot_config, secrets, model, s3_disk_cache_mb))
+    log.info("Rendered Zulip configuration in %s", render.ZULIP_ETC)
+
+    if not args.skip_puppet:
+        with phases.timed("puppet_apply"):
+            applied = puppet.apply_if_changed()
+            sharding.promote_staged()
+        log.info("zulip.conf %s", "changed; re-applied puppet" if applied else "unchanged; skipped puppet")
+    if boot_config.single_node:
+        with phases.timed("local_services"):
+            local_services.start()
+        log.info("Started local RabbitMQ and Redis")
+    disabled = roles.apply(role, boot_config.queue_worker_asg_enabled)
+    # stopped with autostart=false; wait-ready must not wait for them
+    config.save_state({"disabled_programs": sorted(disabled)})
+
+    if role == roles.WEB:
+        with phases.timed("nginx_profile"):
+            tuned = nginx.apply(boot_config.nginx_profile, vcpus)
+        log.info("nginx %s profile %s", boot_config.nginx_profile, "applied" if tuned else "rejected by nginx -t; kept defaults")
+
+    if not args.skip_database:
+        with phases.timed("prepare_database"):
+            database.prepare(boot_config, secrets.db["username"], secrets.db["password"])
+        log.info("Prepared database schema on %s", boot_config.db_host)
+    return 0
+
+
+def tune_tables(args: argparse.Namespace) -> int:
+    """Apply per-table autovacuum settings once initialize-database has created Zulip's tables."""
+    boot_config = config.load(args.config)
+    clients = aws.AwsClients.from_session(boot_config.region)
+    db = aws.get_secret_json(clients.secretsmanager, boot_config.db_secret_arn)
+    database.tune_tables(boot_config, db["username"], db["password"])
+    log.info("Applied per-table autovacuum settings on %s", boot_config.db_host)
+    return 0
+
+
+def resolve_role(args: argparse.Namespace) -> int:
+    """Print this instance's role (web or queue_worker) from its Auto Scaling group tag."""
+    boot_config = config.load(args.config)
+    role = roles.WEB
+    try:
+        clients = aws.AwsClients.from_session(boot_config.region)
+        instance_id = instance_metadata.identity()["InstanceId"]
+        role = roles.resolve(lambda key: instance_metadata.instance_tag(clients.ec2, instance_id, key))
+    except Exception:
+        log.exception("Could not read the role tag; assuming %s", role)
+    config.save_state({"role": role})
+    print(role)
+    return 0
+
+
+def wait_ready(args: argparse.Namespace) -> int:
+    """Probe supervisor, Django, Tornado, Postgres, Redis and RabbitMQ until all are healthy."""
+    boot_config = config.load(args.config)
+    state = config.load_state()
+    checks = readiness.default_checks(
+        hostname=boot_config.hostname,
+        db_host=boot_config.app_db_host,
+        redis_host=boot_config.redis_host,
+        rabbitmq_host=state.get("rabbitmq_host", ""),
+        rabbitmq_port=boot_config.rabbitmq_port,
+        rabbitmq_use_tls=boot_config.rabbitmq_use_tls,
+        tornado_ports=sharding.ports(int(boot_config.tornado_shards)),
+        memcached_location=state.get("memcached_location", ""),
+        disabled_programs=state.get("disabled_programs", []),
+    )
+    if state.get("role") == roles.QUEUE_WORKER:
+        # queue workers serve no HTTP; they only need supervisor and the backends
+        checks = [check for check in checks if not check.name.startswith(("django", "tornado"))]
+    ready, _ = readiness.wait_until_ready(checks, deadline_seconds=args.timeout)
+    return 0 if ready else 1
+
+
+def publish_boot_metrics(args: argparse.Namespace) -> int:
+    """Write boot phase durations and time-to-ready as CloudWatch embedded metrics."""
+    ready_ms = phases.now_ms()
+    dimensions = instance_metadata.identity()
+    try:
+        boot_config = config.load(args.config)
+        clients = aws.AwsClients.from_session(boot_config.region)
+        dimensions["AutoScalingGroupName"] = instance_metadata.autoscaling_group_name(
+            clients.ec2, dimensions["InstanceId"]
+        ) or ""
+    except Exception:
+        # metrics are best effort; never fail the boot over a missing dimension
+        log.exception("Could not resolve the Auto Scaling group name")
+    instance_id = dimensions.pop("InstanceId", "")
+
+    records = boot_metrics.build_records(
+        phases.read(),
+        dimensions,
+        args.exit_code,
+        ready_ms,
+        boot_metrics.kernel_boot_time_ms(),
+    )
+    for record in records:
+        record["InstanceId"] = instance_id
+    emf.write(records)
+    log.info("Wrote %d boot metric records to %s", len(records), emf.METRICS_LOG)
+    return 0
+
+
+def publish_load_metrics(args: argparse.Namespace) -> int:
+    """Write this instance's in-flight Tornado long-polls and per-route latency as embedded metrics."""
+    boot_config = config.load(args.config)
+    state = config.load_state()
+    instance_id = state.get("instance_id", "")
+    asg_name = state.get("autoscaling_group_name", "")
+    if not asg_name:
+        # resolved once and cached; the timer runs every minute
+        instance_id = instance_metadata.identity()["InstanceId"]
+        clients = aws.AwsClients.from_session(boot_config.region)
+        asg_name = instance_metadata.autoscaling_group_name(clients.ec2, instance_id) or ""
+        config.save_state({"instance_id": instance_id, "autoscaling_group_name": asg_name})
+
+    dimensions = {"AutoScalingGroupName": asg_name}
+    lines, position = latency_metrics.read_new_lines(
+        nginx.JSON_ACCESS_LOG,
+        tuple(state.get("access_log_position", (0, 0))),
+    )
+    now = time.time()
+    records = []
+    # the first run reads the log from boot, so there is no interval to average over yet
+    if "access_log_read_at" in state:
+        long_polls = load_metrics.in_flight_long_polls(lines, now - state["access_log_read_at"])
+        records += load_metrics.build_records(long_polls, dimensions, instance_id)
+    records += latency_metrics.build_records(latency_metrics.aggregate(lines), dimensions)
+    config.save_state({"access_log_position": list(position), "access_log_read_at": now})
+
+    emf.write(records)
+    return 0
+
+
+def ingest_email(args: argparse.Namespace) -> int:
+    """Deliver incoming email received by SES from the SQS queue to Zulip's email mirror."""
+    boot_config = config.load(args.config)
+    if not boot_config.incoming_email_queue_url:
+        log.error("No incoming email queue configured; is IncomingEmailMode set to ses?")
+        return 1
+    clients = aws.AwsClients.from_session(boot_config.region)
+    deliver = email_ingest.mirror_delivery(boot_config.hostname, email_ingest.read_shared_secret())
+    email_ingest.run(clients.sqs, clients.s3, boot_config.incoming_email_queue_url, deliver)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="zulip-bootstrap")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    configure_parser = subparsers.add_parser("configure", help=configure.__doc__)
+    configure_parser.add_argument("--config", default=DEFAULT_CONFIG)
+    configure_parser.add_argument("--skip-database", action="store_true")
+    configure_parser.add_argument("--skip-puppet", action="store_true")
+    configure_parser.set_defaults(func=configure)
+
+    tune_tables_parser = subparsers.add_parser("tune-tables", help=tune_tables.__doc__)
+    tune_tables_parser.add_argument("--config", default=DEFAULT_CONFIG)
+    tune_tables_parser.set_defaults(func=tune_tables)
+
+    role_parser = subparsers.add_parser("role", help=resolve_role.__doc__)
+    role_parser.add_argument("--config", default=DEFAULT_CONFIG)
+    role_parser.set_defaults(func=resolve_role)
+
+    wait_ready_parser = subparsers.add_parser("wait-ready", help=wait_ready.__doc__)
+    wait_ready_parser.add_argument("--config", default=DEFAULT_CONFIG)
+    wait_ready_parser.add_argument("--timeout", type=float, default=readiness.DEFAULT_DEADLINE_SECONDS)
+    wait_ready_parser.set_defaults(func=wait_ready)
+
+    boot_metrics_parser = subparsers.add_parser("boot-metrics", help=publish_boot_metrics.__doc__)
+    boot_metrics_parser.add_argument("--config", default=DEFAULT_CONFIG)
+    boot_metrics_parser.add_argument("--exit-code", type=int, required=True)
+    boot_metrics_parser.set_defaults(func=publish_boot_metrics)
+
+    load_metrics_parser = subparsers.add_parser("load-metrics", help=publish_load_metrics.__doc__)
+    load_metrics_parser.add_argument("--config", default=DEFAULT_CONFIG)
+    load_metrics_parser.set_defaults(func=publish_load_metrics)
+
+    email_ingest_parser = subparsers.add_parser("email-ingest", help=ingest_email.__doc__)
+    email_ingest_parser.add_argument("--config", default=DEFAULT_CONFIG)
+    email_ingest_parser.set_defaults(func=ingest_email)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,127 @@
+"""
+Boot-time configuration handed over by the ASG user data.
+
+CloudFormation substitutes stack values into `user_data.sh`, which writes them
+to a JSON file; everything downstream reads that file instead of re-parsing
+shell variables.
+
+An optional overrides file is merged on top of it. Stacks never write one; the
+offline stand-in under `test/local/` uses it to point the agent at services
+that have no AWS API to discover them by (a plain RabbitMQ, MinIO for S3).
+"""
+
+import json
+from dataclasses import dataclass, fields
+from typing import Any, Dict
+
+STATE_FILE = "/opt/oe/patterns/bootstrap-state.json"
+OVERRIDES_FILE = "/opt/oe/patterns/bootstrap-overrides.json"
+
+CLUSTERED = "clustered"
+SINGLE_NODE = "single-node"
+
+
+@dataclass
+class BootstrapConfig:
+    region: str
+    stack_name: str
+    hostname: str
+    hosted_zone_name: str
+    db_host: str
+    db_secret_arn: str
+    rabbitmq_secret_arn: str
+    rabbitmq_broker_arn: str
+    redis_host: str
+    instance_secret_name: str
+    assets_bucket_name: str
+    avatars_bucket_name: str
+    admin_email: str = ""
+    giphy_api_key: str = ""
+    sentry_dsn: str = ""
+    enable_incoming_email: bool = False
+    enable_mobile_push_notifications: bool = False
+    uwsgi_processes: str = ""
+    queue_workers_mode: str = "auto"
+    tornado_shards: str = "1"
+    memcached_cluster_id: str = ""
+    queue_worker_asg_enabled: bool = False
+    db_proxy_host: str = ""
+    cdn_enabled: bool = False
+    nginx_profile: str = "conservative"
+    uploads_cache_size_gb: str = "1"
+    uploads_cache_placement: str = "auto"
+    incoming_email_mode: str = "nlb"
+    incoming_email_queue_url: str = ""
+    deployment_mode: str = CLUSTERED
+    # set only by the overrides file: a broker reached without Amazon MQ, and a non-AWS S3 endpoint
+    rabbitmq_host: str = ""
+    s3_endpoint_url: str = ""
+
+    @property
+    def app_db_host(self) -> str:
+        """Where Zulip connects: the RDS Proxy in pooled mode, else the cluster itself."""
+        return self.db_proxy_host or self.db_host
+
+    @property
+    def rabbitmq_broker_id(self) -> str:
+        return self.rabbitmq_broker_arn.split(":")[-1]
+
+    @property
+    def single_node(self) -> bool:
+        """RabbitMQ and Redis run on the instance instead of Amazon MQ and ElastiCache."""
+        return self.deployment_mode == SINGLE_NODE
+
+    @property
+    def rabbitmq_use_tls(self) -> bool:
+        """Amazon MQ only accepts TLS; the local and overridden brokers are plain AMQP."""
+        return not (self.single_node or self.rabbitmq_host)
+
+    @property
+    def rabbitmq_port(self) -> int:
+        return 5671 if self.rabbitmq_use_tls else 5672
+
+
+def _coerce(value: Any, annotation: Any) -> Any:
+    if annotation is bool and isinstance(value, str):
+        return value.strip().lower() == "true"
+    return value
+
+
+def from_dict(data: Dict[str, Any]) -> BootstrapConfig:
+    """Build a config from a dict, ignoring keys this agent does not know about."""
+    known = {f.name: f for f in fields(BootstrapConfig)}
+    kwargs = {
+        key: _coerce(value, known[key].type)
+        for key, value in data.items()
+        if key in known
+    }
+    return BootstrapConfig(**kwargs)
+
+
+def load(path: str, overrides_path: str = OVERRIDES_FILE) -> BootstrapConfig:
+    with open(path) as f:
+        data = json.load(f)
+    try:
+        with open(overrides_path) as f:
+            data.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    return from_dict(data)
+
+
+def save_state(state: Dict[str, Any], path: str = STATE_FILE) -> None:
+    """Persist values resolved at boot (e.g. the broker host) for later subcommands.
+
+    Values are merged into any state saved by an earlier subcommand.
+    """
+    merged = {**load_state(path), **state}
+    with open(path, "w") as f:
+        json.dump(merged, f, indent=2)
+
+
+def load_state(path: str = STATE_FILE) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
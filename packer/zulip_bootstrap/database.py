@@ -0,0 +1,48 @@
+"""
+Preparation of the Aurora database before `initialize-database` runs, and
+per-table tuning once Zulip's tables exist.
+"""
+
+import os
+import subprocess
+from typing import List
+
+from zulip_bootstrap.config import BootstrapConfig
+
+PREPARE_SQL = [
+    "ALTER ROLE zulip SET search_path TO zulip,public",
+    "CREATE SCHEMA IF NOT EXISTS zulip AUTHORIZATION zulip",
+    # the cluster parameter group preloads the library; the view needs the extension
+    "CREATE EXTENSION IF NOT EXISTS pg_stat_statements",
+]
+
+
+# zerver_usermessage gets a row per recipient of every message and is
+# updated on every read, so it needs vacuuming long before the global 5%
+# threshold from the cluster parameter group is reached
+TUNE_TABLES_SQL = [
+    "ALTER TABLE IF EXISTS zulip.zerver_usermessage SET ("
+    "autovacuum_vacuum_scale_factor = 0.01, "
+    "autovacuum_analyze_scale_factor = 0.005, "
+    "autovacuum_vacuum_insert_scale_factor = 0.01, "
+    "autovacuum_vacuum_cost_limit = 2000)",
+]
+
+
+def _run(config: BootstrapConfig, username: str, password: str, statements: List[str]) -> None:
+    # DDL goes straight to the cluster, even when Zulip itself uses the RDS Proxy
+    env = dict(os.environ, PGPASSWORD=password)
+    for statement in statements:
+        subprocess.run(
+            ["psql", "-U", username, "-h", config.db_host, "-d", "zulip", "-c", statement],
+            check=True,
+            env=env,
+        )
+
+
+def prepare(config: BootstrapConfig, username: str, password: str) -> None:
+    _run(config, username, password, PREPARE_SQL)
+
+
+def tune_tables(config: BootstrapConfig, username: str, password: str) -> None:
+    _run(config, username, password, TUNE_TABLES_SQL)
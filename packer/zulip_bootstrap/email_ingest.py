@@ -0,0 +1,204 @@
+"""
+Consumer for incoming email received by SES (IncomingEmailMode=ses).
+
+SES stores each message in the incoming email bucket and announces it on an
+SNS topic that feeds an SQS queue. This long-polls the queue in batches of
+up to ten, fetches the messages from S3 in parallel and hands each one to
+Zulip's email mirror the same way Zulip's postfix pipe does: a POST of the
+base64 message to /email_mirror_message on the local nginx, authenticated
+with the shared secret. Messages that fail are left on the queue and retried
+after the visibility timeout, then moved to the dead-letter queue. A message
+delivered to some of its recipients but not others is replaced on the queue
+by one for the failed recipients only, so a retry does not repost it to the
+ones that already have it.
+"""
+
+import base64
+import configparser
+import http.client
+import json
+import logging
+import ssl
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+ZULIP_SECRETS = "/etc/zulip/zulip-secrets.conf"
+MIRROR_PATH = "/email_mirror_message"
+
+BATCH_SIZE = 10  # SQS maximum
+WAIT_TIME_SECONDS = 20
+DELIVERY_WORKERS = 4
+DELIVERY_TIMEOUT_SECONDS = 30
+ERROR_BACKOFF_SECONDS = 5
+REQUEUE_DELAY_SECONDS = 60
+
+log = logging.getLogger(__name__)
+
+# (recipient, raw message) -> None; raises on failure
+Deliver = Callable[[str, bytes], None]
+
+
+@dataclass
+class InboundEmail:
+    receipt_handle: str
+    bucket: str
+    key: str
+    recipients: List[str]
+
+
+class DeliveryError(Exception):
+    pass
+
+
+def parse_notification(body: str) -> Optional[Tuple[str, str, List[str]]]:
+    """Return (bucket, key, recipients) from an SES S3-action notification, SNS-wrapped or raw."""
+    try:
+        message = json.loads(body)
+        if "Message" in message and message.get("Type") == "Notification":
+            message = json.loads(message["Message"])
+    except (ValueError, TypeError):
+        return None
+    if message.get("notificationType") != "Received":
+        # e.g. the AMAZON_SES_SETUP_NOTIFICATION sent when the rule is created
+        return None
+    receipt = message.get("receipt", {})
+    action = receipt.get("action", {})
+    if action.get("type") != "S3":
+        return None
+    return action["bucketName"], action["objectKey"], receipt.get("recipients", [])
+
+
+def read_shared_secret(path: str = ZULIP_SECRETS) -> str:
+    parser = configparser.RawConfigParser()
+    parser.read(path)
+    return parser.get("secrets", "shared_secret")
+
+
+def mirror_delivery(hostname: str, shared_secret: str, address: str = "127.0.0.1", port: int = 443) -> Deliver:
+    """POST to Zulip's email mirror endpoint through the local nginx, as email-mirror-postfix does."""
+    def deliver(recipient: str, raw: bytes) -> None:
+        body = urllib.parse.urlencode({
+            "recipient": recipient,
+            "msg_base64": base64.b64encode(raw).decode(),
+            "secret": shared_secret,
+        })
+        context = ssl._create_unverified_context()
+        connection = http.client.HTTPSConnection(address, port, timeout=DELIVERY_TIMEOUT_SECONDS, context=context)
+        try:
+            connection.request("POST", MIRROR_PATH, body=body, headers={
+                "Host": hostname,
+                "Content-Type": "application/x-www-form-urlencoded",
+            })
+            response = connection.getresponse()
+            detail = response.read(4096).decode(errors="replace")
+        finally:
+            connection.close()
+        if response.status == 200:
+            return
+        # Zulip answers 400 for mail it will never accept (unknown stream
+        # address, missing-message etc.); retrying those would not help.
+        # Anything else (a bad secret, rate limiting, an nginx or Django
+        # error) may pass on a retry, so the mail stays on the queue
+        if response.status == 400:
+            log.warning("Zulip rejected mail for %s: HTTP %d %s", recipient, response.status, detail)
+            return
+        raise DeliveryError(f"HTTP {response.status}: {detail}")
+    return deliver
+
+
+def requeue_body(email: InboundEmail, recipients: List[str]) -> str:
+    """An SES notification for `email` addressed to `recipients` only, as parse_notification reads it."""
+    return json.dumps({
+        "notificationType": "Received",
+        "receipt": {
+            "recipients": recipients,
+            "action": {"type": "S3", "bucketName": email.bucket, "objectKey": email.key},
+        },
+    })
+
+
+def _handle(s3, email: InboundEmail, deliver: Deliver) -> List[str]:
+    """Deliver `email` to each of its recipients; return the ones it could not be delivered to."""
+    try:
+        raw = s3.get_object(Bucket=email.bucket, Key=email.key)["Body"].read()
+    except Exception:
+        log.exception("Could not fetch s3://%s/%s", email.bucket, email.key)
+        return email.recipients
+    failed = []
+    for recipient in email.recipients:
+        try:
+            deliver(recipient, raw)
+        except Exception:
+            log.exception("Could not deliver s3://%s/%s to %s", email.bucket, email.key, recipient)
+            failed.append(recipient)
+    if not failed:
+        try:
+            s3.delete_object(Bucket=email.bucket, Key=email.key)
+        except Exception:
+            # delivered; deleting the message again would not repost it
+            log.exception("Could not delete s3://%s/%s", email.bucket, email.key)
+    return failed
+
+
+def process_batch(sqs, s3, queue_url: str, deliver: Deliver, wait_time_seconds: int = WAIT_TIME_SECONDS) -> int:
+    """Receive one batch, deliver it, and delete what was delivered; return the number delivered."""
+    response = sqs.receive_message(
+        QueueUrl=queue_url,
+        MaxNumberOfMessages=BATCH_SIZE,
+        WaitTimeSeconds=wait_time_seconds,
+    )
+    messages = response.get("Messages", [])
+    if not messages:
+        return 0
+
+    emails: List[InboundEmail] = []
+    done: List[str] = []
+    for message in messages:
+        parsed = parse_notification(message["Body"])
+        if parsed is None:
+            # nothing to deliver; don't let it cycle through the dead-letter queue
+            done.append(message["ReceiptHandle"])
+            continue
+        emails.append(InboundEmail(message["ReceiptHandle"], *parsed))
+
+    with ThreadPoolExecutor(max_workers=DELIVERY_WORKERS) as pool:
+        results = list(pool.map(lambda email: _handle(s3, email, deliver), emails))
+    delivered = [email for email, failed in zip(emails, results) if not failed]
+    done += [email.receipt_handle for email in delivered]
+    for email, failed in zip(emails, results):
+        if not failed or len(failed) == len(email.recipients):
+            continue
+        try:
+            sqs.send_message(
+                QueueUrl=queue_url,
+                MessageBody=requeue_body(email, failed),
+                DelaySeconds=REQUEUE_DELAY_SECONDS,
+            )
+        except Exception:
+            # retrying the original reposts it to the recipients that have it
+            log.exception("Could not requeue s3://%s/%s for %s", email.bucket, email.key, ", ".join(failed))
+            continue
+        log.warning("Requeued s3://%s/%s for %s", email.bucket, email.key, ", ".join(failed))
+        done.append(email.receipt_handle)
+
+    if done:
+        sqs.delete_message_batch(
+            QueueUrl=queue_url,
+            Entries=[{"Id": str(n), "ReceiptHandle": handle} for n, handle in enumerate(done)],
+        )
+    return len(delivered)
+
+
+def run(sqs, s3, queue_url: str, deliver: Deliver) -> None:
+    log.info("Consuming incoming email from %s", queue_url)
+    while True:
+        try:
+            delivered = process_batch(sqs, s3, queue_url, deliver)
+            if delivered:
+                log.info("Delivered %d incoming emails", delivered)
+        except Exception:
+            log.exception("Receiving incoming email failed; retrying")
+            time.sleep(ERROR_BACKOFF_SECONDS)
@@ -0,0 +1,55 @@
+"""
+CloudWatch Embedded Metric Format (EMF) records.
+
+Records are appended as JSON lines to a log file that the CloudWatch agent
+ships to the app log group; CloudWatch extracts the metrics on ingestion, so
+nothing on the instance calls PutMetricData.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+NAMESPACE = "OE/Patterns/Zulip"
+METRICS_LOG = "/var/log/oe-zulip/metrics.log"
+
+# metric name -> (value, unit); a value may also be a {"Values": [...], "Counts": [...]} histogram
+Metrics = Dict[str, Tuple[Union[float, Dict[str, List[float]]], str]]
+
+
+def record(
+    metrics: Metrics,
+    dimensions: Dict[str, str],
+    dimension_sets: List[List[str]],
+    namespace: str = NAMESPACE,
+    timestamp_ms: Optional[int] = None,
+    properties: Optional[Dict[str, object]] = None,
+) -> Dict[str, object]:
+    """Build one EMF record; `dimension_sets` lists which dimension combinations to publish."""
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
+    present = [
+        [name for name in dimension_set if dimensions.get(name)]
+        for dimension_set in dimension_sets
+    ]
+    present = [dimension_set for dimension_set in present if dimension_set]
+    body: Dict[str, object] = dict(properties or {})
+    body.update({name: value for name, value in dimensions.items() if value})
+    body.update({name: value for name, (value, _) in metrics.items()})
+    body["_aws"] = {
+        "Timestamp": timestamp_ms,
+        "CloudWatchMetrics": [{
+            "Namespace": namespace,
+            "Dimensions": present,
+            "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()],
+        }],
+    }
+    return body
+
+
+def write(records: Iterable[Dict[str, object]], path: str = METRICS_LOG) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        for item in records:
+            f.write(json.dumps(item, separators=(",", ":")) + "\n")
@@ -0,0 +1,65 @@
+"""
+Instance identity from IMDSv2 and the instance's Auto Scaling group tag.
+"""
+
+import urllib.request
+from typing import Dict, Optional
+
+IMDS_URL = "http://169.254.169.254/latest"
+TOKEN_TTL_SECONDS = "300"
+
+
+def _token(timeout: float) -> str:
+    request = urllib.request.Request(
+        f"{IMDS_URL}/api/token",
+        method="PUT",
+        headers={"X-aws-ec2-metadata-token-ttl-seconds": TOKEN_TTL_SECONDS},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read().decode()
+
+
+def fetch(paths: Dict[str, str], timeout: float = 2.0) -> Dict[str, str]:
+    """Return {key: value} for each meta-data path; unreachable IMDS yields empty values."""
+    try:
+        token = _token(timeout)
+    except OSError:
+        return {key: "" for key in paths}
+    values = {}
+    for key, path in paths.items():
+        request = urllib.request.Request(
+            f"{IMDS_URL}/meta-data/{path}",
+            headers={"X-aws-ec2-metadata-token": token},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                values[key] = response.read().decode()
+        except OSError:
+            values[key] = ""
+    return values
+
+
+def identity() -> Dict[str, str]:
+    return fetch({
+        "InstanceId": "instance-id",
+        "ImageId": "ami-id",
+        "InstanceType": "instance-type",
+    })
+
+
+def instance_tag(ec2, instance_id: str, key: str) -> Optional[str]:
+    """Look up one tag with DescribeTags (granted to the CloudWatch agent role)."""
+    if not instance_id:
+        return None
+    response = ec2.describe_tags(
+        Filters=[
+            {"Name": "resource-id", "Values": [instance_id]},
+            {"Name": "key", "Values": [key]},
+        ]
+    )
+    tags = response.get("Tags", [])
+    return tags[0]["Value"] if tags else None
+
+
+def autoscaling_group_name(ec2, instance_id: str) -> Optional[str]:
+    return instance_tag(ec2, instance_id, "aws:autoscaling:groupName")
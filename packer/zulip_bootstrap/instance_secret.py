@@ -0,0 +1,50 @@
+"""
+Generation of the per-deployment Zulip secrets kept in `{stack}/instance/credentials`.
+
+The secret is created by the stack with the SES credentials in it; the
+Zulip-specific keys are generated by the first instance that boots and written
+back so every later instance shares them.
+"""
+
+import secrets
+import string
+import uuid
+from typing import Dict, Tuple
+
+ALNUM = string.ascii_letters + string.digits
+SECRET_KEY_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789!@#$%^&*(-_=+)"
+
+# 32 random alphanumerics followed by 32 hex characters, matching the
+# length and character set the previous shell generator produced.
+SIMILAR_SECRETS = [
+    "avatar_salt",
+    "camo_key",
+    "shared_secret",
+    "zulip_org_key",
+    "redis_password",
+]
+
+
+def _random_string(alphabet: str, length: int) -> str:
+    return "".join(secrets.choice(alphabet) for _ in range(length))
+
+
+def generate_similar_secret() -> str:
+    return _random_string(ALNUM, 32) + secrets.token_hex(16)
+
+
+def generate_secret_key() -> str:
+    return _random_string(SECRET_KEY_ALPHABET, 25) + secrets.token_hex(13)[:25]
+
+
+def fill_missing(current: Dict[str, str]) -> Tuple[Dict[str, str], bool]:
+    """Return a copy of `current` with any missing Zulip secret generated, and whether anything changed."""
+    updated = dict(current)
+    for key in SIMILAR_SECRETS:
+        if key not in updated:
+            updated[key] = generate_similar_secret()
+    if "secret_key" not in updated:
+        updated["secret_key"] = generate_secret_key()
+    if "zulip_org_id" not in updated:
+        updated["zulip_org_id"] = str(uuid.uuid4())
+    return updated, updated != current
@@ -0,0 +1,178 @@
+"""
+Per-endpoint latency histograms from nginx's JSON access log, as embedded metrics.
+
+nginx writes one JSON object per request to JSON_ACCESS_LOG (see the
+drop-in in `nginx`). Once a minute, `zulip-load-metrics.service` reads the lines
+appended since the previous run, normalizes each URI to a bounded set of
+routes and writes one EMF record per route. Latencies are sent as
+Values/Counts histograms, so CloudWatch computes exact-enough percentiles
+(p50, p99) across every instance in the group.
+"""
+
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from zulip_bootstrap import emf
+from zulip_bootstrap.nginx import JSON_ACCESS_LOG
+
+DIMENSION_SETS = [["AutoScalingGroupName", "Route"], ["Route"]]
+
+# bounds the number of metric streams if a client walks arbitrary URLs
+MAX_ROUTES = 60
+OTHER_ROUTE = "other"
+
+# EMF accepts at most 100 distinct values per metric; latencies are rounded
+# up to these bucket bounds (milliseconds)
+BUCKETS_MS = sorted({
+    *range(5, 100, 5),
+    *range(100, 1000, 25),
+    *range(1000, 10000, 500),
+    *range(10000, 65000, 5000),
+})
+
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{8,}|[0-9a-f-]{36})$", re.IGNORECASE)
+# the fixed path segments of Zulip's /json and /api/v1 endpoints
+# (zproject/urls.py); any other segment is a stream, emoji, email, upload
+# file name or similar and becomes {name}, so it cannot mint new routes
+_API_SEGMENTS = frozenset("""
+    alert_words android_gcm_reg_id api_key apns_device_token attachments
+    avatar bots calls channel_folders client_capabilities create
+    default_stream_groups default_streams deactivate delete_topic
+    dev_fetch_api_key dev_list_users display domains drafts edit
+    email_address emoji emoji_reactions enter-sends events export
+    fetch_api_key filters flags get_stream_id history hotspots icon invites
+    linkifiers logo mark_all_as_read mark_stream_as_read
+    mark_topic_as_read matches_narrow me members messages mobile_push
+    multiuse muted_topics muted_users narrow navigation_views notifications
+    onboarding_steps playgrounds presence profile_data profile_fields
+    properties reactions reactivate read_receipts realm regenerate register
+    reminders render report resend saved_snippets scheduled_messages
+    server_settings settings status streams subdomain subgroups
+    subscriptions test_notification topics tus tutorial_status typing
+    user_groups user_settings_defaults user_topics user_uploads users
+    zcommand
+""".split())
+_ROUTE_PREFIXES = (
+    ("/static/", "/static"),
+    ("/user_uploads/", "/user_uploads"),
+    ("/user_avatars/", "/user_avatars"),
+    ("/avatar/", "/avatar"),
+    ("/thumbnail", "/thumbnail"),
+    ("/external_content/", "/external_content"),
+)
+
+
+def normalize(uri: str) -> str:
+    """Map a request URI to a route, e.g. /api/v1/messages/123/reactions -> /api/v1/messages/{id}/reactions."""
+    path = uri.split("?", 1)[0]
+    for prefix, route in _ROUTE_PREFIXES:
+        if path.startswith(prefix):
+            return route
+    if path.startswith("/json/") or path.startswith("/api/v1/"):
+        prefix = "/json" if path.startswith("/json/") else "/api/v1"
+        segments = [prefix]
+        for segment in path[len(prefix) + 1:].rstrip("/").split("/"):
+            if segment in _API_SEGMENTS:
+                segments.append(segment)
+            elif _ID_SEGMENT.match(segment):
+                segments.append("{id}")
+            else:
+                segments.append("{name}")
+        # e.g. /api/v1/users/me/subscriptions/properties is as deep as Zulip's API goes
+        return "/".join(segments[:5])
+    if path in ("/", "/login/", "/register/", "/accounts/login/"):
+        return path
+    return OTHER_ROUTE
+
+
+def bucket_ms(seconds: float) -> int:
+    ms = seconds * 1000
+    for bound in BUCKETS_MS:
+        if ms <= bound:
+            return bound
+    return BUCKETS_MS[-1]
+
+
+def _seconds(value) -> Optional[float]:
+    """nginx logs "-" for no upstream and "a, b" when it retried another upstream."""
+    if value in (None, "", "-"):
+        return None
+    try:
+        return sum(float(part) for part in str(value).split(",") if part.strip() not in ("", "-"))
+    except ValueError:
+        return None
+
+
+@dataclass
+class RouteStats:
+    request_ms: Counter = field(default_factory=Counter)
+    upstream_ms: Counter = field(default_factory=Counter)
+    requests: int = 0
+    server_errors: int = 0
+
+
+def aggregate(lines: Iterable[str]) -> Dict[str, RouteStats]:
+    stats: Dict[str, RouteStats] = defaultdict(RouteStats)
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        route = normalize(entry.get("uri", ""))
+        if route not in stats and len(stats) >= MAX_ROUTES:
+            route = OTHER_ROUTE
+        route_stats = stats[route]
+        route_stats.requests += 1
+        if str(entry.get("status", "")).startswith("5"):
+            route_stats.server_errors += 1
+        request_time = _seconds(entry.get("request_time"))
+        if request_time is not None:
+            route_stats.request_ms[bucket_ms(request_time)] += 1
+        upstream_time = _seconds(entry.get("upstream_response_time"))
+        if upstream_time is not None:
+            route_stats.upstream_ms[bucket_ms(upstream_time)] += 1
+    return stats
+
+
+def _histogram(counts: Counter) -> Dict[str, List[int]]:
+    values = sorted(counts)
+    return {"Values": values, "Counts": [counts[value] for value in values]}
+
+
+def build_records(stats: Dict[str, RouteStats], dimensions: Dict[str, str]) -> List[Dict[str, object]]:
+    records = []
+    for route, route_stats in sorted(stats.items()):
+        metrics: emf.Metrics = {
+            "RequestCount": (route_stats.requests, "Count"),
+            "ServerErrorCount": (route_stats.server_errors, "Count"),
+        }
+        if route_stats.request_ms:
+            metrics["RequestLatency"] = (_histogram(route_stats.request_ms), "Milliseconds")
+        if route_stats.upstream_ms:
+            metrics["UpstreamLatency"] = (_histogram(route_stats.upstream_ms), "Milliseconds")
+        records.append(emf.record(metrics, dict(dimensions, Route=route), DIMENSION_SETS))
+    return records
+
+
+def read_new_lines(path: str, position: Tuple[int, int]) -> Tuple[List[str], Tuple[int, int]]:
+    """Return complete lines appended since `position` (inode, offset) and the new position.
+
+    Starts over from the beginning when logrotate has replaced the file.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return [], (0, 0)
+    inode, offset = position
+    if inode != stat.st_ino or offset > stat.st_size:
+        offset = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    complete = data[:data.rfind(b"\n") + 1]
+    lines = complete.decode("utf-8", errors="replace").splitlines()
+    return lines, (stat.st_ino, offset + len(complete))
@@ -0,0 +1,58 @@
+"""
+Per-instance Tornado load as an embedded metric.
+
+Tornado keeps its event queues in process memory and does not expose a count,
+and sockets to the Tornado ports are nginx's upstream keepalive pool rather
+than clients. The load signal is instead the average number of long-poll
+`GET /json/events` (or `/api/v1/events`) requests held open over the last
+interval, from nginx's JSON access log: by Little's law, the time those
+requests spent open divided by the interval. A connected client holds about
+one long-poll open at any time, so this tracks connected clients. Published
+once a minute by `zulip-load-metrics.timer` on web instances (together with
+`latency_metrics`, which reads the same log lines), for dashboards and alarms
+on how many clients an instance is holding.
+"""
+
+import json
+from typing import Dict, Iterable, List
+
+from zulip_bootstrap import emf
+
+LONG_POLL_PATHS = ("/json/events", "/api/v1/events")
+
+LONG_POLL_METRIC = "TornadoLongPollConnections"
+DIMENSION_SETS = [["AutoScalingGroupName"]]
+
+
+def _is_long_poll(entry: Dict[str, object]) -> bool:
+    # DELETE /json/events removes a queue and returns immediately
+    path = str(entry.get("uri", "")).split("?", 1)[0].rstrip("/")
+    return entry.get("method") == "GET" and path in LONG_POLL_PATHS
+
+
+def in_flight_long_polls(lines: Iterable[str], interval_seconds: float) -> float:
+    """Average long-poll requests open over `interval_seconds`, from the access log lines written in it."""
+    if interval_seconds <= 0:
+        return 0.0
+    open_seconds = 0.0
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if not _is_long_poll(entry):
+            continue
+        try:
+            open_seconds += float(entry.get("request_time", 0))
+        except (TypeError, ValueError):
+            continue
+    return open_seconds / interval_seconds
+
+
+def build_records(long_polls: float, dimensions: Dict[str, str], instance_id: str = "") -> List[Dict[str, object]]:
+    return [emf.record(
+        {LONG_POLL_METRIC: (round(long_polls, 1), "Count")},
+        dimensions,
+        DIMENSION_SETS,
+        properties={"InstanceId": instance_id} if instance_id else None,
+    )]
@@ -0,0 +1,24 @@
+"""
+Instance-local RabbitMQ and Redis for DeploymentMode=single-node.
+
+In this mode the stack creates no Amazon MQ broker or ElastiCache Redis
+cluster. `render` adds Zulip's own `zulip::profile::rabbitmq` and
+`zulip::profile::redis` puppet classes to zulip.conf, puppet configures the
+services the AMI ships installed but disabled, and Zulip's
+configure-rabbitmq script creates the broker user from zulip-secrets.conf.
+Both listen on localhost only, so the app talks to them without TLS.
+"""
+
+import subprocess
+
+LOCAL_HOST = "127.0.0.1"
+RABBITMQ_PORT = 5672
+PUPPET_CLASSES = "zulip::profile::rabbitmq, zulip::profile::redis"
+SERVICES = ("rabbitmq-server", "redis-server")
+CONFIGURE_RABBITMQ = "/home/zulip/deployments/current/scripts/setup/configure-rabbitmq"
+
+
+def start() -> None:
+    """Start the local services and (re)create Zulip's RabbitMQ user; run after puppet."""
+    subprocess.run(["systemctl", "enable", "--now", *SERVICES], check=True)
+    subprocess.run([CONFIGURE_RABBITMQ], check=True)
@@ -0,0 +1,77 @@
+"""
+Sizing of the instance-local memcached to the instance it boots on.
+
+The AMI installs memcached with Debian's defaults (64 MB, 1024 connections)
+regardless of instance type. Like Zulip's own puppet, the cache gets an
+eighth of the instance's memory; the connection limit follows the number of
+Zulip processes that hold a connection to it. Not used when a shared
+ElastiCache cluster replaces the local memcached.
+"""
+
+import re
+import subprocess
+from dataclasses import dataclass
+
+from zulip_bootstrap.process_model import ProcessModel
+
+MEMCACHED_CONF = "/etc/memcached.conf"
+
+MIN_MEMORY_MB = 64
+MAX_MEMORY_MB = 16384
+MEMORY_FRACTION = 8  # 1/8 of instance memory, as in Zulip's puppet
+
+MIN_CONNECTIONS = 1024
+CONNECTIONS_PER_CLIENT = 4  # headroom for cron jobs and management commands
+QUEUE_WORKER_PROCESSES_MULTIPROCESS = 32
+MIN_THREADS = 4
+MAX_THREADS = 16
+
+
+@dataclass
+class MemcachedSize:
+    memory_mb: int
+    max_connections: int
+    threads: int
+
+
+def memory_mb(mem_mb: int) -> int:
+    """Cache size for an instance with `mem_mb` MiB of memory."""
+    return max(MIN_MEMORY_MB, min(mem_mb // MEMORY_FRACTION, MAX_MEMORY_MB))
+
+
+def size(vcpus: int, mem_mb: int, model: ProcessModel, tornado_processes: int = 1) -> MemcachedSize:
+    clients = model.uwsgi_processes + tornado_processes
+    clients += QUEUE_WORKER_PROCESSES_MULTIPROCESS if model.queue_workers_multiprocess else 1
+    return MemcachedSize(
+        memory_mb=memory_mb(mem_mb),
+        max_connections=max(MIN_CONNECTIONS, clients * CONNECTIONS_PER_CLIENT),
+        threads=max(MIN_THREADS, min(vcpus, MAX_THREADS)),
+    )
+
+
+def _set_option(conf: str, flag: str, value: int) -> str:
+    """Set `-<flag> <value>` in Debian's memcached.conf, uncommenting or appending it."""
+    line = f"-{flag} {value}"
+    pattern = rf"(?m)^#?[ \t]*-{flag}[ \t]+\d+[ \t]*$"
+    if re.search(pattern, conf):
+        return re.sub(pattern, line, conf, count=1)
+    return conf.rstrip("\n") + f"\n{line}\n"
+
+
+def render_conf(conf: str, memcached_size: MemcachedSize) -> str:
+    conf = _set_option(conf, "m", memcached_size.memory_mb)
+    conf = _set_option(conf, "c", memcached_size.max_connections)
+    return _set_option(conf, "t", memcached_size.threads)
+
+
+def apply(memcached_size: MemcachedSize, path: str = MEMCACHED_CONF) -> bool:
+    """Rewrite memcached.conf and restart memcached; return False if it was already sized."""
+    with open(path) as f:
+        current = f.read()
+    rendered = render_conf(current, memcached_size)
+    if rendered == current:
+        return False
+    with open(path, "w") as f:
+        f.write(rendered)
+    subprocess.run(["systemctl", "restart", "memcached"], check=True)
+    return True
@@ -0,0 +1,158 @@
+"""
+nginx performance profile applied on top of the configuration puppet renders.
+
+Zulip's puppet owns /etc/nginx; this only rewrites the worker sizing in
+nginx.conf and adds two http-level drop-ins: one with the profile's tuning
+and one with the access logs the metrics agents read. If `nginx -t` rejects
+the result (e.g. a future Zulip release starts setting one of the same
+directives), the tuning is rolled back and Zulip's defaults are kept; the
+logging drop-in is only removed if nginx still rejects the config without
+the tuning.
+"""
+
+import logging
+import os
+import re
+import shutil
+import subprocess
+from dataclasses import dataclass
+from typing import Dict
+
+NGINX_CONF = "/etc/nginx/nginx.conf"
+DROP_IN = "/etc/nginx/conf.d/zulip-performance.conf"
+LOGGING_DROP_IN = "/etc/nginx/conf.d/zulip-logging.conf"
+S3_CACHE_LOG = "/var/log/nginx/s3-cache.log"
+# one JSON object per request, read by latency_metrics
+JSON_ACCESS_LOG = "/var/log/nginx/access.json.log"
+
+# the per-worker connection count is capped so that workers * connections
+# stays within the file descriptors available to nginx
+MAX_OPEN_FILES = 1048576
+
+
+@dataclass
+class Profile:
+    worker_connections: int
+    open_file_cache_max: int
+    open_file_cache_inactive: str
+    open_file_cache_valid: str
+    client_body_buffer_size: str
+    proxy_buffers: str
+    keepalive_requests: int
+
+
+PROFILES: Dict[str, Profile] = {
+    "conservative": Profile(
+        worker_connections=4096,
+        open_file_cache_max=10000,
+        open_file_cache_inactive="60s",
+        open_file_cache_valid="60s",
+        client_body_buffer_size="128k",
+        proxy_buffers="16 16k",
+        keepalive_requests=1000,
+    ),
+    "aggressive": Profile(
+        worker_connections=16384,
+        open_file_cache_max=50000,
+        open_file_cache_inactive="5m",
+        open_file_cache_valid="120s",
+        # keeps most avatar and small file uploads (25 MB limit) out of temp files
+        client_body_buffer_size="1m",
+        proxy_buffers="64 16k",
+        keepalive_requests=10000,
+    ),
+}
+
+log = logging.getLogger(__name__)
+
+
+def render_drop_in(profile: Profile) -> str:
+    return "\n".join([
+        "# managed by zulip-bootstrap; see packer/zulip_bootstrap/nginx.py",
+        f"open_file_cache max={profile.open_file_cache_max} inactive={profile.open_file_cache_inactive};",
+        f"open_file_cache_valid {profile.open_file_cache_valid};",
+        "open_file_cache_min_uses 2;",
+        "open_file_cache_errors on;",
+        # .gz/.br siblings are generated for prod-static when the AMI is baked
+        "gzip_static on;",
+        "brotli_static on;",
+        f"client_body_buffer_size {profile.client_body_buffer_size};",
+        f"proxy_buffers {profile.proxy_buffers};",
+        f"uwsgi_buffers {profile.proxy_buffers};",
+        f"keepalive_requests {profile.keepalive_requests};",
+        "",
+    ])
+
+
+def render_logging_drop_in() -> str:
+    return "\n".join([
+        "# managed by zulip-bootstrap; see packer/zulip_bootstrap/nginx.py",
+        # only requests that went through a proxy_cache (the S3 uploads
+        # proxy) have an upstream cache status
+        "map $upstream_cache_status $zulip_s3_cache_loggable {",
+        "    \"\" 0;",
+        "    default 1;",
+        "}",
+        "log_format zulip_s3_cache '$time_iso8601 $upstream_cache_status $status $body_bytes_sent $request_time $host $uri';",
+        f"access_log {S3_CACHE_LOG} zulip_s3_cache if=$zulip_s3_cache_loggable;",
+        "log_format zulip_json escape=json '{'",
+        "    '\"time\":\"$time_iso8601\",\"host\":\"$host\",\"method\":\"$request_method\",\"uri\":\"$request_uri\",'",
+        "    '\"status\":$status,\"bytes\":$body_bytes_sent,\"request_time\":$request_time,'",
+        "    '\"upstream_response_time\":\"$upstream_response_time\",\"upstream_cache_status\":\"$upstream_cache_status\"'",
+        "'}';",
+        f"access_log {JSON_ACCESS_LOG} zulip_json;",
+        "",
+    ])
+
+
+def tune_main(nginx_conf: str, vcpus: int, profile: Profile) -> str:
+    """Size worker_processes and worker_connections to this instance."""
+    connections = min(profile.worker_connections, MAX_OPEN_FILES // (2 * vcpus))
+    nginx_conf = re.sub(r"(?m)^(\s*)worker_processes\s+[^;]+;", rf"\g<1>worker_processes {vcpus};", nginx_conf)
+    nginx_conf = re.sub(r"(?m)^(\s*)worker_connections\s+[^;]+;", rf"\g<1>worker_connections {connections};", nginx_conf)
+    if not re.search(r"(?m)^\s*worker_rlimit_nofile\s", nginx_conf):
+        nginx_conf = re.sub(
+            r"(?m)^(\s*worker_processes [^;]+;)",
+            rf"\g<1>\nworker_rlimit_nofile {2 * connections};",
+            nginx_conf,
+            count=1,
+        )
+    return nginx_conf
+
+
+def apply(
+    profile_name: str,
+    vcpus: int,
+    nginx_conf: str = NGINX_CONF,
+    drop_in: str = DROP_IN,
+    logging_drop_in: str = LOGGING_DROP_IN,
+) -> bool:
+    """Apply the named profile; return False (with Zulip's tuning restored) if nginx rejects it."""
+    if profile_name not in PROFILES:
+        raise ValueError(f"nginx profile must be one of {tuple(PROFILES)}")
+    profile = PROFILES[profile_name]
+
+    backup = nginx_conf + ".zulip-bootstrap"
+    shutil.copy2(nginx_conf, backup)
+    with open(nginx_conf) as f:
+        tuned = tune_main(f.read(), vcpus, profile)
+    with open(nginx_conf, "w") as f:
+        f.write(tuned)
+    with open(drop_in, "w") as f:
+        f.write(render_drop_in(profile))
+    with open(logging_drop_in, "w") as f:
+        f.write(render_logging_drop_in())
+
+    result = subprocess.run(["nginx", "-t"], capture_output=True, text=True)
+    if result.returncode == 0:
+        os.unlink(backup)
+        return True
+
+    log.warning("nginx rejected the %s profile, keeping Zulip's defaults: %s", profile_name, result.stderr.strip())
+    os.replace(backup, nginx_conf)
+    os.unlink(drop_in)
+    result = subprocess.run(["nginx", "-t"], capture_output=True, text=True)
+    if result.returncode != 0:
+        log.warning("nginx rejected the access logs too, removing them: %s", result.stderr.strip())
+        os.unlink(logging_drop_in)
+    return False
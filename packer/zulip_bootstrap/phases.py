@@ -0,0 +1,68 @@
+"""
+Boot phase timings.
+
+Both `user_data.sh` (through its `phase` shell function) and this agent append
+one tab-separated line per phase to the same file:
+
+    <name>\t<start epoch ms>\t<end epoch ms>\t<exit code>
+
+`zulip-bootstrap boot-metrics` turns the file into EMF records at the end of
+the boot.
+"""
+
+import contextlib
+import time
+from dataclasses import dataclass
+from typing import Iterator, List
+
+PHASES_FILE = "/opt/oe/patterns/boot-phases.tsv"
+
+
+@dataclass
+class Phase:
+    name: str
+    start_ms: int
+    end_ms: int
+    exit_code: int
+
+    @property
+    def duration_ms(self) -> int:
+        return self.end_ms - self.start_ms
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def record(phase: Phase, path: str = PHASES_FILE) -> None:
+    with open(path, "a") as f:
+        f.write(f"{phase.name}\t{phase.start_ms}\t{phase.end_ms}\t{phase.exit_code}\n")
+
+
+@contextlib.contextmanager
+def timed(name: str, path: str = PHASES_FILE) -> Iterator[None]:
+    """Record the duration of the enclosed block; a raised exception is recorded as exit code 1."""
+    start = now_ms()
+    exit_code = 1
+    try:
+        yield
+        exit_code = 0
+    finally:
+        record(Phase(name, start, now_ms(), exit_code), path)
+
+
+def read(path: str = PHASES_FILE) -> List[Phase]:
+    phases = []
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 4:
+                    continue
+                try:
+                    phases.append(Phase(parts[0], int(parts[1]), int(parts[2]), int(parts[3])))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return phases
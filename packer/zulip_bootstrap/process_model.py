@@ -0,0 +1,89 @@
+"""
+Sizing of Zulip's process model to the instance it boots on.
+
+Zulip's own defaults assume a single server that also runs Postgres,
+RabbitMQ and Redis. Here those live in managed services (RabbitMQ and Redis
+stay local in single-node mode), so the memory on
+the instance is split between a fixed reserve, Tornado, the queue workers
+and as many uwsgi workers as fit, bounded by the number of cores.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# rough resident sizes, in MiB; deliberately conservative
+RESERVED_MB = 768  # OS, nginx, postfix, CloudWatch agent
+TORNADO_MB = 200
+UWSGI_WORKER_MB = 150
+QUEUE_WORKERS_THREADED_MB = 600
+QUEUE_WORKERS_MULTIPROCESS_MB = 2100
+LOCAL_RABBITMQ_MB = 256
+LOCAL_REDIS_MB = 128
+
+MIN_UWSGI_PROCESSES = 2
+UWSGI_PROCESSES_PER_VCPU = 3
+MAX_UWSGI_PROCESSES = 64
+
+QUEUE_WORKERS_MODES = ("auto", "multiprocess", "threaded")
+
+
+@dataclass
+class ProcessModel:
+    uwsgi_processes: int
+    queue_workers_multiprocess: bool
+
+
+def detect(meminfo: str = "/proc/meminfo") -> Tuple[int, int]:
+    """Return (vCPUs, total memory in MiB) of this instance."""
+    mem_mb = 0
+    with open(meminfo) as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                mem_mb = int(line.split()[1]) // 1024
+                break
+    return os.cpu_count() or 1, mem_mb
+
+
+def plan(
+    vcpus: int,
+    mem_mb: int,
+    uwsgi_processes: Optional[int] = None,
+    queue_workers_mode: str = "auto",
+    tornado_processes: int = 1,
+    web: bool = True,
+    queue_workers: bool = True,
+    memcached_mb: int = 0,
+    local_services: bool = False,
+) -> ProcessModel:
+    """Pick uwsgi and queue worker settings; explicit operator overrides always win.
+
+    `web` and `queue_workers` say which tiers actually run on this instance
+    (see `roles`); memory is only budgeted for those. `memcached_mb` is the
+    instance-local cache, if any (see `memcached`). `local_services` reserves
+    memory for RabbitMQ and Redis in single-node mode (see `local_services`).
+    """
+    if queue_workers_mode not in QUEUE_WORKERS_MODES:
+        raise ValueError(f"queue_workers_mode must be one of {QUEUE_WORKERS_MODES}")
+
+    budget = mem_mb - RESERVED_MB - memcached_mb - (TORNADO_MB * tornado_processes if web else 0)
+    if local_services:
+        budget -= LOCAL_RABBITMQ_MB + LOCAL_REDIS_MB
+    if queue_workers_mode == "auto":
+        # only go multiprocess if the minimum uwsgi pool still fits alongside it
+        uwsgi_floor = MIN_UWSGI_PROCESSES * UWSGI_WORKER_MB if web else 0
+        multiprocess = queue_workers and budget - QUEUE_WORKERS_MULTIPROCESS_MB >= uwsgi_floor
+    else:
+        multiprocess = queue_workers_mode == "multiprocess"
+
+    if uwsgi_processes is None:
+        if queue_workers:
+            budget -= QUEUE_WORKERS_MULTIPROCESS_MB if multiprocess else QUEUE_WORKERS_THREADED_MB
+        by_memory = budget // UWSGI_WORKER_MB
+        by_cpu = vcpus * UWSGI_PROCESSES_PER_VCPU
+        uwsgi_processes = max(MIN_UWSGI_PROCESSES, min(by_memory, by_cpu, MAX_UWSGI_PROCESSES))
+
+    return ProcessModel(
+        uwsgi_processes=uwsgi_processes,
+        queue_workers_multiprocess=multiprocess,
+    )
@@ -0,0 +1,42 @@
+"""
+Re-applying Zulip's puppet configuration when the rendered zulip.conf changes.
+
+Settings such as `[application_server]` only take effect once puppet
+regenerates the uwsgi, supervisor and nginx configuration from them. The AMI
+records the zulip.conf it was baked with; puppet runs at boot only when the
+rendered file differs from the last one applied, so reboots stay fast.
+"""
+
+import configparser
+import os
+import shutil
+import subprocess
+from typing import Dict
+
+ZULIP_CONF = "/etc/zulip/zulip.conf"
+APPLIED_COPY = "/etc/zulip/zulip.conf.applied"
+PUPPET_APPLY = "/home/zulip/deployments/current/scripts/zulip-puppet-apply"
+
+
+def _read(path: str) -> Dict[str, Dict[str, str]]:
+    """Parse an ini file so that formatting and ordering differences do not count as changes."""
+    parser = configparser.RawConfigParser()
+    parser.read(path)
+    return {section: dict(parser.items(section)) for section in parser.sections()}
+
+
+def needs_apply(conf: str = ZULIP_CONF, applied: str = APPLIED_COPY) -> bool:
+    return _read(conf) != _read(applied)
+
+
+def apply_if_changed(conf: str = ZULIP_CONF, applied: str = APPLIED_COPY) -> bool:
+    """Run zulip-puppet-apply if zulip.conf changed; return whether it ran."""
+    if not needs_apply(conf, applied):
+        return False
+    subprocess.run([PUPPET_APPLY, "-f"], check=True)
+    # puppet (re)starts supervisor; Zulip must not start before the database
+    # is initialized, so leave starting it to the end of user_data.sh
+    subprocess.run(["systemctl", "stop", "supervisor"], check=False)
+    shutil.copy2(conf, applied)
+    os.chmod(applied, 0o644)
+    return True
@@ -0,0 +1,214 @@
+"""
+Readiness prober run before cfn-signal.
+
+Every component Zulip needs is checked concurrently with short timeouts, and
+the probe repeats with a short exponential backoff, so the instance signals
+CloudFormation as soon as the last component comes up. While waiting, each
+attempt logs which components are still holding readiness back.
+"""
+
+import http.client
+import logging
+import socket
+import ssl
+import struct
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger("zulip_bootstrap")
+
+# (healthy, detail)
+CheckResult = Tuple[bool, str]
+
+CHECK_TIMEOUT_SECONDS = 3.0
+INITIAL_DELAY_SECONDS = 0.5
+MAX_DELAY_SECONDS = 8.0
+DEFAULT_DEADLINE_SECONDS = 300.0
+
+POSTGRES_SSL_REQUEST = struct.pack("!II", 8, 80877103)
+AMQP_0_9_1_HEADER = b"AMQP\x00\x00\x09\x01"
+AMQP_FRAME_METHOD = 1
+
+
+@dataclass
+class Check:
+    name: str
+    probe: Callable[[], CheckResult]
+
+
+def _run(check: Check) -> CheckResult:
+    try:
+        return check.probe()
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+def check_supervisor(disabled: Iterable[str] = ()) -> CheckResult:
+    """All supervisor programs are RUNNING, except the ones this role turned off.
+
+    `disabled` holds program names as in `roles.apply` (without the
+    `group:` prefix `supervisorctl status` shows for grouped programs); those
+    stay STOPPED with autostart=false and are not counted.
+    """
+    skipped = set(disabled)
+    result = subprocess.run(
+        ["supervisorctl", "status"],
+        capture_output=True,
+        text=True,
+        timeout=CHECK_TIMEOUT_SECONDS * 2,
+    )
+    not_running = []
+    programs = 0
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) < 2 or parts[0].rsplit(":", 1)[-1] in skipped:
+            continue
+        programs += 1
+        if parts[1] != "RUNNING":
+            not_running.append(f"{parts[0]}={parts[1]}")
+    if programs == 0:
+        return False, (result.stderr or result.stdout).strip() or "no programs reported"
+    if not_running:
+        return False, ", ".join(not_running)
+    return True, f"{programs} programs running"
+
+
+def check_django(hostname: str, address: str = "127.0.0.1", port: int = 443) -> CheckResult:
+    """The home page answers the way a healthy Zulip does, with or without a realm.
+
+    200, a 302 to /login/, or a 404 reading "No organization found" (no realm
+    created yet) all mean Django is serving requests.
+    """
+    context = ssl._create_unverified_context()
+    connection = http.client.HTTPSConnection(address, port, timeout=CHECK_TIMEOUT_SECONDS, context=context)
+    try:
+        connection.request("GET", "/", headers={"Host": hostname})
+        response = connection.getresponse()
+        body = response.read(65536).decode(errors="replace")
+    finally:
+        connection.close()
+    if response.status == 200:
+        return True, "200"
+    if response.status == 302 and "/login/" in (response.getheader("Location") or ""):
+        return True, "302 to /login/"
+    if response.status == 404 and "No organization found" in body:
+        return True, "404 no organization yet"
+    return False, f"HTTP {response.status}"
+
+
+def check_http_listener(address: str, port: int) -> CheckResult:
+    """Something is answering HTTP on the port (used for Tornado)."""
+    connection = http.client.HTTPConnection(address, port, timeout=CHECK_TIMEOUT_SECONDS)
+    try:
+        connection.request("GET", "/")
+        response = connection.getresponse()
+        response.read()
+    finally:
+        connection.close()
+    return True, f"HTTP {response.status}"
+
+
+def check_postgres(host: str, port: int = 5432) -> CheckResult:
+    """The server answers a PostgreSQL SSLRequest ('S' or 'N')."""
+    with socket.create_connection((host, port), timeout=CHECK_TIMEOUT_SECONDS) as sock:
+        sock.sendall(POSTGRES_SSL_REQUEST)
+        answer = sock.recv(1)
+    if answer in (b"S", b"N"):
+        return True, "accepting connections"
+    return False, f"unexpected reply {answer!r}"
+
+
+def check_redis(host: str, port: int = 6379) -> CheckResult:
+    """The server answers PING; an auth error still proves it is up."""
+    with socket.create_connection((host, port), timeout=CHECK_TIMEOUT_SECONDS) as sock:
+        sock.sendall(b"PING\r\n")
+        answer = sock.recv(64)
+    if answer.startswith(b"+PONG") or answer.startswith(b"-NOAUTH"):
+        return True, answer.split(b"\r\n")[0].decode()
+    return False, f"unexpected reply {answer[:32]!r}"
+
+
+def check_memcached(host: str, port: int = 11211) -> CheckResult:
+    """The server answers the text protocol `version` command."""
+    with socket.create_connection((host, port), timeout=CHECK_TIMEOUT_SECONDS) as sock:
+        sock.sendall(b"version\r\n")
+        answer = sock.recv(64)
+    if answer.startswith(b"VERSION"):
+        return True, answer.split(b"\r\n")[0].decode()
+    return False, f"unexpected reply {answer[:32]!r}"
+
+
+def check_rabbitmq(host: str, port: int = 5671, use_tls: bool = True) -> CheckResult:
+    """The broker starts an AMQP 0-9-1 handshake (Connection.Start method frame)."""
+    raw = socket.create_connection((host, port), timeout=CHECK_TIMEOUT_SECONDS)
+    sock = ssl.create_default_context().wrap_socket(raw, server_hostname=host) if use_tls else raw
+    with sock:
+        sock.sendall(AMQP_0_9_1_HEADER)
+        frame_type = sock.recv(1)
+    if frame_type == bytes([AMQP_FRAME_METHOD]):
+        return True, "AMQP handshake started"
+    return False, f"unexpected reply {frame_type!r}"
+
+
+def default_checks(
+    hostname: str,
+    db_host: str,
+    redis_host: str,
+    rabbitmq_host: str,
+    tornado_ports: Optional[List[int]] = None,
+    memcached_location: str = "",
+    rabbitmq_port: int = 5671,
+    rabbitmq_use_tls: bool = True,
+    disabled_programs: Iterable[str] = (),
+) -> List[Check]:
+    checks = [
+        Check("supervisor", lambda: check_supervisor(disabled_programs)),
+        Check("django", lambda: check_django(hostname)),
+        Check("postgres", lambda: check_postgres(db_host)),
+        Check("redis", lambda: check_redis(redis_host)),
+        Check("rabbitmq", lambda: check_rabbitmq(rabbitmq_host, rabbitmq_port, rabbitmq_use_tls)),
+    ]
+    for port in tornado_ports or [9800]:
+        checks.append(Check(f"tornado:{port}", lambda port=port: check_http_listener("127.0.0.1", port)))
+    for server in filter(None, memcached_location.split(",")):
+        host, port = server.rsplit(":", 1)
+        checks.append(Check(f"memcached:{host}", lambda host=host, port=int(port): check_memcached(host, port)))
+    return checks
+
+
+def probe_once(checks: List[Check]) -> Dict[str, CheckResult]:
+    with ThreadPoolExecutor(max_workers=len(checks)) as pool:
+        results = pool.map(_run, checks)
+        return {check.name: result for check, result in zip(checks, results)}
+
+
+def wait_until_ready(
+    checks: List[Check],
+    deadline_seconds: float = DEFAULT_DEADLINE_SECONDS,
+    initial_delay: float = INITIAL_DELAY_SECONDS,
+    max_delay: float = MAX_DELAY_SECONDS,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Tuple[bool, Dict[str, CheckResult]]:
+    """Probe until every check passes or the deadline passes; return (ready, last results)."""
+    start = clock()
+    delay = initial_delay
+    attempt = 0
+    while True:
+        attempt += 1
+        results = probe_once(checks)
+        blocking = {name: detail for name, (ok, detail) in results.items() if not ok}
+        elapsed = clock() - start
+        if not blocking:
+            log.info("Ready after %.1fs (%d attempts)", elapsed, attempt)
+            return True, results
+        summary = "; ".join(f"{name}: {detail}" for name, detail in blocking.items())
+        if elapsed + delay > deadline_seconds:
+            log.error("Not ready after %.1fs; still waiting on %s", elapsed, summary)
+            return False, results
+        log.info("Attempt %d: waiting on %s; retrying in %.1fs", attempt, summary, delay)
+        sleep(delay)
+        delay = min(delay * 2, max_delay)
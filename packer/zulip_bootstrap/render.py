@@ -0,0 +1,263 @@
+"""
+Rendering of /etc/zulip/zulip.conf, settings.py and zulip-secrets.conf.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from string import Template
+from typing import Dict, Optional
+
+from zulip_bootstrap.aws import BootstrapSecrets
+from zulip_bootstrap.config import BootstrapConfig
+from zulip_bootstrap import local_services, sharding, uploads_cache
+from zulip_bootstrap.process_model import ProcessModel
+
+ZULIP_ETC = "/etc/zulip"
+
+# CloudFront path that serves the avatars bucket; must match AVATARS_PATH in cdk/zulip/cdn.py
+AVATARS_PATH = "user_avatars"
+
+# must match PUPPET_CLASSES in ubuntu_2404_appinstall.sh, since puppet is
+# re-applied at boot whenever zulip.conf changes
+PUPPET_CLASSES = "zulip::profile::app_frontend, zulip::local_mailserver, zulip::process_fts_updates"
+
+SETTINGS_PY = Template("""\
+from typing import Any, Dict, Tuple
+
+from .config import get_secret
+
+ZULIP_ADMINISTRATOR = ${zulip_administrator}
+EXTERNAL_HOST = ${external_host}
+ALLOWED_HOSTS = ["*"]
+
+EMAIL_HOST = ${email_host}
+EMAIL_HOST_USER = ${email_host_user}
+EMAIL_USE_TLS = True
+EMAIL_PORT = 587
+
+EMAIL_GATEWAY_PATTERN = ${email_gateway_pattern}
+EMAIL_GATEWAY_LOGIN = ""
+EMAIL_GATEWAY_IMAP_SERVER = ""
+EMAIL_GATEWAY_IMAP_PORT = 993
+EMAIL_GATEWAY_IMAP_FOLDER = "INBOX"
+
+AUTHENTICATION_BACKENDS: Tuple[str, ...] = (
+    "zproject.backends.EmailAuthBackend",  # Email and password; just requires SMTP setup
+)
+
+REMOTE_POSTGRES_HOST = ${remote_postgres_host}
+
+RABBITMQ_HOST = ${rabbitmq_host}
+RABBITMQ_PORT = ${rabbitmq_port}
+RABBITMQ_USE_TLS = ${rabbitmq_use_tls}
+## To use another RabbitMQ user than the default "zulip", set RABBITMQ_USERNAME here.
+RABBITMQ_USERNAME = ${rabbitmq_username}
+
+REDIS_HOST = ${redis_host}
+
+MEMCACHED_LOCATION = ${memcached_location}
+## To authenticate to memcached, set memcached_password in zulip-secrets.conf,
+## and optionally change the default username "zulip@localhost" here.
+## ElastiCache Memcached does not support SASL; access to it is limited by
+## security group instead.
+# MEMCACHED_USERNAME = "zulip@localhost"
+
+## Controls whether session cookies expire when the browser closes
+SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+
+## Session cookie expiry in seconds after the last page load
+SESSION_COOKIE_AGE = 60 * 60 * 24 * 7 * 2  # 2 weeks
+
+## Controls whether or not Zulip will parse links starting with
+## "file:///" as a hyperlink (useful if you have e.g. an NFS share).
+ENABLE_FILE_LINKS = False
+
+## By default, files uploaded by users and profile pictures are stored
+## directly on the Zulip server.  You can configure files being instead
+## stored in Amazon S3 or another scalable data store here.  See docs at:
+##
+##   https://zulip.readthedocs.io/en/latest/production/upload-backends.html
+##
+## If you change LOCAL_UPLOADS_DIR to a different path, you will also
+## need to manually edit Zulip's nginx configuration to use the new
+## path.  For that reason, we recommend replacing /home/zulip/uploads
+## with a symlink instead of changing LOCAL_UPLOADS_DIR.
+# LOCAL_UPLOADS_DIR = "/home/zulip/uploads"
+S3_AUTH_UPLOADS_BUCKET = ${s3_auth_uploads_bucket}
+S3_AVATAR_BUCKET = ${s3_avatar_bucket}
+S3_REGION = ${s3_region}
+${s3_avatar_public_url_prefix}
+${s3_endpoint_url}
+${s3_addressing_style}
+# S3_SKIP_PROXY = True
+
+MAX_FILE_UPLOAD_SIZE = 25
+NAME_CHANGES_DISABLED = False
+AVATAR_CHANGES_DISABLED = False
+ENABLE_GRAVATAR = True
+
+${giphy_api_key}
+${push_notification_bouncer_url}
+${sentry_dsn}
+
+## The default CAMO_URI of "/external_content/" is served by the camo
+## setup in the default Zulip nginx configuration.  Setting CAMO_URI
+## to "" will disable the Camo integration.
+CAMO_URI = ""
+""")
+
+
+def _py_str(value: str) -> str:
+    """Quote a value as a Python string literal."""
+    return json.dumps(value)
+
+
+def _optional_setting(name: str, value: str, placeholder: str) -> str:
+    if value:
+        return f"{name} = {_py_str(value)}"
+    return f"# {name} = {placeholder}"
+
+
+def _ini(sections: Dict[str, Dict[str, str]]) -> str:
+    blocks = []
+    for name, values in sections.items():
+        lines = [f"[{name}]"] + [f"{key} = {value}" for key, value in values.items()]
+        blocks.append("\n".join(lines) + "\n")
+    return "\n".join(blocks)
+
+
+def _bool(value: bool) -> str:
+    return "true" if value else "false"
+
+
+def puppet_classes(config: BootstrapConfig) -> str:
+    if config.single_node:
+        return f"{PUPPET_CLASSES}, {local_services.PUPPET_CLASSES}"
+    return PUPPET_CLASSES
+
+
+def render_zulip_conf(config: BootstrapConfig, process_model: ProcessModel, s3_disk_cache_mb: Optional[int] = None) -> str:
+    sections = {
+        "machine": {
+            "puppet_classes": puppet_classes(config),
+            "deploy_type": "production",
+        },
+        "postgresql": {
+            "missing_dictionaries": "true",
+        },
+        "application_server": {
+            "uwsgi_processes": str(process_model.uwsgi_processes),
+            "queue_workers_multiprocess": _bool(process_model.queue_workers_multiprocess),
+        },
+    }
+    if s3_disk_cache_mb:
+        sections["application_server"].update({
+            "s3_disk_cache_size": f"{s3_disk_cache_mb}M",
+            "s3_memory_cache_size": f"{uploads_cache.memory_cache_mb(s3_disk_cache_mb)}M",
+        })
+    tornado_sharding = sharding.sharding_section(config.hostname, int(config.tornado_shards))
+    if tornado_sharding:
+        sections["tornado_sharding"] = tornado_sharding
+    return _ini(sections)
+
+
+def render_settings(config: BootstrapConfig, secrets: BootstrapSecrets) -> str:
+    return SETTINGS_PY.substitute(
+        zulip_administrator=_py_str(config.admin_email or f"zulip@{config.hosted_zone_name}"),
+        external_host=_py_str(config.hostname),
+        email_host=_py_str(f"email-smtp.{config.region}.amazonaws.com"),
+        email_host_user=_py_str(secrets.instance["access_key_id"]),
+        email_gateway_pattern=_py_str(f"%s@{config.hostname}" if config.enable_incoming_email else ""),
+        remote_postgres_host=_py_str(config.app_db_host),
+        rabbitmq_host=_py_str(secrets.rabbitmq_host),
+        rabbitmq_port=str(config.rabbitmq_port),
+        rabbitmq_use_tls=str(config.rabbitmq_use_tls),
+        rabbitmq_username=_py_str(secrets.rabbitmq["username"]),
+        redis_host=_py_str(config.redis_host),
+        memcached_location=_py_str(secrets.memcached_location),
+        s3_auth_uploads_bucket=_py_str(config.assets_bucket_name),
+        s3_avatar_bucket=_py_str(config.avatars_bucket_name),
+        s3_region=_py_str(config.region),
+        s3_endpoint_url=_optional_setting("S3_ENDPOINT_URL", config.s3_endpoint_url, "None"),
+        # S3-compatible stores like MinIO don't resolve bucket subdomains
+        s3_addressing_style=_optional_setting("S3_ADDRESSING_STYLE", "path" if config.s3_endpoint_url else "", '"auto"'),
+        s3_avatar_public_url_prefix=_optional_setting(
+            "S3_AVATAR_PUBLIC_URL_PREFIX",
+            f"https://{config.hostname}/{AVATARS_PATH}/" if config.cdn_enabled else "",
+            '""'
+        ),
+        giphy_api_key=_optional_setting("GIPHY_API_KEY", config.giphy_api_key, '"<Your API key from GIPHY>"'),
+        push_notification_bouncer_url=_optional_setting(
+            "PUSH_NOTIFICATION_BOUNCER_URL",
+            "https://push.zulipchat.com" if config.enable_mobile_push_notifications else "",
+            '""'
+        ),
+        sentry_dsn=_optional_setting("SENTRY_DSN", config.sentry_dsn, '""'),
+    )
+
+
+def render_secrets(config: BootstrapConfig, secrets: BootstrapSecrets) -> str:
+    instance = secrets.instance
+    lines = [
+        "[secrets]",
+        f"avatar_salt = {instance['avatar_salt']}",
+        f"rabbitmq_password = {secrets.rabbitmq['password']}",
+        f"email_password = {instance['smtp_password']}",
+        f"shared_secret = {instance['shared_secret']}",
+        f"secret_key = {instance['secret_key']}",
+        f"camo_key = {instance['camo_key']}",
+        '# memcached_password = ""',
+        # ElastiCache Redis runs without AUTH; the local one requires a password
+        f"redis_password = {instance['redis_password']}" if config.single_node else '# redis_password = ""',
+        f"s3_key = {instance['access_key_id']}",
+        f"s3_secret_key = {instance['secret_access_key']}",
+        f"zulip_org_key = {instance['zulip_org_key']}",
+        f"zulip_org_id = {instance['zulip_org_id']}",
+        f"postgres_password = {secrets.db['password']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def render_all(
+    config: BootstrapConfig,
+    secrets: BootstrapSecrets,
+    process_model: ProcessModel,
+    s3_disk_cache_mb: Optional[int] = None,
+) -> Dict[str, str]:
+    """Return the contents of every Zulip config file, keyed by file name under /etc/zulip."""
+    return {
+        "zulip.conf": render_zulip_conf(config, process_model, s3_disk_cache_mb),
+        "settings.py": render_settings(config, secrets),
+        "zulip-secrets.conf": render_secrets(config, secrets),
+    }
+
+
+def write_file(path: str, contents: str, mode: int = 0o644, group: Optional[str] = None) -> None:
+    """Atomically replace `path` so a crashed boot never leaves a half-written config."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".bootstrap-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(contents)
+        os.chmod(tmp_path, mode)
+        if group is not None:
+            shutil.chown(tmp_path, group=group)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_all(rendered: Dict[str, str], etc_dir: str = ZULIP_ETC, secrets_group: Optional[str] = "zulip") -> None:
+    settings_path = os.path.join(etc_dir, "settings.py")
+    if os.path.exists(settings_path):
+        shutil.copy2(settings_path, settings_path + ".orig")
+    for name, contents in rendered.items():
+        path = os.path.join(etc_dir, name)
+        if name == "zulip-secrets.conf":
+            write_file(path, contents, mode=0o640, group=secrets_group)
+        else:
+            write_file(path, contents)
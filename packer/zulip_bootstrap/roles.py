@@ -0,0 +1,105 @@
+"""
+Web and queue-worker roles for instances launched from the same AMI.
+
+The optional queue-worker Auto Scaling group reuses the web tier's launch
+template and tags its instances with `ROLE_TAG`. Puppet always installs the
+full `app_frontend` supervisor config; each role then turns off the programs
+that belong to the other tier by setting `autostart=false`, so the split
+survives supervisor restarts and reboots.
+"""
+
+import glob
+import logging
+import re
+from typing import Callable, Dict, List, Set
+
+WEB = "web"
+QUEUE_WORKER = "queue_worker"
+ROLES = (WEB, QUEUE_WORKER)
+
+ROLE_TAG = "oe:patterns:zulip:role"
+SUPERVISOR_CONF_GLOB = "/etc/supervisor/conf.d/zulip/*.conf"
+QUEUE_WORKERS_GROUP = "zulip-workers"
+WEB_PROGRAM_PREFIXES = ("zulip-django", "zulip-tornado")
+
+_SECTION = re.compile(r"^\[(?P<name>[^\]]+)\]\s*$")
+_AUTOSTART = re.compile(r"^autostart\s*=")
+
+log = logging.getLogger(__name__)
+
+
+def resolve(instance_tag: Callable[[str], object]) -> str:
+    """Return the role named by the instance tag, defaulting to the web tier."""
+    role = instance_tag(ROLE_TAG)
+    return role if role in ROLES else WEB
+
+
+def _sections(lines: List[str]) -> List[List[str]]:
+    """Split a supervisor config into [header, body...] chunks (the first may be headerless)."""
+    sections: List[List[str]] = [[]]
+    for line in lines:
+        if _SECTION.match(line):
+            sections.append([])
+        sections[-1].append(line)
+    return sections
+
+
+def _section_name(section: List[str]) -> str:
+    match = _SECTION.match(section[0]) if section else None
+    return match.group("name") if match else ""
+
+
+def queue_worker_programs(files: Dict[str, str]) -> Set[str]:
+    programs: Set[str] = set()
+    for contents in files.values():
+        for section in _sections(contents.splitlines(keepends=True)):
+            if _section_name(section) != f"group:{QUEUE_WORKERS_GROUP}":
+                continue
+            for line in section[1:]:
+                key, _, value = line.partition("=")
+                if key.strip() == "programs":
+                    programs.update(p.strip() for p in value.split(",") if p.strip())
+    return programs
+
+
+def disable_programs(contents: str, programs: Set[str]) -> str:
+    """Set autostart=false on the given `[program:x]` sections."""
+    output = []
+    for section in _sections(contents.splitlines(keepends=True)):
+        name = _section_name(section)
+        if name.startswith("program:") and name[len("program:"):] in programs:
+            body = [line for line in section[1:] if not _AUTOSTART.match(line)]
+            section = [section[0], "autostart=false\n"] + body
+        output.extend(section)
+    return "".join(output)
+
+
+def programs_to_disable(role: str, files: Dict[str, str], queue_worker_tier: bool) -> Set[str]:
+    workers = queue_worker_programs(files)
+    if role == QUEUE_WORKER:
+        names: Set[str] = set()
+        for contents in files.values():
+            for section in _sections(contents.splitlines(keepends=True)):
+                name = _section_name(section)
+                if name.startswith("program:") and name[len("program:"):].startswith(WEB_PROGRAM_PREFIXES):
+                    names.add(name[len("program:"):])
+        return names
+    return workers if queue_worker_tier else set()
+
+
+def apply(role: str, queue_worker_tier: bool, conf_glob: str = SUPERVISOR_CONF_GLOB) -> Set[str]:
+    """Turn off the other tier's supervisor programs; return the programs disabled."""
+    files = {}
+    for path in sorted(glob.glob(conf_glob)):
+        with open(path) as f:
+            files[path] = f.read()
+    programs = programs_to_disable(role, files, queue_worker_tier)
+    if not programs:
+        return programs
+    for path, contents in files.items():
+        updated = disable_programs(contents, programs)
+        if updated != contents:
+            with open(path, "w") as f:
+                f.write(updated)
+    log.info("Role %s: disabled %s", role, ", ".join(sorted(programs)))
+    return programs
@@ -0,0 +1,71 @@
+"""
+Tornado sharding across realms.
+
+Each Tornado process holds the event queues of the realms routed to it, so
+multi-realm deployments can spread real-time traffic over several cores.
+Realms are assigned to shards by the first character of their subdomain;
+the root realm always lives on the first shard. Zulip's puppet and
+`scripts/lib/sharding.py` turn the `[tornado_sharding]` section into the
+supervisor programs and the nginx routing map.
+"""
+
+import os
+import re
+import string
+from typing import Dict, List
+
+BASE_PORT = 9800
+MAX_SHARDS = 16
+
+# realm subdomains start with a lowercase letter or digit
+_FIRST_CHARACTERS = string.digits + string.ascii_lowercase
+
+
+def ports(shards: int) -> List[int]:
+    return [BASE_PORT + shard for shard in range(shards)]
+
+
+def _character_class(characters: str) -> str:
+    """Compress e.g. "0123456789abc" into "[0-9a-c]"."""
+    runs: List[List[str]] = []
+    for character in characters:
+        if runs and ord(character) == ord(runs[-1][-1]) + 1:
+            runs[-1].append(character)
+        else:
+            runs.append([character])
+    parts = [run[0] if len(run) == 1 else f"{run[0]}-{run[-1]}" for run in runs]
+    return "[" + "".join(parts) + "]"
+
+
+def sharding_section(hostname: str, shards: int) -> Dict[str, str]:
+    """Return the `[tornado_sharding]` entries for `shards` Tornado processes (empty for one)."""
+    if not 1 <= shards <= MAX_SHARDS:
+        raise ValueError(f"tornado shards must be between 1 and {MAX_SHARDS}")
+    if shards == 1:
+        return {}
+
+    section = {str(BASE_PORT): hostname}
+    per_shard, extra = divmod(len(_FIRST_CHARACTERS), shards)
+    start = 0
+    for shard, port in enumerate(ports(shards)):
+        end = start + per_shard + (1 if shard < extra else 0)
+        first = _character_class(_FIRST_CHARACTERS[start:end])
+        section[f"{port}_regex"] = f"^{first}[^.]*\\.{re.escape(hostname)}$"
+        start = end
+    return section
+
+
+def promote_staged(etc_dir: str = "/etc/zulip") -> bool:
+    """Move the routing files staged by puppet into place, like refresh-sharding-and-restart.
+
+    Zulip's own script also restarts the server, which must wait until the
+    database has been initialized; nginx and supervisor are started later
+    in user_data.sh.
+    """
+    promoted = False
+    for name in ("nginx_sharding_map.conf", "sharding.json"):
+        staged = os.path.join(etc_dir, name + ".tmp")
+        if os.path.exists(staged):
+            os.replace(staged, os.path.join(etc_dir, name))
+            promoted = True
+    return promoted
@@ -0,0 +1,70 @@
+"""
+Placement and sizing of nginx's cache for uploads proxied from S3.
+
+Zulip's nginx serves authenticated uploads by proxying S3 through a
+`proxy_cache` in CACHE_DIR, sized by `s3_disk_cache_size` in zulip.conf.
+When the instance type has NVMe instance storage, the cache is put on it so
+hot attachments are served from local flash without using root volume IOPS.
+Instance storage is wiped on stop/start; the directory on the root volume
+then takes over until the next first boot.
+"""
+
+import glob
+import os
+import subprocess
+from typing import List, Optional
+
+CACHE_DIR = "/srv/zulip-uploaded-files-cache"
+INSTANCE_STORE_GLOB = "/dev/disk/by-id/nvme-Amazon_EC2_NVMe_Instance_Storage_*"
+PLACEMENTS = ("auto", "root-volume")
+
+# leave headroom for nginx's cache manager, which only trims to max_size periodically
+MAX_FILESYSTEM_FRACTION = 0.8
+
+
+def instance_store_devices(pattern: str = INSTANCE_STORE_GLOB) -> List[str]:
+    """Return the NVMe instance store block devices, without partitions."""
+    devices = {
+        os.path.realpath(link)
+        for link in glob.glob(pattern)
+        if "-part" not in os.path.basename(link)
+    }
+    return sorted(devices)
+
+
+def prepare(placement: str, cache_dir: str = CACHE_DIR, devices: Optional[List[str]] = None) -> Optional[str]:
+    """Mount the first instance store device on `cache_dir` if allowed; return the device used."""
+    if placement not in PLACEMENTS:
+        raise ValueError(f"uploads cache placement must be one of {PLACEMENTS}")
+    if placement == "root-volume":
+        return None
+    if devices is None:
+        devices = instance_store_devices()
+    if not devices:
+        return None
+
+    device = devices[0]
+    if os.path.ismount(cache_dir):
+        # configure is being re-run on this instance
+        return device
+    os.makedirs(cache_dir, exist_ok=True)
+    subprocess.run(["mkfs.ext4", "-q", "-F", "-L", "zulip-cache", device], check=True)
+    subprocess.run(["mount", "-o", "noatime", device, cache_dir], check=True)
+    # nginx runs as the zulip user
+    subprocess.run(["chown", "zulip:zulip", cache_dir], check=True)
+    return device
+
+
+def disk_cache_mb(size_gb: int, cache_dir: str = CACHE_DIR) -> int:
+    """The requested cache size, capped to what the filesystem holding `cache_dir` can take."""
+    path = cache_dir
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    stat = os.statvfs(path)
+    capacity_mb = stat.f_blocks * stat.f_frsize // (1024 * 1024)
+    return max(1, min(size_gb * 1024, int(capacity_mb * MAX_FILESYSTEM_FRACTION)))
+
+
+def memory_cache_mb(disk_mb: int) -> int:
+    """Keys zone size: 1 MiB holds about 8000 keys, plenty for 1 GiB of attachments."""
+    return max(1, -(-disk_mb // 1024))
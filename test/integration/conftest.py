@@ -24,6 +24,13 @@ def pytest_addoption(parser):
         default=None,
         help="CloudFormation stack name"
     )
+    parser.addoption(
+        "--realm-pool-size",
+        action="store",
+        type=int,
+        default=0,
+        help="Subdomain realms to keep provisioned (at least one per xdist worker)"
+    )
 
 
 @pytest.fixture(scope="session")
@@ -93,7 +100,11 @@ def stack_outputs(cloudformation_client, stack_name):
 
 @pytest.fixture(scope="session")
 def instance_id(ec2_client, stack_name):
-    """Get EC2 instance ID from stack."""
+    """Get EC2 instance ID from stack, or the stand-in's container when TEST_LOCAL_CONTAINER is set."""
+    container = os.environ.get("TEST_LOCAL_CONTAINER")
+    if container:
+        from realm_helpers import LOCAL_INSTANCE_PREFIX
+        return f"{LOCAL_INSTANCE_PREFIX}{container}"
     try:
         response = ec2_client.describe_instances(
             Filters=[
@@ -111,21 +122,40 @@ def instance_id(ec2_client, stack_name):
 
 
 @pytest.fixture(scope="session")
-def realm_credentials(ssm_client, instance_id, base_url):
-    """Bootstrap a Zulip realm via SSM and return admin credentials.
+def realm_credentials(request, ssm_client, instance_id, base_url):
+    """Claim this worker's subdomain realm from the realm pool and return its admin credentials.
 
-    Session-scoped: runs once per `pytest` invocation, reused across workflow tests.
+    Session-scoped, so once per xdist worker. The pool is recorded in the pytest
+    cache: the first worker to take the lock checks it, creates any missing
+    realms in one SSM call, and the other workers reuse what it recorded.
+    Valid realms carry over to later runs, so most runs skip SSM entirely.
     """
-    from realm_helpers import bootstrap_realm
-    return bootstrap_realm(ssm_client, instance_id, base_url)
+    from filelock import FileLock
+    from realm_helpers import ensure_realm_pool
+
+    workers = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", "1"))
+    worker = int(os.environ.get("PYTEST_XDIST_WORKER", "gw0")[2:])
+    size = max(workers, request.config.getoption("--realm-pool-size"))
+    state_path = request.config.cache.mkdir("realm-pool") / "pool.json"
+    with FileLock(f"{state_path}.lock"):
+        pool = ensure_realm_pool(
+            ssm_client,
+            instance_id,
+            base_url,
+            size,
+            state_path,
+            run_id=os.environ.get("PYTEST_XDIST_TESTRUNUID"),
+        )
+    return pool[worker]
 
 
 @pytest.fixture(scope="session")
-def api_key(base_url, realm_credentials):
-    """Return an authenticated API key for the bootstrapped admin user."""
-    from realm_helpers import fetch_api_key
-    return fetch_api_key(
-        base_url,
-        realm_credentials["email"],
-        realm_credentials["password"],
-    )
+def realm_url(realm_credentials):
+    """Base URL of this worker's realm (`<string_id>.<hostname>`)."""
+    return realm_credentials["url"]
+
+
+@pytest.fixture(scope="session")
+def api_key(realm_credentials):
+    """Return an authenticated API key for the realm's admin user (obtained via `fetch_api_key`)."""
+    return realm_credentials["api_key"]
@@ -4,21 +4,32 @@ Helpers for bootstrapping a Zulip realm via SSM and authenticating against it.
 A fresh Zulip deploy has no realm; the home page returns 404 ("No organization found")
 until one is created. To run end-to-end workflow tests, we use SSM to invoke
 `manage.py create_realm` on the EC2 instance, then authenticate via Zulip's API.
+Against the offline stand-in (`test/local/`), the "instance" is a container and
+the same commands go through `docker exec` instead.
 """
 
+import json
 import secrets
 import string
-import time
-from typing import Dict, List
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
 
 import requests
 
+import ssm_fleet
+
 
 ADMIN_EMAIL = "admin@example.com"
 ADMIN_FULL_NAME = "Test Admin"
 REALM_NAME = "Test Org"
 # Empty string_id means the realm is served at the root host (DnsHostname).
 REALM_STRING_ID = ""
+# Pool realms are served at <prefix><n>.<DnsHostname> through the *.<hostname> record.
+POOL_REALM_PREFIX = "itpool"
+# instance ids of the form docker:<container> address the local stand-in
+LOCAL_INSTANCE_PREFIX = "docker:"
 
 
 def _generate_password(length: int = 24) -> str:
@@ -26,34 +37,34 @@ def _generate_password(length: int = 24) -> str:
     return "".join(secrets.choice(alphabet) for _ in range(length))
 
 
-def _ssm_run(ssm_client, instance_id: str, commands: List[str], timeout: int = 180) -> Dict[str, str]:
-    """Send a shell-script command via SSM, poll until terminal, return status + stdout/stderr."""
-    response = ssm_client.send_command(
-        InstanceIds=[instance_id],
-        DocumentName="AWS-RunShellScript",
-        Parameters={"commands": commands},
-    )
-    command_id = response["Command"]["CommandId"]
-
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        time.sleep(3)
-        try:
-            inv = ssm_client.get_command_invocation(
-                CommandId=command_id,
-                InstanceId=instance_id,
-            )
-        except ssm_client.exceptions.InvocationDoesNotExist:
-            continue
+def _docker_run(container: str, commands: List[str], timeout: int) -> Dict[str, str]:
+    # AWS-RunShellScript also runs the commands as one root shell script
+    try:
+        result = subprocess.run(
+            ["docker", "exec", container, "bash", "-c", "\n".join(commands)],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {"status": "TimedOut", "stdout": "", "stderr": ""}
+    return {
+        "status": "Success" if result.returncode == 0 else "Failed",
+        "stdout": result.stdout,
+        "stderr": result.stderr,
+    }
 
-        if inv["Status"] in ("Success", "Failed", "Cancelled", "TimedOut"):
-            return {
-                "status": inv["Status"],
-                "stdout": inv.get("StandardOutputContent", ""),
-                "stderr": inv.get("StandardErrorContent", ""),
-            }
 
-    raise TimeoutError(f"SSM command {command_id} did not complete in {timeout}s")
+def _ssm_run(ssm_client, instance_id: str, commands: List[str], timeout: int = 180) -> Dict[str, str]:
+    """Send a shell-script command via SSM, wait until terminal, return status + stdout/stderr."""
+    if instance_id.startswith(LOCAL_INSTANCE_PREFIX):
+        return _docker_run(instance_id[len(LOCAL_INSTANCE_PREFIX):], commands, timeout)
+    result = ssm_fleet.run(ssm_client, [instance_id], commands, timeout=timeout).results[instance_id]
+    return {
+        "status": result.status,
+        "stdout": result.stdout,
+        "stderr": result.stderr,
+    }
 
 
 def realm_is_active(base_url: str) -> bool:
@@ -132,6 +143,32 @@ def bootstrap_realm(ssm_client, instance_id: str, base_url: str) -> Dict[str, st
     }
 
 
+def create_users(ssm_client, instance_id: str, emails: List[str], password: str) -> None:
+    """Create users in the root realm via `manage.py create_user` over SSM, all in one invocation."""
+    pw_file = "/tmp/zulip-create-users-pw"
+    commands = [
+        "set -eu",
+        f"sudo rm -f {pw_file}",
+        f"echo {password!r} | sudo tee {pw_file} >/dev/null",
+        f"sudo chown zulip:zulip {pw_file}",
+        f"sudo chmod 600 {pw_file}",
+    ] + [
+        f"sudo -u zulip /home/zulip/deployments/current/manage.py create_user "
+        f"-r '' --password-file={pw_file} --this-user-has-accepted-the-tos "
+        f"'{email}' '{email.split('@')[0]}'"
+        for email in emails
+    ] + [f"sudo rm -f {pw_file}"]
+
+    # each manage.py run loads Django, a few seconds apiece
+    result = _ssm_run(ssm_client, instance_id, commands, timeout=120 + 5 * len(emails))
+    if result["status"] != "Success":
+        raise RuntimeError(
+            f"Creating users failed via SSM: {result['status']}\n"
+            f"stdout: {result['stdout']}\n"
+            f"stderr: {result['stderr']}"
+        )
+
+
 def fetch_api_key(base_url: str, email: str, password: str) -> str:
     """Authenticate via password and return an API key."""
     response = requests.post(
@@ -144,3 +181,130 @@ def fetch_api_key(base_url: str, email: str, password: str) -> str:
     if data.get("result") != "success":
         raise RuntimeError(f"fetch_api_key failed: {data}")
     return data["api_key"]
+
+
+def realm_url(base_url: str, string_id: str) -> str:
+    """URL of the realm with `string_id`, a subdomain of the root host."""
+    if not string_id:
+        return base_url
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{string_id}.{parts.netloc}"
+
+
+def _pool_realm(base_url: str, index: int) -> Dict[str, str]:
+    string_id = f"{POOL_REALM_PREFIX}{index}"
+    return {
+        "email": ADMIN_EMAIL,
+        "password": _generate_password(),
+        "full_name": ADMIN_FULL_NAME,
+        "realm_name": f"{REALM_NAME} {index}",
+        "realm_string_id": string_id,
+        "url": realm_url(base_url, string_id),
+    }
+
+
+def _serves_realm(url: str) -> bool:
+    try:
+        return realm_is_active(url)
+    except requests.RequestException:
+        return False
+
+
+def create_realms(ssm_client, instance_id: str, realms: List[Dict[str, str]]) -> None:
+    """Create subdomain realms + admin users in one SSM invocation.
+
+    A realm with the same string_id that is still being served (e.g. one
+    whose recorded API key no longer works) is deleted first. The
+    `manage.py` runs for different realms go in parallel on the instance, and
+    each reports "created <string_id>" so failures can be told apart; a failed
+    deletion's output ends up in the error like a failed creation's.
+    """
+    commands = ["set -eu"]
+    for realm in realms:
+        pw_file = f"/tmp/zulip-pool-pw-{realm['realm_string_id']}"
+        commands += [
+            f"sudo rm -f {pw_file}",
+            f"echo {realm['password']!r} | sudo tee {pw_file} >/dev/null",
+            f"sudo chown zulip:zulip {pw_file}",
+            f"sudo chmod 600 {pw_file}",
+        ]
+    for realm in realms:
+        string_id = realm["realm_string_id"]
+        manage = "sudo -u zulip /home/zulip/deployments/current/manage.py"
+        delete = ""
+        if _serves_realm(realm["url"]):
+            # delete_realm's confirmation prompt compares against the string_id
+            delete = f"echo {string_id!r} | {manage} delete_realm -r {string_id!r} --automated && "
+        commands.append(
+            f"( {delete}{manage} create_realm --string-id={string_id} --automated"
+            f" --password-file=/tmp/zulip-pool-pw-{string_id}"
+            f" '{realm['realm_name']}' '{realm['email']}' '{realm['full_name']}'"
+            f" && echo 'created {string_id}' || echo 'failed {string_id}' ) &"
+        )
+    commands += ["wait", "sudo rm -f /tmp/zulip-pool-pw-*"]
+
+    result = _ssm_run(ssm_client, instance_id, commands, timeout=240 + 30 * len(realms))
+    created = {line.split()[1] for line in result["stdout"].splitlines() if line.startswith("created ")}
+    failed = [realm["realm_string_id"] for realm in realms if realm["realm_string_id"] not in created]
+    if result["status"] != "Success" or failed:
+        raise RuntimeError(
+            f"Realm pool bootstrap failed via SSM: {result['status']}, failed realms: {failed}\n"
+            f"stdout: {result['stdout']}\n"
+            f"stderr: {result['stderr']}"
+        )
+
+
+def realm_is_valid(realm: Dict[str, str]) -> bool:
+    """True if the realm still exists and its recorded API key still works."""
+    try:
+        response = requests.get(
+            f"{realm['url']}/api/v1/users/me",
+            auth=(realm["email"], realm["api_key"]),
+            timeout=10,
+        )
+    except requests.RequestException:
+        return False
+    return response.status_code == 200
+
+
+def ensure_realm_pool(
+        ssm_client,
+        instance_id: str,
+        base_url: str,
+        size: int,
+        state_path: Path,
+        run_id: Optional[str] = None
+) -> List[Dict[str, str]]:
+    """Return `size` subdomain realms with API keys, creating only the ones that are missing.
+
+    Realms recorded in `state_path` by an earlier run are reused if they are
+    still valid; the rest are created in one batched SSM call. When the
+    state was already checked during this run (same `run_id`, e.g. by
+    another xdist worker) it is trusted as is.
+    """
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    known = {realm["realm_string_id"]: realm for realm in state.get("realms", [])} if state.get("base_url") == base_url else {}
+    if run_id and state.get("run_id") == run_id and len(known) >= size:
+        return [known[f"{POOL_REALM_PREFIX}{index}"] for index in range(size)]
+
+    pool, missing = [], []
+    for index in range(size):
+        realm = known.get(f"{POOL_REALM_PREFIX}{index}")
+        if realm is None or not realm_is_valid(realm):
+            realm = _pool_realm(base_url, index)
+            missing.append(realm)
+        pool.append(realm)
+
+    if missing:
+        create_realms(ssm_client, instance_id, missing)
+        for realm in missing:
+            # only the API key is kept in the state file
+            realm["api_key"] = fetch_api_key(realm["url"], realm["email"], realm.pop("password"))
+
+    known.update({realm["realm_string_id"]: realm for realm in pool})
+    state_path.write_text(json.dumps({
+        "base_url": base_url,
+        "run_id": run_id,
+        "realms": sorted(known.values(), key=lambda realm: realm["realm_string_id"]),
+    }, indent=2))
+    return pool
@@ -0,0 +1,207 @@
+"""
+Run a shell script on every running instance of the stack's Auto Scaling group via SSM.
+
+One `AWS-RunShellScript` command is sent to all instances at once. Progress is
+polled for the whole fleet with one `list_command_invocations` call per
+round, backing off from half a second, and each instance's output is read as
+soon as it finishes. With an S3 output location the full stdout and stderr
+are read from S3; `StandardOutputContent` from `get_command_invocation` is
+truncated at 24,000 characters, which large `manage.py` runs exceed.
+"""
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from botocore.exceptions import ClientError
+
+TERMINAL_STATUSES = ("Success", "Failed", "Cancelled", "TimedOut")
+POLL_INITIAL_SECONDS = 0.5
+POLL_MAX_SECONDS = 5.0
+POLL_BACKOFF = 1.5
+# time for SSM to deliver the command and report back, on top of the script's own timeout
+DELIVERY_GRACE_SECONDS = 60
+OUTPUT_WORKERS = 8
+# AWS-RunShellScript output is stored under <prefix>/<command id>/<instance id>/<this>/stdout|stderr
+PLUGIN_OUTPUT_PATH = "awsrunShellScript/0.awsrunShellScript"
+# the Auto Scaling groups this pattern creates, by logical id
+APP_ASG = "Asg"
+QUEUE_WORKER_ASG = "QueueWorkerAsg"
+
+
+@dataclass
+class InstanceResult:
+    instance_id: str
+    status: str
+    response_code: int
+    stdout: str
+    stderr: str
+    # how long the script ran on the instance, as reported by SSM
+    execution_seconds: float
+    # from sending the command until the runner saw this instance finish
+    wall_seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "Success"
+
+
+@dataclass
+class FleetResult:
+    command_id: str
+    results: Dict[str, InstanceResult]
+    wall_seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.results) and all(result.ok for result in self.results.values())
+
+    def failed(self) -> List[InstanceResult]:
+        return [result for result in self.results.values() if not result.ok]
+
+
+def asg_instance_ids(cloudformation, autoscaling, stack_name: str, logical_ids: Sequence[str] = (APP_ASG,)) -> List[str]:
+    """InService instances of the stack's Auto Scaling groups; groups the stack didn't create are skipped."""
+    names = []
+    for logical_id in logical_ids:
+        try:
+            resource = cloudformation.describe_stack_resource(StackName=stack_name, LogicalResourceId=logical_id)
+        except ClientError:
+            # e.g. QueueWorkerAsg when QueueWorkerAsgEnable is false
+            continue
+        names.append(resource["StackResourceDetail"]["PhysicalResourceId"])
+    if not names:
+        return []
+
+    groups = autoscaling.describe_auto_scaling_groups(AutoScalingGroupNames=names)["AutoScalingGroups"]
+    return sorted(
+        instance["InstanceId"]
+        for group in groups
+        for instance in group["Instances"]
+        if instance["LifecycleState"] == "InService"
+    )
+
+
+def stack_assets_bucket(cloudformation, stack_name: str) -> str:
+    """The stack's assets bucket, which the instance role can already write to, for SSM output."""
+    stack = cloudformation.describe_stacks(StackName=stack_name)["Stacks"][0]
+    for parameter in stack.get("Parameters", []):
+        if parameter["ParameterKey"] == "AssetsBucketName" and parameter.get("ParameterValue"):
+            return parameter["ParameterValue"]
+    for resource in cloudformation.describe_stack_resources(StackName=stack_name)["StackResources"]:
+        if resource["ResourceType"] == "AWS::S3::Bucket" and resource["LogicalResourceId"].startswith("AssetsBucket"):
+            return resource["PhysicalResourceId"]
+    raise LookupError(f"No assets bucket found in stack {stack_name}")
+
+
+def _invocations(ssm, command_id: str) -> List[Dict]:
+    invocations = []
+    for page in ssm.get_paginator("list_command_invocations").paginate(CommandId=command_id, Details=True):
+        invocations += page["CommandInvocations"]
+    return invocations
+
+
+def _read_output(s3, bucket: str, key: str) -> str:
+    try:
+        return s3.get_object(Bucket=bucket, Key=key)["Body"].read().decode(errors="replace")
+    except ClientError as e:
+        # SSM doesn't upload empty output
+        if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+            return ""
+        raise
+
+
+def _result(
+        ssm,
+        s3,
+        command_id: str,
+        invocation: Dict,
+        output_bucket: Optional[str],
+        output_prefix: str,
+        wall_seconds: float
+) -> InstanceResult:
+    instance_id = invocation["InstanceId"]
+    plugin = (invocation.get("CommandPlugins") or [{}])[0]
+    started, finished = plugin.get("ResponseStartDateTime"), plugin.get("ResponseFinishDateTime")
+
+    if output_bucket:
+        key = f"{output_prefix}/{command_id}/{instance_id}/{PLUGIN_OUTPUT_PATH}"
+        stdout = _read_output(s3, output_bucket, f"{key}/stdout")
+        stderr = _read_output(s3, output_bucket, f"{key}/stderr")
+        s3.delete_objects(Bucket=output_bucket, Delete={
+            "Objects": [{"Key": f"{key}/stdout"}, {"Key": f"{key}/stderr"}],
+            "Quiet": True,
+        })
+    else:
+        detail = ssm.get_command_invocation(CommandId=command_id, InstanceId=instance_id)
+        stdout = detail.get("StandardOutputContent", "")
+        stderr = detail.get("StandardErrorContent", "")
+
+    return InstanceResult(
+        instance_id=instance_id,
+        status=invocation["Status"],
+        response_code=plugin.get("ResponseCode", -1),
+        stdout=stdout,
+        stderr=stderr,
+        execution_seconds=(finished - started).total_seconds() if started and finished else 0.0,
+        wall_seconds=wall_seconds,
+    )
+
+
+def run(
+        ssm,
+        instance_ids: Sequence[str],
+        commands: List[str],
+        timeout: int = 600,
+        s3=None,
+        output_bucket: Optional[str] = None,
+        output_prefix: str = "ssm-output",
+        output_workers: int = OUTPUT_WORKERS
+) -> FleetResult:
+    """Run `commands` on all `instance_ids` concurrently and wait for every one of them.
+
+    Instances still running after `timeout` (plus time for delivery) are
+    cancelled and reported as TimedOut. Without `output_bucket`, output comes
+    from `get_command_invocation` and is truncated by SSM.
+    """
+    output_location = {"OutputS3BucketName": output_bucket, "OutputS3KeyPrefix": output_prefix} if output_bucket else {}
+    started = time.monotonic()
+    response = ssm.send_command(
+        InstanceIds=list(instance_ids),
+        DocumentName="AWS-RunShellScript",
+        Parameters={"commands": commands, "executionTimeout": [str(timeout)]},
+        # run everywhere at once, and don't stop the others when one fails
+        MaxConcurrency="100%",
+        MaxErrors="100%",
+        **output_location
+    )
+    command_id = response["Command"]["CommandId"]
+
+    pending = set(instance_ids)
+    futures: Dict[str, Future] = {}
+    deadline = started + timeout + DELIVERY_GRACE_SECONDS
+    delay = POLL_INITIAL_SECONDS
+    with ThreadPoolExecutor(max_workers=output_workers) as pool:
+        while pending and time.monotonic() < deadline:
+            time.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_SECONDS)
+            # invocations may not be listed yet right after send_command
+            for invocation in _invocations(ssm, command_id):
+                instance_id = invocation["InstanceId"]
+                if instance_id in pending and invocation["Status"] in TERMINAL_STATUSES:
+                    pending.discard(instance_id)
+                    futures[instance_id] = pool.submit(
+                        _result, ssm, s3, command_id, invocation, output_bucket, output_prefix,
+                        time.monotonic() - started
+                    )
+        results = {instance_id: future.result() for instance_id, future in futures.items()}
+
+    if pending:
+        ssm.cancel_command(CommandId=command_id, InstanceIds=sorted(pending))
+        for instance_id in pending:
+            results[instance_id] = InstanceResult(
+                instance_id, "TimedOut", -1, "", "", 0.0, time.monotonic() - started
+            )
+
+    return FleetResult(command_id, results, time.monotonic() - started)
@@ -3,6 +3,7 @@ Health and basic-connectivity tests for Zulip.
 Validates infrastructure and application health against a deployed pattern stack.
 """
 
+import os
 import socket
 import ssl
 import time
@@ -103,6 +104,10 @@ class TestZulipHealth:
             "HSTS header missing"
 
 
+@pytest.mark.skipif(
+    bool(os.environ.get("TEST_LOCAL_CONTAINER")),
+    reason="the local stand-in has no CloudFormation stack or EC2 instance",
+)
 class TestZulipInfrastructure:
     """AWS infrastructure-level checks against the deployed CloudFormation stack."""
 
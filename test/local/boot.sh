@@ -0,0 +1,18 @@
+#!/bin/bash
+# Render cdk/zulip/user_data.sh from the mounted working tree with local stack
+# values and run it. The bootstrap agent is refreshed from packer/ first, so
+# changes to either are picked up without rebaking the image.
+set -euo pipefail
+
+CODE=/code
+mkdir -p /opt/oe/patterns
+
+rm -rf /usr/local/lib/zulip-bootstrap/zulip_bootstrap
+cp -r $CODE/packer/zulip_bootstrap /usr/local/lib/zulip-bootstrap/zulip_bootstrap
+find /usr/local/lib/zulip-bootstrap -name __pycache__ -prune -exec rm -rf {} +
+
+cp $CODE/test/local/bootstrap-overrides.json /opt/oe/patterns/bootstrap-overrides.json
+python3 $CODE/test/local/render_user_data.py \
+  $CODE/cdk/zulip/user_data.sh $CODE/test/local/stack-values.json > /opt/oe/patterns/user-data.sh
+
+exec bash /opt/oe/patterns/user-data.sh
@@ -0,0 +1,41 @@
+#!/bin/bash
+# Container entrypoint: issue the TLS certificate, seed moto and MinIO, hand
+# the AWS endpoint settings to systemd's services, then boot systemd.
+set -euo pipefail
+
+CERTS=/certs
+HOSTNAME=$(python3 -c 'import json; print(json.load(open("/code/test/local/stack-values.json"))["Hostname"])')
+
+# a CA kept in test/local/certs, so clients trust the stand-in across rebuilds
+if [ ! -f $CERTS/ca.crt ]; then
+  openssl req -x509 -newkey rsa:2048 -nodes -days 825 -subj "/CN=Zulip local stand-in CA" \
+    -addext "basicConstraints=critical,CA:TRUE" -addext "keyUsage=critical,keyCertSign,cRLSign" \
+    -keyout $CERTS/ca.key -out $CERTS/ca.crt
+fi
+# Zulip's nginx serves these; the wildcard covers subdomain realms
+openssl req -newkey rsa:2048 -nodes -subj "/CN=$HOSTNAME" \
+  -keyout /etc/ssl/private/zulip.key -out /tmp/zulip.csr
+openssl x509 -req -in /tmp/zulip.csr -CA $CERTS/ca.crt -CAkey $CERTS/ca.key -CAcreateserial \
+  -CAserial /tmp/ca.srl -days 825 -out /tmp/zulip.crt -extfile <(printf '%s\n' \
+    "subjectAltName=DNS:$HOSTNAME,DNS:*.$HOSTNAME" \
+    "basicConstraints=CA:FALSE" \
+    "keyUsage=critical,digitalSignature,keyEncipherment" \
+    "extendedKeyUsage=serverAuth" \
+    "subjectKeyIdentifier=hash" \
+    "authorityKeyIdentifier=keyid,issuer")
+cat /tmp/zulip.crt $CERTS/ca.crt > /etc/ssl/certs/zulip.combined-chain.crt
+chmod 600 /etc/ssl/private/zulip.key
+rm -f /tmp/zulip.csr /tmp/zulip.crt
+
+python3 /code/test/local/seed.py
+
+# services start with a clean environment; boto3 reads the endpoints from it
+mkdir -p /etc/systemd/system.conf.d
+{
+  echo "[Manager]"
+  printf 'DefaultEnvironment='
+  env | grep '^AWS_' | sort | sed 's/.*/"&"/' | tr '\n' ' '
+  echo
+} > /etc/systemd/system.conf.d/oe-local.conf
+
+exec /lib/systemd/systemd
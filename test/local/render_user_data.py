@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Substitute stack values into `cdk/zulip/user_data.sh` the way CloudFormation's
+`Fn::Sub` does, so the stand-in boots from the same script as an ASG instance:
+
+    python3 render_user_data.py user_data.sh stack-values.json > /opt/oe/patterns/user-data.sh
+
+`${Name}` and `${Resource.Attribute}` are replaced from the values file,
+`${!Literal}` becomes `${Literal}`, and any name without a value is an error
+rather than an empty string.
+"""
+
+import json
+import re
+import sys
+
+REFERENCE = re.compile(r"\$\{([^}]*)\}")
+
+
+def render(template: str, values: dict) -> str:
+    missing = set()
+
+    def substitute(match: re.Match) -> str:
+        name = match.group(1)
+        if name.startswith("!"):
+            return "${" + name[1:] + "}"
+        if name not in values:
+            missing.add(name)
+            return match.group(0)
+        return str(values[name])
+
+    rendered = REFERENCE.sub(substitute, template)
+    if missing:
+        raise KeyError(f"No value for {', '.join(sorted(missing))}")
+    return rendered
+
+
+def main() -> int:
+    if len(sys.argv) != 3:
+        print(__doc__, file=sys.stderr)
+        return 2
+    with open(sys.argv[1]) as f:
+        template = f.read()
+    with open(sys.argv[2]) as f:
+        values = json.load(f)
+    try:
+        sys.stdout.write(render(template, values))
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Create what the stack would have created before the instance boots: the
+database, RabbitMQ and instance secrets in moto's Secrets Manager, and the
+uploads and avatars buckets in MinIO.
+
+Run by the `seed` service in docker-compose.yml; idempotent, so it can be rerun
+against services that are already seeded.
+"""
+
+import json
+import os
+import sys
+import time
+
+import boto3
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONNECT_ATTEMPTS = 30
+
+
+def _stack_values():
+    with open(os.path.join(HERE, "stack-values.json")) as f:
+        return json.load(f)
+
+
+def _retry(call, *args, **kwargs):
+    """moto and MinIO accept connections a few seconds after their containers start."""
+    for attempt in range(CONNECT_ATTEMPTS):
+        try:
+            return call(*args, **kwargs)
+        except EndpointConnectionError:
+            if attempt == CONNECT_ATTEMPTS - 1:
+                raise
+            time.sleep(1)
+
+
+def put_secret(secretsmanager, name, value, overwrite=True):
+    try:
+        _retry(secretsmanager.create_secret, Name=name, SecretString=json.dumps(value))
+        print(f"Created secret {name}")
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ResourceExistsException":
+            raise
+        if overwrite:
+            secretsmanager.put_secret_value(SecretId=name, SecretString=json.dumps(value))
+            print(f"Updated secret {name}")
+
+
+def create_bucket(s3, name):
+    try:
+        _retry(s3.create_bucket, Bucket=name)
+        print(f"Created bucket {name}")
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+            raise
+
+
+def main() -> int:
+    values = _stack_values()
+    region = values["AWS::Region"]
+    secretsmanager = boto3.client("secretsmanager", region_name=region)
+    s3 = boto3.client(
+        "s3",
+        region_name=region,
+        endpoint_url=os.environ["MINIO_ENDPOINT_URL"],
+        aws_access_key_id=os.environ["MINIO_ROOT_USER"],
+        aws_secret_access_key=os.environ["MINIO_ROOT_PASSWORD"],
+    )
+
+    put_secret(secretsmanager, values["DbSecretArn"], {
+        "username": os.environ["POSTGRES_USER"],
+        "password": os.environ["POSTGRES_PASSWORD"],
+    })
+    put_secret(secretsmanager, values["RabbitMQSecretArn"], {
+        "username": os.environ["RABBITMQ_DEFAULT_USER"],
+        "password": os.environ["RABBITMQ_DEFAULT_PASS"],
+    })
+    # the stack only puts the SES user's keys here; the instance generates and
+    # writes back the Zulip secrets, so an existing secret is left alone
+    put_secret(secretsmanager, values["InstanceSecretName"], {
+        "access_key_id": os.environ["MINIO_ROOT_USER"],
+        "secret_access_key": os.environ["MINIO_ROOT_PASSWORD"],
+        "smtp_password": "unused",
+    }, overwrite=False)
+
+    create_bucket(s3, values["AssetsBucketName"])
+    create_bucket(s3, values["AvatarsBucketName"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
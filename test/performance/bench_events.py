@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Measure how fast a sent message reaches other clients through Tornado.
+
+For each client count, registers that many event queues
+(`POST /api/v1/register`), keeps a long-poll open on every one of them
+(`GET /api/v1/events`), sends messages to a stream at a fixed rate and
+records when each queue receives each message:
+
+    python3 bench_events.py --url https://chat.example.com --email admin@example.com \\
+        --api-key ... --clients 10,50,200 --output events.json
+    python3 bench_events.py ... --baseline events.json
+
+Sends are scheduled open-loop: message i is due at start + i / rate and is
+handed to a pool of sender connections whether or not earlier sends have
+returned. Send and delivery latencies are measured from when the message was
+due, so a server that falls behind shows up as latency rather than as a
+lower offered rate. Works against any base URL, e.g. a development server on
+http://localhost:9991.
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import os
+import ssl
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+# Tornado answers a long-poll with a heartbeat after about a minute
+POLL_TIMEOUT_SECONDS = 120
+REGISTER_WORKERS = 32
+# a failing long-poll retries after 0.1s, 0.2s, ... up to 5s
+POLL_BACKOFF_INITIAL_SECONDS = 0.1
+POLL_BACKOFF_MAX_SECONDS = 5.0
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": _percentile(samples, 50),
+        "p90_ms": _percentile(samples, 90),
+        "p99_ms": _percentile(samples, 99),
+        "max_ms": max(samples) if samples else 0.0,
+    }
+
+
+class ZulipClient:
+    """Minimal REST client over one keep-alive connection; not thread-safe."""
+
+    def __init__(self, url: str, email: str, api_key: str, host: Optional[str] = None, verify: bool = True):
+        self.parts = urlsplit(url)
+        self.verify = verify
+        token = base64.b64encode(f"{email}:{api_key}".encode()).decode()
+        self.headers = {"Authorization": f"Basic {token}"}
+        if host:
+            self.headers["Host"] = host
+        self.connection = self._connect()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.parts.scheme == "https":
+            context = ssl.create_default_context()
+            if not self.verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            return http.client.HTTPSConnection(self.parts.netloc, timeout=POLL_TIMEOUT_SECONDS, context=context)
+        return http.client.HTTPConnection(self.parts.netloc, timeout=POLL_TIMEOUT_SECONDS)
+
+    def call(self, method: str, path: str, params: Optional[Dict[str, str]] = None) -> Dict:
+        body = None
+        headers = dict(self.headers)
+        query = urlencode(params or {})
+        if method in ("GET", "DELETE"):
+            path = f"{path}?{query}" if query else path
+        else:
+            body = query
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            self.connection.request(method, self.parts.path.rstrip("/") + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            # reconnect once; the server or a load balancer may have closed an idle connection
+            self.connection.close()
+            self.connection = self._connect()
+            self.connection.request(method, self.parts.path.rstrip("/") + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        try:
+            return json.loads(data)
+        except ValueError:
+            return {"result": "error", "msg": f"HTTP {response.status}"}
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class Poller(threading.Thread):
+    """One client: long-polls its event queue and timestamps every benchmark message it receives."""
+
+    def __init__(self, client: ZulipClient, queue_id: str, last_event_id: int, marker: str):
+        super().__init__(daemon=True)
+        self.client = client
+        self.queue_id = queue_id
+        self.last_event_id = last_event_id
+        self.marker = marker
+        self.received: Dict[int, float] = {}
+        self.errors = 0
+        self.stopping = threading.Event()
+
+    def run(self) -> None:
+        backoff = POLL_BACKOFF_INITIAL_SECONDS
+        while not self.stopping.is_set():
+            try:
+                response = self.client.call("GET", "/api/v1/events", {
+                    "queue_id": self.queue_id,
+                    "last_event_id": str(self.last_event_id),
+                })
+            except (OSError, http.client.HTTPException):
+                response = {"result": "error"}
+            now = time.perf_counter()
+            if response.get("result") != "success":
+                self.errors += 1
+                if response.get("code") == "BAD_EVENT_QUEUE_ID":
+                    return
+                self.stopping.wait(backoff)
+                backoff = min(backoff * 2, POLL_BACKOFF_MAX_SECONDS)
+                continue
+            backoff = POLL_BACKOFF_INITIAL_SECONDS
+            for event in response.get("events", []):
+                self.last_event_id = max(self.last_event_id, event["id"])
+                content = event.get("message", {}).get("content", "") if event["type"] == "message" else ""
+                if content.startswith(self.marker):
+                    self.received[int(content[len(self.marker):])] = now
+
+
+def _client(args: argparse.Namespace, credentials: Tuple[str, str]) -> ZulipClient:
+    return ZulipClient(args.url, credentials[0], credentials[1], args.host, not args.insecure)
+
+
+def _register(args: argparse.Namespace, credentials: Tuple[str, str]) -> Tuple[ZulipClient, Dict, float]:
+    client = _client(args, credentials)
+    started = time.perf_counter()
+    response = client.call("POST", "/api/v1/register", {
+        "event_types": json.dumps(["message"]),
+        "apply_markdown": "false",
+    })
+    return client, response, (time.perf_counter() - started) * 1000
+
+
+def _delete_queue(args: argparse.Namespace, credentials: Tuple[str, str], queue_id: str) -> None:
+    # a separate connection: the poller's own is blocked in a long-poll
+    client = _client(args, credentials)
+    try:
+        client.call("DELETE", "/api/v1/events", {"queue_id": queue_id})
+    except (OSError, http.client.HTTPException):
+        pass
+    finally:
+        client.close()
+
+
+class _Senders:
+    """Sends benchmark messages from a pool of threads, one keep-alive connection per thread."""
+
+    def __init__(self, args: argparse.Namespace, credentials: Tuple[str, str]):
+        self.args = args
+        self.credentials = credentials
+        self.local = threading.local()
+        self.clients: List[ZulipClient] = []
+        self.lock = threading.Lock()
+
+    def send(self, seq: int, content: str) -> Tuple[int, bool, float]:
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = _client(self.args, self.credentials)
+            with self.lock:
+                self.clients.append(client)
+        try:
+            response = client.call("POST", "/api/v1/messages", {
+                "type": "stream",
+                "to": self.args.stream,
+                "topic": self.args.topic,
+                "content": content,
+            })
+        except (OSError, http.client.HTTPException):
+            response = {"result": "error"}
+        return seq, response.get("result") == "success", time.perf_counter()
+
+    def close(self) -> None:
+        for client in self.clients:
+            client.close()
+
+
+def run_step(args: argparse.Namespace, clients: int, credentials: List[Tuple[str, str]]) -> Dict[str, object]:
+    marker = f"bench-events-{uuid.uuid4().hex[:8]}-"
+
+    owners = [credentials[n % len(credentials)] for n in range(clients)]
+    with ThreadPoolExecutor(max_workers=min(REGISTER_WORKERS, clients)) as pool:
+        registered = list(pool.map(lambda owner: _register(args, owner), owners))
+    register_ms = [elapsed for _, response, elapsed in registered if response.get("result") == "success"]
+    queues = [
+        (owner, client, response)
+        for owner, (client, response, _) in zip(owners, registered)
+        if response.get("result") == "success"
+    ]
+    pollers = [
+        Poller(client, response["queue_id"], response["last_event_id"], marker)
+        for _, client, response in queues
+    ]
+    for poller in pollers:
+        poller.start()
+
+    senders = _Senders(args, credentials[0])
+    start = time.perf_counter()
+    # message seq is due at start + seq / rate; latencies are measured from then
+    due = {seq: start + seq / args.rate for seq in range(args.messages)}
+    with ThreadPoolExecutor(max_workers=args.send_workers) as pool:
+        futures = []
+        for seq in range(args.messages):
+            # open loop: keep the schedule even when sends are slow
+            delay = due[seq] - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(senders.send, seq, f"{marker}{seq}"))
+        send_results = [future.result() for future in futures]
+    senders.close()
+    send_ms = [(finished - due[seq]) * 1000 for seq, ok, finished in send_results]
+    sent = {seq: due[seq] for seq, ok, _ in send_results if ok}
+    send_errors = args.messages - len(sent)
+
+    expected = len(sent) * len(pollers)
+    deadline = time.perf_counter() + args.drain_seconds
+    while time.perf_counter() < deadline and sum(len(p.received) for p in pollers) < expected:
+        time.sleep(0.1)
+
+    delivery_ms = [
+        (received_at - sent[seq]) * 1000
+        for poller in pollers
+        for seq, received_at in poller.received.items()
+        if seq in sent
+    ]
+    delivered = len(delivery_ms)
+    for poller in pollers:
+        poller.stopping.set()
+    with ThreadPoolExecutor(max_workers=min(REGISTER_WORKERS, clients)) as pool:
+        list(pool.map(lambda queue: _delete_queue(args, queue[0], queue[2]["queue_id"]), queues))
+
+    return {
+        "clients": clients,
+        "queues_registered": len(pollers),
+        "register": _summary(register_ms),
+        "messages_sent": len(sent),
+        "send_errors": send_errors,
+        "send": _summary(send_ms),
+        "deliveries_expected": expected,
+        "deliveries_missing": expected - delivered,
+        "delivery": _summary(delivery_ms),
+        "poll_errors": sum(poller.errors for poller in pollers),
+    }
+
+
+def _print(steps: List[Dict], baseline: Optional[Dict]) -> None:
+    previous = {step["clients"]: step for step in (baseline or {}).get("steps", [])}
+    print(
+        f"{'clients':>8} {'register p50':>13} {'register p99':>13} {'delivery p50':>13} "
+        f"{'delivery p99':>13} {'missing':>8}  {'p99 vs baseline':>16}"
+    )
+    for step in steps:
+        delta = ""
+        base = previous.get(step["clients"])
+        if base and base["delivery"]["p99_ms"]:
+            delta = f"{step['delivery']['p99_ms'] / base['delivery']['p99_ms'] - 1:+.1%}"
+        print(
+            f"{step['clients']:>8} {step['register']['p50_ms']:>13.1f} {step['register']['p99_ms']:>13.1f} "
+            f"{step['delivery']['p50_ms']:>13.1f} {step['delivery']['p99_ms']:>13.1f} "
+            f"{step['deliveries_missing']:>8}  {delta:>16}"
+        )
+
+
+def _credentials(args: argparse.Namespace) -> List[Tuple[str, str]]:
+    if args.credentials:
+        with open(args.credentials) as f:
+            return [(user["email"], user["api_key"]) for user in json.load(f)]
+    if not (args.email and args.api_key):
+        raise SystemExit("--email and --api-key (or ZULIP_EMAIL and ZULIP_API_KEY, or --credentials) are required")
+    return [(args.email, args.api_key)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="base URL of the Zulip server, e.g. https://chat.example.com")
+    parser.add_argument("--host", help="Host header to send, when --url is an instance or load balancer address")
+    parser.add_argument("--insecure", action="store_true", help="don't verify the TLS certificate")
+    parser.add_argument("--email", default=os.environ.get("ZULIP_EMAIL"))
+    parser.add_argument("--api-key", default=os.environ.get("ZULIP_API_KEY"))
+    parser.add_argument("--credentials", help='JSON list of {"email", "api_key"}; queues are spread across these users')
+    parser.add_argument("--stream", default="general", help="stream the users are subscribed to")
+    parser.add_argument("--topic", default="bench-events")
+    parser.add_argument("--clients", default="10,50,100", help="comma-separated client counts, one step each")
+    parser.add_argument("--messages", type=int, default=50, help="messages sent per step")
+    parser.add_argument("--rate", type=float, default=5, help="messages sent per second")
+    parser.add_argument("--send-workers", type=int, default=16, help="concurrent sender connections")
+    parser.add_argument("--drain-seconds", type=float, default=15, help="how long to wait for late deliveries")
+    parser.add_argument("--baseline", help="JSON written by an earlier run, to compare against")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    credentials = _credentials(args)
+    steps = [run_step(args, int(clients), credentials) for clients in args.clients.split(",")]
+    report = {
+        "url": args.url,
+        "messages": args.messages,
+        "rate": args.rate,
+        "steps": steps,
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    _print(steps, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if not any(step["deliveries_missing"] or step["send_errors"] for step in steps) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Measure static asset and API throughput through nginx on one instance.
+
+Run it on (or next to) a Zulip instance before and after changing the
+`NginxProfile` stack parameter:
+
+    python3 bench_nginx.py --url https://10.0.1.23 --host chat.example.com --output conservative.json
+    python3 bench_nginx.py --url https://10.0.1.23 --host chat.example.com --baseline conservative.json
+
+Each worker thread keeps one connection open, like a browser would, and
+requests the target path in a loop. Results are printed as a table and
+optionally written as JSON.
+"""
+
+import argparse
+import http.client
+import json
+import ssl
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+TARGETS = {
+    "static": "/static/webpack-bundles/manifest.json",
+    "api": "/api/v1/server_settings",
+}
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _connect(url: str) -> http.client.HTTPConnection:
+    parts = urlsplit(url)
+    if parts.scheme == "https":
+        # instances serve a certificate for the hostname, not their private IP
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        return http.client.HTTPSConnection(parts.netloc, timeout=30, context=context)
+    return http.client.HTTPConnection(parts.netloc, timeout=30)
+
+
+def bench(url: str, host: str, path: str, concurrency: int, duration: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    headers = {"Host": host, "Accept-Encoding": "br, gzip"}
+
+    def worker() -> None:
+        connection = _connect(url)
+        local: List[float] = []
+        failed = 0
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = _connect(url)
+                continue
+            local.append((time.monotonic() - started) * 1000)
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "requests_per_second": len(latencies) / duration,
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+        "errors": errors[0],
+    }
+
+
+def _print(report, baseline: Optional[Dict[str, Dict[str, float]]]) -> None:
+    print(f"{'target':<10} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}  {'req/s vs baseline':>18}")
+    for target, result in report.items():
+        delta = ""
+        if baseline and target in baseline and baseline[target]["requests_per_second"]:
+            change = result["requests_per_second"] / baseline[target]["requests_per_second"] - 1
+            delta = f"{change:+.1%}"
+        print(
+            f"{target:<10} {result['requests_per_second']:>10.1f} {result['p50_ms']:>10.2f} "
+            f"{result['p99_ms']:>10.2f} {result['errors']:>8}  {delta:>18}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="base URL of the instance, e.g. https://10.0.1.23")
+    parser.add_argument("--host", required=True, help="Host header to send (the Zulip hostname)")
+    parser.add_argument("--static-path", default=TARGETS["static"])
+    parser.add_argument("--api-path", default=TARGETS["api"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30, help="seconds per target")
+    parser.add_argument("--baseline", help="JSON written by an earlier run, to compare against")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    report = {
+        "static": bench(args.url, args.host, args.static_path, args.concurrency, args.duration),
+        "api": bench(args.url, args.host, args.api_path, args.concurrency, args.duration),
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    _print(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if not any(result["errors"] for result in report.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Compare boot time-to-ready between two AMIs.
+
+Every instance publishes `TimeToReady` and per-phase `PhaseDuration` embedded
+metrics at the end of its boot (namespace `OE/Patterns/Zulip`, rolled up by
+`ImageId`). Launch a few instances from each AMI (e.g. by bumping
+`AsgReprovisionString` or terminating instances), then compare:
+
+    python3 compare_time_to_ready.py --baseline ami-0aaa --candidate ami-0bbb
+
+Results are printed as a table and optionally written as JSON.
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import boto3
+
+NAMESPACE = "OE/Patterns/Zulip"
+STATISTICS = ["SampleCount", "Minimum", "Average", "Maximum"]
+PERCENTILES = ["p50", "p90"]
+
+
+def _window(days: int, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """
+    A window on whole hours. CloudWatch aligns periods of an hour or more to
+    the hour, so a period the length of an aligned window returns exactly one
+    datapoint: percentiles cannot be merged across datapoints.
+    """
+    now = now or datetime.now(timezone.utc)
+    end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return end - timedelta(days=days), end
+
+
+def _stats(cloudwatch, metric: str, dimensions: List[Dict[str, str]], start: datetime, end: datetime) -> Optional[Dict[str, float]]:
+    response = cloudwatch.get_metric_statistics(
+        Namespace=NAMESPACE,
+        MetricName=metric,
+        Dimensions=dimensions,
+        StartTime=start,
+        EndTime=end,
+        Period=int((end - start).total_seconds()),
+        Statistics=STATISTICS,
+        ExtendedStatistics=PERCENTILES,
+        Unit="Milliseconds",
+    )
+    points = response["Datapoints"]
+    if not points:
+        return None
+    if len(points) > 1:
+        raise RuntimeError(f"Expected one datapoint for {metric} between {start} and {end}, got {len(points)}")
+    point = points[0]
+    return {
+        "samples": int(point["SampleCount"]),
+        "min_s": point["Minimum"] / 1000,
+        "avg_s": point["Average"] / 1000,
+        "max_s": point["Maximum"] / 1000,
+        "p50_s": point["ExtendedStatistics"]["p50"] / 1000,
+        "p90_s": point["ExtendedStatistics"]["p90"] / 1000,
+    }
+
+
+def _phases(cloudwatch, ami: str) -> List[str]:
+    paginator = cloudwatch.get_paginator("list_metrics")
+    names = set()
+    for page in paginator.paginate(
+        Namespace=NAMESPACE,
+        MetricName="PhaseDuration",
+        Dimensions=[{"Name": "ImageId", "Value": ami}],
+    ):
+        for metric in page["Metrics"]:
+            dimensions = {d["Name"]: d["Value"] for d in metric["Dimensions"]}
+            if set(dimensions) == {"ImageId", "Phase"}:
+                names.add(dimensions["Phase"])
+    return sorted(names)
+
+
+def compare(cloudwatch, baseline: str, candidate: str, days: int) -> Dict[str, Dict[str, Optional[Dict[str, float]]]]:
+    start, end = _window(days)
+    report: Dict[str, Dict[str, Optional[Dict[str, float]]]] = {}
+    for label, ami in (("baseline", baseline), ("candidate", candidate)):
+        rows: Dict[str, Optional[Dict[str, float]]] = {
+            "TimeToReady": _stats(cloudwatch, "TimeToReady", [{"Name": "ImageId", "Value": ami}], start, end),
+        }
+        for phase in _phases(cloudwatch, ami):
+            rows[f"phase:{phase}"] = _stats(
+                cloudwatch,
+                "PhaseDuration",
+                [{"Name": "ImageId", "Value": ami}, {"Name": "Phase", "Value": phase}],
+                start,
+                end,
+            )
+        report[label] = rows
+    return report
+
+
+def _print(report, baseline: str, candidate: str) -> None:
+    rows = sorted(set(report["baseline"]) | set(report["candidate"]), key=lambda r: (r != "TimeToReady", r))
+    print(f"{'metric':32} {'baseline ' + baseline:>28} {'candidate ' + candidate:>28} {'delta':>9}")
+    for row in rows:
+        before = report["baseline"].get(row)
+        after = report["candidate"].get(row)
+        cells = []
+        for stats in (before, after):
+            cells.append(f"p50 {stats['p50_s']:7.1f}s  n={stats['samples']:<3}" if stats else "no data")
+        delta = f"{after['p50_s'] - before['p50_s']:+8.1f}s" if before and after else ""
+        print(f"{row:32} {cells[0]:>28} {cells[1]:>28} {delta:>9}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", required=True, help="AMI id of the cold (previous) image")
+    parser.add_argument("--candidate", required=True, help="AMI id of the pre-warmed image")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--output", help="Write the comparison as JSON to this path")
+    args = parser.parse_args()
+
+    cloudwatch = boto3.client("cloudwatch", region_name=args.region)
+    report = compare(cloudwatch, args.baseline, args.candidate, args.days)
+    _print(report, args.baseline, args.candidate)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"baseline": args.baseline, "candidate": args.candidate, **report}, f, indent=2)
+    if not report["baseline"]["TimeToReady"] or not report["candidate"]["TimeToReady"]:
+        print("\nNo TimeToReady samples for one of the AMIs yet; launch instances from it first.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
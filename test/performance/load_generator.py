@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for the Zulip REST API.
+
+Drives a weighted mix of stream message sends, narrow fetches, presence
+updates and file uploads from a pool of users over pooled keep-alive
+connections, and reports throughput, error rate and a latency histogram per
+endpoint:
+
+    python3 load_generator.py --url https://chat.example.com --stack-name oe-patterns-zulip-$USER \\
+        --users 50 --save-credentials users.json --stages 20:60,100:120,100:300 --output load.json
+    python3 load_generator.py --url https://chat.example.com --credentials users.json \\
+        --stages 20:60,100:120,100:300 --baseline load.json
+
+Requests arrive as a Poisson process at the rate given by --stages, whether
+or not earlier requests have finished, and latency is measured from when a
+request was due rather than when it was sent, so a server that falls behind
+shows up in the tail instead of silently lowering the offered load
+(coordinated omission).
+"""
+
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import os
+import random
+import secrets
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+INTEGRATION_DIR = Path(__file__).resolve().parent.parent / "integration"
+
+OPERATIONS = ["send", "narrow", "presence", "upload"]
+DEFAULT_MIX = "send=50,narrow=30,presence=15,upload=5"
+# histogram bucket upper bounds; the last bucket is everything slower
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+@dataclass
+class User:
+    email: str
+    api_key: str
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        token = base64.b64encode(f"{self.email}:{self.api_key}".encode()).decode()
+        return {"Authorization": f"Basic {token}"}
+
+
+@dataclass
+class Stats:
+    latencies_ms: List[float] = field(default_factory=list)
+    service_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    rate_limited: int = 0
+    dropped: int = 0
+
+    @property
+    def attempted(self) -> int:
+        return len(self.latencies_ms) + self.errors + self.rate_limited + self.dropped
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _histogram(samples: List[float]) -> Dict[str, int]:
+    counts = {f"le_{bound}ms": 0 for bound in BUCKETS_MS}
+    counts["over"] = 0
+    for sample in samples:
+        bound = next((bound for bound in BUCKETS_MS if sample <= bound), None)
+        counts[f"le_{bound}ms" if bound else "over"] += 1
+    return counts
+
+
+def _summary(stats: Stats, seconds: float) -> Dict[str, object]:
+    failed = stats.errors + stats.rate_limited + stats.dropped
+    return {
+        "ok": len(stats.latencies_ms),
+        "errors": stats.errors,
+        "rate_limited": stats.rate_limited,
+        "dropped": stats.dropped,
+        "throughput_rps": len(stats.latencies_ms) / seconds if seconds else 0.0,
+        "error_rate": failed / stats.attempted if stats.attempted else 0.0,
+        "p50_ms": _percentile(stats.latencies_ms, 50),
+        "p90_ms": _percentile(stats.latencies_ms, 90),
+        "p99_ms": _percentile(stats.latencies_ms, 99),
+        "p999_ms": _percentile(stats.latencies_ms, 99.9),
+        "max_ms": max(stats.latencies_ms) if stats.latencies_ms else 0.0,
+        "service_p99_ms": _percentile(stats.service_ms, 99),
+        "histogram": _histogram(stats.latencies_ms),
+    }
+
+
+def parse_stages(value: str) -> List[Tuple[float, float]]:
+    """'20:60,100:120' -> [(20.0, 60.0), (100.0, 120.0)]: (target req/s, seconds) pairs."""
+    stages = []
+    for stage in value.split(","):
+        rate, seconds = stage.split(":")
+        stages.append((float(rate), float(seconds)))
+    return stages
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"unknown operation {name!r} in --mix; expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def rate_at(stages: List[Tuple[float, float]], elapsed: float) -> Tuple[int, float]:
+    """Stage index and arrival rate at `elapsed` seconds; each stage ramps linearly from the previous rate."""
+    previous = 0.0
+    for index, (target, seconds) in enumerate(stages):
+        if elapsed < seconds:
+            return index, previous + (target - previous) * elapsed / seconds
+        elapsed -= seconds
+        previous = target
+    return len(stages) - 1, previous
+
+
+class Operations:
+    """The request for each entry in the mix; each returns (HTTP status, Zulip result)."""
+
+    def __init__(self, session: aiohttp.ClientSession, args: argparse.Namespace):
+        self.session = session
+        self.url = args.url
+        self.stream = args.stream
+        self.upload_body = os.urandom(args.upload_bytes)
+        self.counter = itertools.count()
+
+    async def call(self, method: str, path: str, user: User, **kwargs) -> Tuple[int, str]:
+        async with self.session.request(method, f"{self.url}{path}", headers=user.headers, **kwargs) as response:
+            try:
+                body = await response.json(content_type=None)
+            except ValueError:
+                body = {}
+            return response.status, (body or {}).get("result", "")
+
+    async def send(self, user: User) -> Tuple[int, str]:
+        seq = next(self.counter)
+        return await self.call("POST", "/api/v1/messages", user, data={
+            "type": "stream",
+            "to": self.stream,
+            # spread over topics so narrow fetches don't all hit one
+            "topic": f"load-{seq % 20}",
+            "content": f"load test message {seq}",
+        })
+
+    async def narrow(self, user: User) -> Tuple[int, str]:
+        return await self.call("GET", "/api/v1/messages", user, params={
+            "anchor": "newest",
+            "num_before": "50",
+            "num_after": "0",
+            "narrow": json.dumps([{"operator": "stream", "operand": self.stream}]),
+        })
+
+    async def presence(self, user: User) -> Tuple[int, str]:
+        return await self.call("POST", "/api/v1/users/me/presence", user, data={"status": "active"})
+
+    async def upload(self, user: User) -> Tuple[int, str]:
+        form = aiohttp.FormData()
+        form.add_field("file", self.upload_body, filename="load-test.bin", content_type="application/octet-stream")
+        return await self.call("POST", "/api/v1/user_uploads", user, data=form)
+
+
+async def _issue(operations: Operations, name: str, user: User, due: float, stats: List[Stats]) -> None:
+    loop = asyncio.get_running_loop()
+    sent = loop.time()
+    try:
+        status, result = await getattr(operations, name)(user)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        status, result = 0, ""
+    done = loop.time()
+    for s in stats:
+        if status == 429:
+            s.rate_limited += 1
+        elif status != 200 or result != "success":
+            s.errors += 1
+        else:
+            s.latencies_ms.append((done - due) * 1000)
+            s.service_ms.append((done - sent) * 1000)
+
+
+async def _subscribe(operations: Operations, users: List[User]) -> None:
+    subscriptions = json.dumps([{"name": operations.stream}])
+    await asyncio.gather(*[
+        operations.call("POST", "/api/v1/users/me/subscriptions", user, data={"subscriptions": subscriptions})
+        for user in users
+    ])
+
+
+async def run(args: argparse.Namespace, users: List[User]) -> Dict[str, object]:
+    stages = parse_stages(args.stages)
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    total_seconds = sum(seconds for _, seconds in stages)
+    peak_rate = max(rate for rate, _ in stages)
+
+    by_endpoint = {name: Stats() for name in names}
+    by_stage = [Stats() for _ in stages]
+    connector = aiohttp.TCPConnector(limit=args.connections, ssl=False if args.insecure else None)
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    headers = {"Host": args.host} if args.host else None
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        operations = Operations(session, args)
+        await _subscribe(operations, users)
+
+        loop = asyncio.get_running_loop()
+        user_cycle = itertools.cycle(users)
+        in_flight = set()
+        start = due = loop.time()
+        while True:
+            # a Poisson process at the (ramping) stage rate, by thinning one at the peak rate
+            due += random.expovariate(peak_rate)
+            if due - start >= total_seconds:
+                break
+            stage, rate = rate_at(stages, due - start)
+            if random.random() * peak_rate > rate:
+                continue
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = random.choices(names, weights)[0]
+            if len(in_flight) >= args.max_in_flight:
+                # don't wait for a slot: that would lower the offered load
+                by_endpoint[name].dropped += 1
+                by_stage[stage].dropped += 1
+                continue
+            task = asyncio.create_task(
+                _issue(operations, name, next(user_cycle), due, [by_endpoint[name], by_stage[stage]])
+            )
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    return {
+        "url": args.url,
+        "users": len(users),
+        "mix": mix,
+        "stages": [
+            {"target_rps": rate, "seconds": seconds, **_summary(stats, seconds)}
+            for (rate, seconds), stats in zip(stages, by_stage)
+        ],
+        "endpoints": {name: _summary(stats, total_seconds) for name, stats in by_endpoint.items()},
+    }
+
+
+def provision(args: argparse.Namespace) -> List[User]:
+    """Recreate the root realm on the stack's instance (or the local stand-in) and create --users users in it."""
+    import boto3
+    sys.path.insert(0, str(INTEGRATION_DIR))
+    from realm_helpers import ADMIN_EMAIL, LOCAL_INSTANCE_PREFIX, bootstrap_realm, create_users, fetch_api_key
+
+    ssm = boto3.client("ssm", region_name=args.region)
+    if args.local_container:
+        instance_id = f"{LOCAL_INSTANCE_PREFIX}{args.local_container}"
+    else:
+        ec2 = boto3.client("ec2", region_name=args.region)
+        reservations = ec2.describe_instances(Filters=[
+            {"Name": "tag:aws:cloudformation:stack-name", "Values": [args.stack_name]},
+            {"Name": "instance-state-name", "Values": ["running"]},
+        ])["Reservations"]
+        if not reservations:
+            raise SystemExit(f"No running instances found for stack {args.stack_name}")
+        instance_id = reservations[0]["Instances"][0]["InstanceId"]
+
+    print(f"Recreating the realm on {instance_id} and creating {args.users} users", file=sys.stderr)
+    admin = bootstrap_realm(ssm, instance_id, args.url)
+    password = secrets.token_hex(12)
+    emails = [f"load{n}@example.com" for n in range(1, args.users)]
+    if emails:
+        create_users(ssm, instance_id, emails, password)
+    users = [User(ADMIN_EMAIL, fetch_api_key(args.url, ADMIN_EMAIL, admin["password"]))]
+    users += [User(email, fetch_api_key(args.url, email, password)) for email in emails]
+
+    if args.save_credentials:
+        with open(args.save_credentials, "w") as f:
+            json.dump([{"email": user.email, "api_key": user.api_key} for user in users], f, indent=2)
+    return users
+
+
+def _print(report: Dict, baseline: Optional[Dict]) -> None:
+    previous = (baseline or {}).get("endpoints", {})
+    print(
+        f"{'endpoint':<10} {'ok':>8} {'rps':>8} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} "
+        f"{'p99.9 ms':>9}  {'rps vs base':>11} {'p99 vs base':>11}"
+    )
+    for name, summary in report["endpoints"].items():
+        base = previous.get(name)
+        rps_delta = p99_delta = ""
+        if base and base["throughput_rps"]:
+            rps_delta = f"{summary['throughput_rps'] / base['throughput_rps'] - 1:+.1%}"
+        if base and base["p99_ms"]:
+            p99_delta = f"{summary['p99_ms'] / base['p99_ms'] - 1:+.1%}"
+        print(
+            f"{name:<10} {summary['ok']:>8} {summary['throughput_rps']:>8.1f} {summary['error_rate']:>7.1%} "
+            f"{summary['p50_ms']:>9.1f} {summary['p99_ms']:>9.1f} {summary['p999_ms']:>9.1f}  "
+            f"{rps_delta:>11} {p99_delta:>11}"
+        )
+    print()
+    print(f"{'stage':<10} {'target':>8} {'rps':>8} {'errors':>7} {'p99 ms':>9}")
+    for index, stage in enumerate(report["stages"], 1):
+        print(
+            f"{index:<10} {stage['target_rps']:>8.1f} {stage['throughput_rps']:>8.1f} "
+            f"{stage['error_rate']:>7.1%} {stage['p99_ms']:>9.1f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="base URL of the Zulip server, e.g. https://chat.example.com")
+    parser.add_argument("--host", help="Host header to send, when --url is an instance or load balancer address")
+    parser.add_argument("--insecure", action="store_true", help="don't verify the TLS certificate")
+    parser.add_argument("--credentials", help='JSON list of {"email", "api_key"} to use instead of provisioning')
+    parser.add_argument("--stack-name", help="provision users on this stack's instance over SSM (recreates the realm)")
+    parser.add_argument("--local-container", help="provision users in this local stand-in container instead")
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"))
+    parser.add_argument("--users", type=int, default=20, help="users to provision, including the admin")
+    parser.add_argument("--save-credentials", help="write the provisioned users' API keys here for reuse")
+    parser.add_argument("--stream", default="load-test", help="stream to send to and narrow on; users are subscribed")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="relative weights of send, narrow, presence and upload")
+    parser.add_argument("--stages", default="10:30,50:60,50:120", help="comma-separated target_rps:seconds stages")
+    parser.add_argument("--upload-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--connections", type=int, default=100, help="connection pool size")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="requests beyond this are counted as dropped")
+    parser.add_argument("--request-timeout", type=float, default=30)
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="exit non-zero if an endpoint exceeds this")
+    parser.add_argument("--baseline", help="JSON written by an earlier run, to compare against")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    if args.credentials:
+        with open(args.credentials) as f:
+            users = [User(user["email"], user["api_key"]) for user in json.load(f)]
+    elif args.stack_name or args.local_container:
+        users = provision(args)
+    else:
+        raise SystemExit("--credentials, --stack-name or --local-container is required")
+
+    started = time.time()
+    report = asyncio.run(run(args, users))
+    report["started"] = started
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    _print(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if all(s["error_rate"] <= args.max_error_rate for s in report["endpoints"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,34 @@
+"""
+Pytest configuration for the CloudFormation template tests.
+
+These synthesize `ZulipStack` in-process with the CDK the devenv image
+already has installed, and assert on the rendered template; nothing is
+deployed.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+CDK_DIR = REPO_ROOT / "cdk"
+sys.path.insert(0, str(CDK_DIR))
+
+
+@pytest.fixture(scope="session")
+def template():
+    from aws_cdk import App
+    from aws_cdk.assertions import Template
+
+    from zulip.zulip_stack import ZulipStack
+
+    # the stack reads zulip/user_data.sh relative to cdk/
+    cwd = os.getcwd()
+    os.chdir(CDK_DIR)
+    try:
+        stack = ZulipStack(App(), "oe-patterns-zulip-template-test")
+        return Template.from_stack(stack)
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,71 @@
+"""
+Optional CloudFront distribution in front of the ALB and the avatars bucket.
+"""
+
+from aws_cdk.assertions import Match
+
+
+def _behaviors(template):
+    distribution = template.find_resources("AWS::CloudFront::Distribution")["CdnDistribution"]
+    config = distribution["Properties"]["DistributionConfig"]
+    return config, {b["PathPattern"]: b for b in config["CacheBehaviors"]}
+
+
+def test_resources_are_conditional(template):
+    for logical_id in ("CdnDistribution", "CdnOriginAccessControl", "CdnStaticCachePolicy", "CdnStripAvatarsPrefixFunction"):
+        resource = template.to_json()["Resources"][logical_id]
+        assert resource["Condition"] == "CdnEnabledCondition"
+
+
+def test_cache_behaviors(template):
+    config, behaviors = _behaviors(template)
+
+    assert behaviors["/static/*"]["CachePolicyId"] == {"Ref": "CdnStaticCachePolicy"}
+    assert behaviors["/static/*"]["TargetOriginId"] == "alb"
+    assert behaviors["/user_avatars/*"]["TargetOriginId"] == "avatars"
+    assert behaviors["/user_avatars/*"]["FunctionAssociations"][0]["EventType"] == "viewer-request"
+    for path in ("/api/*", "/json/*"):
+        assert "DELETE" in behaviors[path]["AllowedMethods"]
+        assert behaviors[path]["TargetOriginId"] == "alb"
+    assert config["DefaultCacheBehavior"]["TargetOriginId"] == "alb"
+
+
+def test_static_ttls_and_host_forwarding(template):
+    template.has_resource_properties("AWS::CloudFront::CachePolicy", {
+        "CachePolicyConfig": Match.object_like({
+            "MaxTTL": 31536000,
+            "ParametersInCacheKeyAndForwardedToOrigin": Match.object_like({
+                "HeadersConfig": {"HeaderBehavior": "whitelist", "Headers": ["Host"]},
+            }),
+        }),
+    })
+
+
+def test_avatars_origin_uses_origin_access_control(template):
+    config, _ = _behaviors(template)
+    avatars = next(o for o in config["Origins"] if o["Id"] == "avatars")
+    assert avatars["OriginAccessControlId"] == {"Fn::GetAtt": ["CdnOriginAccessControl", "Id"]}
+    assert avatars["S3OriginConfig"] == {"OriginAccessIdentity": ""}
+
+
+def test_avatars_bucket_policy_switches_to_cloudfront(template):
+    policy = template.find_resources("AWS::S3::BucketPolicy")["AvatarsBucketPolicy"]
+    document = policy["Properties"]["PolicyDocument"]["Fn::If"]
+    assert document[0] == "CdnEnabledCondition"
+    assert document[1]["Statement"][0]["Principal"] == {"Service": "cloudfront.amazonaws.com"}
+    assert document[2]["Statement"][0]["Principal"] == {"AWS": "*"}
+
+
+def test_record_sets_point_at_distribution_when_enabled(template):
+    for logical_id in ("RecordSetGroup", "SubdomainRecordSetGroup"):
+        group = template.find_resources("AWS::Route53::RecordSetGroup")[logical_id]
+        alias = group["Properties"]["RecordSets"][0]["AliasTarget"]
+        assert alias["DNSName"]["Fn::If"][0] == "CdnEnabledCondition"
+        assert alias["DNSName"]["Fn::If"][1] == {"Fn::GetAtt": ["CdnDistribution", "DomainName"]}
+        assert alias["HostedZoneId"]["Fn::If"][1] == "Z2FDTNDATAQYW2"
+
+
+def test_enabling_requires_a_certificate(template):
+    rule = template.to_json()["Rules"]["CdnCertificateRule"]
+    assert rule["RuleCondition"] == {"Fn::Equals": [{"Ref": "CdnEnable"}, "true"]}
+    assert rule["Assertions"][0]["Assert"] == {"Fn::Not": [{"Fn::Equals": [{"Ref": "CdnCertificateArn"}, ""]}]}
@@ -0,0 +1,87 @@
+"""
+Zulip-tuned Aurora parameter groups selected by DbSizeProfile.
+"""
+
+import pytest
+
+from zulip.db_parameter_groups import SIZE_PROFILES
+
+
+def _find_in_map(key):
+    return {"Fn::FindInMap": ["DbSizeProfileMap", {"Ref": "DbSizeProfile"}, key]}
+
+
+def test_size_profile_parameter(template):
+    template.has_parameter("DbSizeProfile", {
+        "AllowedValues": ["small", "medium", "large"],
+        "Default": "small",
+    })
+
+
+@pytest.mark.parametrize("profile", ["small", "medium", "large"])
+def test_profile_values(template, profile):
+    mapping = template.to_json()["Mappings"]["DbSizeProfileMap"][profile]
+    assert mapping == SIZE_PROFILES[profile]
+
+
+def test_profiles_grow_with_size():
+    for key in ("WorkMem", "MaintenanceWorkMem", "AutovacuumVacuumCostLimit", "AutovacuumMaxWorkers"):
+        small, medium, large = (int(SIZE_PROFILES[p][key]) for p in ("small", "medium", "large"))
+        assert small <= medium <= large, key
+
+
+def test_cluster_parameter_group(template):
+    template.has_resource_properties("AWS::RDS::DBClusterParameterGroup", {
+        "Parameters": {
+            "shared_preload_libraries": "pg_stat_statements",
+            "pg_stat_statements.track": "top",
+            "random_page_cost": "1.1",
+            "autovacuum_naptime": _find_in_map("AutovacuumNaptime"),
+            "autovacuum_vacuum_cost_limit": _find_in_map("AutovacuumVacuumCostLimit"),
+            "autovacuum_max_workers": _find_in_map("AutovacuumMaxWorkers"),
+            "autovacuum_vacuum_scale_factor": "0.05",
+            "autovacuum_analyze_scale_factor": "0.02",
+        },
+    })
+
+
+def test_instance_parameter_group(template):
+    template.has_resource_properties("AWS::RDS::DBParameterGroup", {
+        "Parameters": {
+            "work_mem": _find_in_map("WorkMem"),
+            "maintenance_work_mem": _find_in_map("MaintenanceWorkMem"),
+            "random_page_cost": "1.1",
+            "log_min_duration_statement": _find_in_map("LogMinDurationStatement"),
+        },
+    })
+
+
+def test_parameter_groups_are_attached(template):
+    template.has_resource_properties("AWS::RDS::DBCluster", {
+        "DBClusterParameterGroupName": {"Ref": "DbParameterGroupCluster"},
+    })
+    template.has_resource_properties("AWS::RDS::DBInstance", {
+        "DBParameterGroupName": {"Ref": "DbParameterGroupInstance"},
+    })
+
+
+def _engine_versions(template_json, engine_version):
+    """Every engine version the cluster can be deployed with."""
+    if isinstance(engine_version, str):
+        return [engine_version]
+    if set(engine_version) == {"Ref"}:
+        parameter = template_json["Parameters"][engine_version["Ref"]]
+        return parameter.get("AllowedValues", [parameter["Default"]])
+    pytest.fail(f"Cannot resolve cluster EngineVersion {engine_version}")
+
+
+def test_family_matches_cluster_engine_version(template):
+    # parameter_group_family falls back to DEFAULT_FAMILY when the common
+    # AuroraPostgresql construct passes the engine version as a token
+    template_json = template.to_json()
+    cluster = next(iter(template.find_resources("AWS::RDS::DBCluster").values()))
+    versions = _engine_versions(template_json, cluster["Properties"]["EngineVersion"])
+    families = {f"aurora-postgresql{version.split('.')[0]}" for version in versions}
+    for resource_type in ("AWS::RDS::DBClusterParameterGroup", "AWS::RDS::DBParameterGroup"):
+        for group in template.find_resources(resource_type).values():
+            assert {group["Properties"]["Family"]} == families
@@ -0,0 +1,100 @@
+"""
+Clustered vs single-node deployment of RabbitMQ and Redis.
+"""
+
+import re
+
+CLUSTERED = "DeploymentModeClusteredCondition"
+SUB_REFERENCE = re.compile(r"\$\{([A-Za-z0-9]+)[.}]")
+
+
+def _resources_of(template, resource_type):
+    return template.find_resources(resource_type)
+
+
+def test_broker_and_redis_only_in_clustered_mode(template):
+    for resource_type in ("AWS::AmazonMQ::Broker", "AWS::ElastiCache::CacheCluster"):
+        resources = _resources_of(template, resource_type)
+        redis_or_broker = {
+            logical_id: resource for logical_id, resource in resources.items()
+            if resource_type == "AWS::AmazonMQ::Broker" or resource["Properties"].get("Engine") == "redis"
+        }
+        assert redis_or_broker
+        for resource in redis_or_broker.values():
+            assert resource["Condition"] == "DeploymentModeClusteredCondition"
+
+
+def test_asg_does_not_depend_on_optional_backends(template):
+    asg = template.to_json()["Resources"]["Asg"]
+    depends_on = asg.get("DependsOn", [])
+    assert "RabbitMQBroker" not in depends_on
+    assert "RedisCluster" not in depends_on
+
+
+def test_describe_broker_policy_is_conditional(template):
+    policy = template.find_resources("AWS::IAM::Policy")["AsgDescribeBrokerPolicy"]
+    assert policy["Condition"] == "DeploymentModeClusteredCondition"
+    assert policy["Properties"]["PolicyDocument"]["Statement"][0]["Action"] == "mq:DescribeBroker"
+
+
+def test_single_node_excludes_scaling_out(template):
+    rule = template.to_json()["Rules"]["DeploymentModeSingleNodeRule"]
+    assert rule["RuleCondition"] == {"Fn::Equals": [{"Ref": "DeploymentMode"}, "single-node"]}
+    assert rule["Assertions"][0]["Assert"] == {"Fn::Equals": [{"Ref": "QueueWorkerAsgEnable"}, "false"]}
+
+
+def _clustered_conditions(template_json):
+    """The clustered condition and those clustered_only combined with it."""
+    return {CLUSTERED} | {
+        name for name, expression in template_json.get("Conditions", {}).items()
+        if {"Condition": CLUSTERED} in expression.get("Fn::And", [])
+    }
+
+
+def _references(node, clustered):
+    """Logical ids `node` refers to, outside Fn::If branches taken only in clustered mode."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _references(item, clustered)
+    elif isinstance(node, dict):
+        if set(node) == {"Fn::If"} and node["Fn::If"][0] in clustered:
+            yield from _references(node["Fn::If"][2], clustered)
+            return
+        for key, value in node.items():
+            if key == "Ref":
+                yield value
+            elif key == "Fn::GetAtt":
+                yield value[0] if isinstance(value, list) else value.split(".")[0]
+            elif key == "Fn::Sub":
+                template_string = value[0] if isinstance(value, list) else value
+                yield from SUB_REFERENCE.findall(template_string)
+                if isinstance(value, list):
+                    yield from _references(value[1], clustered)
+            else:
+                yield from _references(value, clustered)
+
+
+def test_nothing_references_the_broker_or_redis_unconditionally(template):
+    template_json = template.to_json()
+    clustered = _clustered_conditions(template_json)
+    resources = template_json["Resources"]
+    clustered_only = {
+        logical_id for logical_id, resource in resources.items()
+        if resource.get("Condition") in clustered
+    }
+    assert "RabbitMQBroker" in clustered_only
+    assert any(resource["Type"] == "AWS::ElastiCache::CacheCluster" for logical_id, resource in resources.items()
+               if logical_id in clustered_only)
+
+    unconditioned = {}
+    for section in ("Resources", "Outputs"):
+        for logical_id, body in template_json.get(section, {}).items():
+            if body.get("Condition") in clustered:
+                continue
+            depends_on = body.get("DependsOn", [])
+            references = set(_references(body, clustered)) | set(
+                [depends_on] if isinstance(depends_on, str) else depends_on
+            )
+            if references & clustered_only:
+                unconditioned[f"{section}.{logical_id}"] = sorted(references & clustered_only)
+    assert unconditioned == {}
@@ -0,0 +1,29 @@
+"""
+arm64 (Graviton) instance types and AMI selection for the app Auto Scaling groups.
+"""
+
+
+def test_graviton_instance_types_are_allowed(template):
+    allowed = template.to_json()["Parameters"]["AsgInstanceType"]["AllowedValues"]
+    assert "m7g.large" in allowed
+    assert "c7g.xlarge" in allowed
+    assert "t4g.medium" in allowed
+    assert "t3.medium" in allowed
+
+
+def test_image_follows_instance_architecture(template):
+    launch_templates = template.find_resources("AWS::EC2::LaunchTemplate")
+    image_id = next(iter(launch_templates.values()))["Properties"]["LaunchTemplateData"]["ImageId"]
+    assert image_id == {"Fn::If": ["AsgArm64Condition", {"Ref": "AsgArm64AmiIdv200"}, {"Ref": "AsgAmiIdv200"}]}
+
+
+def test_arm64_condition_matches_instance_family(template):
+    condition = template.to_json()["Conditions"]["AsgArm64Condition"]
+    family = {"Fn::Select": [0, {"Fn::Split": [".", {"Ref": "AsgInstanceType"}]}]}
+    assert {"Fn::Equals": [family, "m7g"]} in condition["Fn::Or"]
+    assert len(condition["Fn::Or"]) <= 10
+
+
+def test_graviton_needs_an_arm64_ami(template):
+    rule = template.to_json()["Rules"]["AsgArm64AmiRule"]
+    assert rule["Assertions"][0]["Assert"] == {"Fn::Not": [{"Fn::Equals": [{"Ref": "AsgArm64AmiIdv200"}, ""]}]}
@@ -0,0 +1,77 @@
+"""
+DNS layout for NLB incoming email: web records on the ALB, MX on a mail host.
+"""
+
+import pytest
+
+
+def _evaluate(template_json, expression, parameters):
+    """Evaluate a condition expression or Fn::If against parameter values (defaults unless overridden)."""
+    if isinstance(expression, dict):
+        (function, args), = expression.items()
+        if function == "Ref":
+            if args in template_json["Parameters"]:
+                return parameters.get(args, template_json["Parameters"][args].get("Default"))
+            return expression
+        if function == "Condition":
+            return _evaluate(template_json, template_json["Conditions"][args], parameters)
+        if function == "Fn::Equals":
+            return _evaluate(template_json, args[0], parameters) == _evaluate(template_json, args[1], parameters)
+        if function == "Fn::And":
+            return all(_evaluate(template_json, arg, parameters) for arg in args)
+        if function == "Fn::Or":
+            return any(_evaluate(template_json, arg, parameters) for arg in args)
+        if function == "Fn::Not":
+            return not _evaluate(template_json, args[0], parameters)
+        if function == "Fn::If":
+            condition, if_true, if_false = args
+            chosen = if_true if _evaluate(template_json, {"Condition": condition}, parameters) else if_false
+            return _evaluate(template_json, chosen, parameters)
+    return expression
+
+
+def _active(template_json, logical_id, parameters):
+    condition = template_json["Resources"][logical_id].get("Condition")
+    return condition is None or _evaluate(template_json, {"Condition": condition}, parameters)
+
+
+@pytest.mark.parametrize("layout", ["mail-host", "transition"])
+def test_web_records_alias_the_alb(template, layout):
+    template_json = template.to_json()
+    parameters = {"EnableIncomingEmail": "true", "IncomingEmailMode": "nlb", "IncomingEmailDnsLayout": layout}
+    for logical_id in ("RecordSetGroup", "SubdomainRecordSetGroup"):
+        alias = template_json["Resources"][logical_id]["Properties"]["RecordSets"][0]["AliasTarget"]
+        target = _evaluate(template_json, alias["DNSName"], parameters)
+        assert template_json["Resources"][target["Fn::GetAtt"][0]]["Properties"].get("Type", "application") == "application"
+
+
+def test_nlb_only_accepts_smtp_in_mail_host_layout(template):
+    template_json = template.to_json()
+    parameters = {"EnableIncomingEmail": "true", "IncomingEmailMode": "nlb"}
+    assert template_json["Parameters"]["IncomingEmailDnsLayout"]["Default"] == "mail-host"
+    assert _active(template_json, "Nlb", parameters)
+    assert _active(template_json, "EmailListener", parameters)
+    for logical_id in ("NlbHttpListener", "NlbHttpsListener", "NlbHttpTargetGroup", "NlbHttpsTargetGroup"):
+        assert not _active(template_json, logical_id, parameters)
+        assert _active(template_json, logical_id, dict(parameters, IncomingEmailDnsLayout="transition"))
+
+
+def test_mx_points_at_mail_host(template):
+    template_json = template.to_json()
+    parameters = {"EnableIncomingEmail": "true", "IncomingEmailMode": "nlb"}
+    mail = template_json["Resources"]["MailRecordSet"]
+    assert _active(template_json, "MailRecordSet", parameters)
+    assert mail["Properties"]["Type"] == "A"
+    assert mail["Properties"]["AliasTarget"]["DNSName"] == {"Fn::GetAtt": ["Nlb", "DNSName"]}
+
+    records = template_json["Resources"]["EmailRecordSet"]["Properties"]["ResourceRecords"]
+    mx = _evaluate(template_json, records, parameters)
+    assert mx[0]["Fn::Join"][1][0] == "1 mail."
+
+
+def test_shared_layout_keeps_web_on_the_nlb(template):
+    template_json = template.to_json()
+    parameters = {"EnableIncomingEmail": "true", "IncomingEmailMode": "nlb", "IncomingEmailDnsLayout": "shared"}
+    alias = template_json["Resources"]["RecordSetGroup"]["Properties"]["RecordSets"][0]["AliasTarget"]
+    assert _evaluate(template_json, alias["DNSName"], parameters) == {"Fn::GetAtt": ["Nlb", "DNSName"]}
+    assert not _active(template_json, "MailRecordSet", parameters)
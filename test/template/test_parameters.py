@@ -0,0 +1,44 @@
+"""
+Free-text parameters substituted into the user data's bootstrap.json heredoc.
+"""
+
+import re
+
+import pytest
+
+
+def _allows(template, name, value):
+    pattern = template.to_json()["Parameters"][name]["AllowedPattern"]
+    return re.fullmatch(pattern, value) is not None
+
+
+@pytest.mark.parametrize("name", ["AdminEmail", "GiphyApiKey", "SentryDsn"])
+def test_empty_value_is_allowed(template, name):
+    assert _allows(template, name, "")
+
+
+@pytest.mark.parametrize(
+    "name,value",
+    [
+        ("AdminEmail", "admin@example.com"),
+        ("GiphyApiKey", "aBc123XyZ"),
+        ("SentryDsn", "https://0123abcd@o1.ingest.sentry.io/42"),
+    ],
+)
+def test_valid_value_is_allowed(template, name, value):
+    assert _allows(template, name, value)
+
+
+@pytest.mark.parametrize(
+    "name,value",
+    [
+        ("AdminEmail", 'admin"@example.com'),
+        ("AdminEmail", "admin\\@example.com"),
+        ("AdminEmail", "$(id)@example.com"),
+        ("GiphyApiKey", 'key"'),
+        ("SentryDsn", "https://key@sentry.io/1\\"),
+        ("SentryDsn", "https://`id`@sentry.io/1"),
+    ],
+)
+def test_value_that_would_break_bootstrap_json_is_rejected(template, name, value):
+    assert not _allows(template, name, value)
@@ -0,0 +1,15 @@
+"""
+Optional queue-worker Auto Scaling group.
+"""
+
+
+def test_workers_are_replaced_like_the_web_tier(template):
+    groups = template.find_resources("AWS::AutoScaling::AutoScalingGroup")
+    assert groups["QueueWorkerAsg"]["UpdatePolicy"]
+    assert groups["QueueWorkerAsg"]["UpdatePolicy"] == groups["Asg"]["UpdatePolicy"]
+
+
+def test_workers_need_the_shared_memcached(template):
+    rule = template.to_json()["Rules"]["MemcachedSharedCacheRule"]
+    assert rule["RuleCondition"] == {"Fn::Equals": [{"Ref": "QueueWorkerAsgEnable"}, "true"]}
+    assert rule["Assertions"][0]["Assert"] == {"Fn::Equals": [{"Ref": "MemcachedEnable"}, "true"]}
@@ -0,0 +1,49 @@
+"""
+SES receipt pipeline for incoming email as an alternative to the NLB and postfix.
+"""
+
+SES_RESOURCES = (
+    "IncomingEmailBucket",
+    "IncomingEmailBucketPolicy",
+    "IncomingEmailDeadLetterQueue",
+    "IncomingEmailQueue",
+    "IncomingEmailQueuePolicy",
+    "IncomingEmailTopic",
+    "IncomingEmailTopicPolicy",
+    "IncomingEmailSubscription",
+    "IncomingEmailReceiptRule",
+    "IncomingEmailActivateRuleSet",
+)
+
+
+def test_ses_resources_are_conditional(template):
+    resources = template.to_json()["Resources"]
+    for logical_id in SES_RESOURCES:
+        assert resources[logical_id]["Condition"] == "IncomingEmailSesCondition"
+    assert resources["IncomingEmailReceiptRuleSet"]["Condition"] == "IncomingEmailCreateRuleSetCondition"
+
+
+def test_nlb_only_in_nlb_mode(template):
+    resources = template.to_json()["Resources"]
+    assert resources["Nlb"]["Condition"] == "IncomingEmailNlbCondition"
+
+
+def test_receipt_rule_stores_to_bucket_and_notifies_topic(template):
+    rule = template.find_resources("AWS::SES::ReceiptRule")["IncomingEmailReceiptRule"]["Properties"]
+    action = rule["Rule"]["Actions"][0]["S3Action"]
+    assert action["BucketName"] == {"Ref": "IncomingEmailBucket"}
+    assert action["ObjectKeyPrefix"] == "incoming/"
+    assert action["TopicArn"] == {"Ref": "IncomingEmailTopic"}
+    assert rule["RuleSetName"]["Fn::If"][0] == "IncomingEmailCreateRuleSetCondition"
+
+
+def test_failed_messages_go_to_dead_letter_queue(template):
+    queue = template.find_resources("AWS::SQS::Queue")["IncomingEmailQueue"]["Properties"]
+    assert queue["RedrivePolicy"]["deadLetterTargetArn"] == {"Fn::GetAtt": ["IncomingEmailDeadLetterQueue", "Arn"]}
+
+
+def test_mx_record_points_at_ses_in_ses_mode(template):
+    record = template.find_resources("AWS::Route53::RecordSet")["EmailRecordSet"]
+    records = record["Properties"]["ResourceRecords"]["Fn::If"]
+    assert records[0] == "IncomingEmailSesCondition"
+    assert records[1] == [{"Fn::Join": ["", ["10 inbound-smtp.", {"Ref": "AWS::Region"}, ".amazonaws.com"]]}]
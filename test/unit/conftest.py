@@ -0,0 +1,41 @@
+"""
+Pytest configuration for the offline unit tests.
+
+These tests exercise code that ships on the AMI (`packer/zulip_bootstrap`)
+against stubbed AWS clients, so they need no credentials or deployed stack.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / "packer"))
+# ssm_fleet is shared with the integration tests
+sys.path.insert(0, str(REPO_ROOT / "test" / "integration"))
+
+from zulip_bootstrap import config as bootstrap_config  # noqa: E402
+
+
+@pytest.fixture
+def boot_config():
+    return bootstrap_config.from_dict({
+        "region": "us-east-1",
+        "stack_name": "oe-patterns-zulip-test",
+        "hostname": "zulip.example.com",
+        "hosted_zone_name": "example.com",
+        "db_host": "db.cluster-abc.us-east-1.rds.amazonaws.com",
+        "db_secret_arn": "arn:aws:secretsmanager:us-east-1:123456789012:secret:db-AbCdEf",
+        "rabbitmq_secret_arn": "arn:aws:secretsmanager:us-east-1:123456789012:secret:mq-AbCdEf",
+        "rabbitmq_broker_arn": "arn:aws:mq:us-east-1:123456789012:broker:RabbitMQ:b-1234-abcd",
+        "redis_host": "redis.abc.cache.amazonaws.com",
+        "instance_secret_name": "oe-patterns-zulip-test/instance/credentials",
+        "assets_bucket_name": "assets-bucket",
+        "avatars_bucket_name": "avatars-bucket",
+        "admin_email": "",
+        "giphy_api_key": "",
+        "sentry_dsn": "",
+        "enable_incoming_email": "true",
+        "enable_mobile_push_notifications": "false",
+    })
@@ -0,0 +1,87 @@
+"""
+Boot phase timing and its embedded-metric output.
+"""
+
+import json
+
+import pytest
+
+from zulip_bootstrap import boot_metrics, emf, phases
+
+DIMENSIONS = {
+    "AutoScalingGroupName": "oe-patterns-zulip-test-Asg",
+    "ImageId": "ami-0123456789abcdef0",
+    "InstanceType": "t3.medium",
+}
+
+
+class TestPhases:
+
+    def test_shell_and_python_lines_round_trip(self, tmp_path):
+        path = tmp_path / "boot-phases.tsv"
+        # the format written by the `phase` function in user_data.sh
+        path.write_text("postfix\t1000\t1250\t0\nbroken line\n")
+        with phases.timed("render_config", path=str(path)):
+            pass
+
+        recorded = phases.read(str(path))
+        assert [p.name for p in recorded] == ["postfix", "render_config"]
+        assert recorded[0].duration_ms == 250
+        assert recorded[1].exit_code == 0
+
+    def test_exception_is_recorded_as_failure(self, tmp_path):
+        path = tmp_path / "boot-phases.tsv"
+        with pytest.raises(RuntimeError):
+            with phases.timed("fetch_secrets", path=str(path)):
+                raise RuntimeError("boom")
+        assert phases.read(str(path))[0].exit_code == 1
+
+    def test_missing_file_reads_empty(self, tmp_path):
+        assert phases.read(str(tmp_path / "missing.tsv")) == []
+
+
+class TestBuildRecords:
+
+    def test_phase_and_summary_records(self):
+        recorded = [
+            phases.Phase("configure", 10_000, 12_500, 0),
+            phases.Phase("readiness", 20_000, 35_000, 0),
+        ]
+        records = boot_metrics.build_records(recorded, DIMENSIONS, 0, 40_000, 1_000)
+
+        assert len(records) == 3
+        configure = records[0]
+        assert configure["PhaseDuration"] == 2500
+        assert configure["Phase"] == "configure"
+        directive = configure["_aws"]["CloudWatchMetrics"][0]
+        assert directive["Namespace"] == emf.NAMESPACE
+        assert ["AutoScalingGroupName", "ImageId", "InstanceType", "Phase"] in directive["Dimensions"]
+        assert directive["Metrics"] == [{"Name": "PhaseDuration", "Unit": "Milliseconds"}]
+
+        summary = records[-1]
+        assert summary["TimeToReady"] == 39_000
+        assert summary["UserDataDuration"] == 30_000
+        assert summary["BootFailure"] == 0
+
+    def test_missing_dimension_is_dropped_from_sets(self):
+        dimensions = dict(DIMENSIONS, AutoScalingGroupName="")
+        records = boot_metrics.build_records([], dimensions, 1, 5_000, None)
+
+        summary = records[0]
+        assert summary["BootFailure"] == 1
+        assert "TimeToReady" not in summary
+        assert "AutoScalingGroupName" not in summary
+        assert summary["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["ImageId", "InstanceType"], ["ImageId"]]
+
+    def test_write_emits_json_lines(self, tmp_path):
+        path = tmp_path / "oe-zulip" / "metrics.log"
+        records = boot_metrics.build_records([phases.Phase("nginx", 0, 5, 0)], DIMENSIONS, 0, 10, None)
+        emf.write(records, path=str(path))
+        lines = path.read_text().splitlines()
+        assert [json.loads(line)["_aws"]["Timestamp"] for line in lines] == [5, 10]
+
+
+def test_kernel_boot_time(tmp_path):
+    proc_stat = tmp_path / "stat"
+    proc_stat.write_text("cpu  1 2 3\nbtime 1700000000\nprocesses 10\n")
+    assert boot_metrics.kernel_boot_time_ms(str(proc_stat)) == 1_700_000_000_000
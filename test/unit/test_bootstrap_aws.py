@@ -0,0 +1,260 @@
+"""
+Secret and endpoint resolution in the first-boot bootstrap agent.
+"""
+
+import dataclasses
+import json
+import threading
+
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+
+from zulip_bootstrap import aws, config, instance_secret
+
+
+@pytest.fixture
+def secretsmanager():
+    client = boto3.client(
+        "secretsmanager",
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture
+def mq():
+    client = boto3.client(
+        "mq",
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture
+def elasticache():
+    client = boto3.client(
+        "elasticache",
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+COMPLETE_INSTANCE_SECRET = {
+    "access_key_id": "AKIAEXAMPLE",
+    "secret_access_key": "secret",
+    "smtp_password": "smtp",
+    "avatar_salt": "a" * 64,
+    "camo_key": "c" * 64,
+    "shared_secret": "s" * 64,
+    "zulip_org_key": "k" * 64,
+    "redis_password": "r" * 64,
+    "secret_key": "x" * 50,
+    "zulip_org_id": "9c0c2cb4-4f4e-4b8e-9b4f-6b1f2d0a8e5c",
+}
+
+
+class TestInstanceSecret:
+
+    def test_generated_values_keep_previous_format(self):
+        generated, changed = instance_secret.fill_missing({})
+        assert changed
+        for key in instance_secret.SIMILAR_SECRETS:
+            assert len(generated[key]) == 64
+            assert generated[key].isalnum()
+        assert len(generated["secret_key"]) == 50
+        assert len(generated["zulip_org_id"]) == 36
+
+    def test_existing_values_are_kept(self):
+        generated, changed = instance_secret.fill_missing(COMPLETE_INSTANCE_SECRET)
+        assert not changed
+        assert generated == COMPLETE_INSTANCE_SECRET
+
+    def test_values_are_unique(self):
+        first, _ = instance_secret.fill_missing({})
+        second, _ = instance_secret.fill_missing({})
+        assert first["secret_key"] != second["secret_key"]
+        assert first["avatar_salt"] != second["avatar_salt"]
+
+
+class TestEnsureInstanceSecret:
+
+    def test_no_update_when_complete(self, secretsmanager):
+        client, stubber = secretsmanager
+        stubber.add_response(
+            "get_secret_value",
+            {"SecretString": json.dumps(COMPLETE_INSTANCE_SECRET)},
+            {"SecretId": "stack/instance/credentials"},
+        )
+        result = aws.ensure_instance_secret(client, "stack/instance/credentials")
+        assert result == COMPLETE_INSTANCE_SECRET
+
+    def test_missing_keys_are_written_back(self, secretsmanager):
+        client, stubber = secretsmanager
+        ses_only = {
+            "access_key_id": "AKIAEXAMPLE",
+            "secret_access_key": "secret",
+            "smtp_password": "smtp",
+        }
+        stubber.add_response(
+            "get_secret_value",
+            {"SecretString": json.dumps(ses_only)},
+            {"SecretId": "stack/instance/credentials"},
+        )
+        stubber.add_response(
+            "update_secret",
+            {},
+            {"SecretId": "stack/instance/credentials", "SecretString": ANY},
+        )
+        result = aws.ensure_instance_secret(client, "stack/instance/credentials")
+        assert result["access_key_id"] == "AKIAEXAMPLE"
+        assert set(instance_secret.SIMILAR_SECRETS) <= set(result)
+        assert "secret_key" in result
+        assert "zulip_org_id" in result
+
+
+class TestRabbitMQHost:
+
+    @pytest.mark.parametrize("endpoint", [
+        "amqps://b-1234-abcd.mq.us-east-1.on.aws:5671",
+        "amqp://b-1234-abcd.mq.us-east-1.on.aws:5671",
+        "b-1234-abcd.mq.us-east-1.on.aws",
+    ])
+    def test_strips_scheme_and_port(self, mq, endpoint):
+        client, stubber = mq
+        stubber.add_response(
+            "describe_broker",
+            {"BrokerInstances": [{"Endpoints": [endpoint]}]},
+            {"BrokerId": "b-1234-abcd"},
+        )
+        assert aws.rabbitmq_host(client, "b-1234-abcd") == "b-1234-abcd.mq.us-east-1.on.aws"
+
+
+class TestMemcachedLocation:
+
+    def test_lists_nodes_in_a_stable_order(self, elasticache):
+        client, stubber = elasticache
+        stubber.add_response(
+            "describe_cache_clusters",
+            {"CacheClusters": [{"CacheNodes": [
+                {"CacheNodeId": "0002", "Endpoint": {"Address": "m.abc.0002.use1.cache.amazonaws.com", "Port": 11211}},
+                {"CacheNodeId": "0001", "Endpoint": {"Address": "m.abc.0001.use1.cache.amazonaws.com", "Port": 11211}},
+            ]}]},
+            {"CacheClusterId": "memcached-abc", "ShowCacheNodeInfo": True},
+        )
+        assert aws.memcached_location(client, "memcached-abc") == (
+            "m.abc.0001.use1.cache.amazonaws.com:11211,m.abc.0002.use1.cache.amazonaws.com:11211"
+        )
+
+
+class FakeSecretsManager:
+    """Thread-safe stand-in keyed by SecretId, since fetch_all issues calls concurrently."""
+
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_secret_value(self, SecretId):
+        with self.lock:
+            self.calls.append(("get_secret_value", SecretId))
+        return {"SecretString": json.dumps(self.values[SecretId])}
+
+    def update_secret(self, SecretId, SecretString):
+        with self.lock:
+            self.calls.append(("update_secret", SecretId))
+            self.values[SecretId] = json.loads(SecretString)
+        return {}
+
+
+class FakeMQ:
+
+    def describe_broker(self, BrokerId):
+        return {"BrokerInstances": [{"Endpoints": [f"amqps://{BrokerId}.mq.us-east-1.on.aws:5671"]}]}
+
+
+class TestFetchAll:
+
+    def test_resolves_everything(self, boot_config):
+        secretsmanager = FakeSecretsManager({
+            boot_config.db_secret_arn: {"username": "zulip", "password": "dbpass"},
+            boot_config.rabbitmq_secret_arn: {"username": "rabbit", "password": "mqpass"},
+            boot_config.instance_secret_name: dict(COMPLETE_INSTANCE_SECRET),
+        })
+        clients = aws.AwsClients(secretsmanager=secretsmanager, mq=FakeMQ())
+
+        result = aws.fetch_all(boot_config, clients)
+
+        assert result.db["password"] == "dbpass"
+        assert result.rabbitmq["username"] == "rabbit"
+        assert result.instance == COMPLETE_INSTANCE_SECRET
+        assert result.rabbitmq_host == "b-1234-abcd.mq.us-east-1.on.aws"
+        assert ("update_secret", boot_config.instance_secret_name) not in secretsmanager.calls
+        assert result.memcached_location == aws.LOCAL_MEMCACHED
+
+    def test_single_node_skips_broker_lookup(self, boot_config):
+        boot_config = dataclasses.replace(boot_config, deployment_mode="single-node", rabbitmq_broker_arn="")
+        secretsmanager = FakeSecretsManager({
+            boot_config.db_secret_arn: {"username": "zulip", "password": "dbpass"},
+            boot_config.rabbitmq_secret_arn: {"username": "rabbit", "password": "mqpass"},
+            boot_config.instance_secret_name: dict(COMPLETE_INSTANCE_SECRET),
+        })
+        clients = aws.AwsClients(secretsmanager=secretsmanager, mq=None)
+
+        result = aws.fetch_all(boot_config, clients)
+
+        assert result.rabbitmq_host == "127.0.0.1"
+        assert result.rabbitmq["password"] == "mqpass"
+
+    def test_overridden_broker_skips_broker_lookup(self, boot_config):
+        boot_config = dataclasses.replace(boot_config, rabbitmq_host="rabbitmq")
+        secretsmanager = FakeSecretsManager({
+            boot_config.db_secret_arn: {"username": "zulip", "password": "dbpass"},
+            boot_config.rabbitmq_secret_arn: {"username": "rabbit", "password": "mqpass"},
+            boot_config.instance_secret_name: dict(COMPLETE_INSTANCE_SECRET),
+        })
+        clients = aws.AwsClients(secretsmanager=secretsmanager, mq=None)
+
+        result = aws.fetch_all(boot_config, clients)
+
+        assert result.rabbitmq_host == "rabbitmq"
+
+
+class TestLoad:
+
+    def test_overrides_are_merged(self, tmp_path):
+        path, overrides = tmp_path / "bootstrap.json", tmp_path / "overrides.json"
+        path.write_text(json.dumps({
+            "region": "us-east-1",
+            "stack_name": "zulip-local",
+            "hostname": "zulip.local",
+            "hosted_zone_name": "local",
+            "db_host": "postgres",
+            "db_secret_arn": "db",
+            "rabbitmq_secret_arn": "mq",
+            "rabbitmq_broker_arn": "",
+            "redis_host": "redis",
+            "instance_secret_name": "instance",
+            "assets_bucket_name": "assets",
+            "avatars_bucket_name": "avatars",
+        }))
+
+        assert config.load(str(path), str(overrides)).rabbitmq_host == ""
+
+        overrides.write_text(json.dumps({"rabbitmq_host": "rabbitmq", "s3_endpoint_url": "http://minio:9000"}))
+        loaded = config.load(str(path), str(overrides))
+        assert loaded.rabbitmq_host == "rabbitmq"
+        assert loaded.s3_endpoint_url == "http://minio:9000"
+        assert loaded.hostname == "zulip.local"
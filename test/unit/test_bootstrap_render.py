@@ -0,0 +1,229 @@
+"""
+Rendering of Zulip's configuration files by the first-boot bootstrap agent.
+"""
+
+import ast
+import configparser
+import dataclasses
+import os
+
+import pytest
+
+from zulip_bootstrap import render
+from zulip_bootstrap.aws import BootstrapSecrets
+from zulip_bootstrap.process_model import ProcessModel
+
+
+@pytest.fixture
+def secrets():
+    return BootstrapSecrets(
+        db={"username": "zulip", "password": "dbpass"},
+        rabbitmq={"username": "rabbit", "password": "mqpass"},
+        instance={
+            "access_key_id": "AKIAEXAMPLE",
+            "secret_access_key": "s3secret",
+            "smtp_password": "smtp",
+            "avatar_salt": "salt",
+            "camo_key": "camo",
+            "shared_secret": "shared",
+            "zulip_org_key": "orgkey",
+            "redis_password": "redispass",
+            "secret_key": "django-secret!@#",
+            "zulip_org_id": "org-id",
+        },
+        rabbitmq_host="b-1234-abcd.mq.us-east-1.on.aws",
+    )
+
+
+def _settings_namespace(source):
+    """Return the top-level assignments of a rendered settings.py."""
+    values = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.Assign, ast.AnnAssign)):
+            target = node.targets[0] if isinstance(node, ast.Assign) else node.target
+            try:
+                values[target.id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass
+    return values
+
+
+class TestSettings:
+
+    def test_settings_is_valid_python(self, boot_config, secrets):
+        values = _settings_namespace(render.render_settings(boot_config, secrets))
+        assert values["EXTERNAL_HOST"] == "zulip.example.com"
+        assert values["ZULIP_ADMINISTRATOR"] == "zulip@example.com"
+        assert values["EMAIL_HOST"] == "email-smtp.us-east-1.amazonaws.com"
+        assert values["EMAIL_HOST_USER"] == "AKIAEXAMPLE"
+        assert values["REMOTE_POSTGRES_HOST"] == boot_config.db_host
+        assert values["RABBITMQ_HOST"] == "b-1234-abcd.mq.us-east-1.on.aws"
+        assert values["RABBITMQ_USERNAME"] == "rabbit"
+        assert values["REDIS_HOST"] == boot_config.redis_host
+        assert values["S3_AUTH_UPLOADS_BUCKET"] == "assets-bucket"
+        assert values["S3_AVATAR_BUCKET"] == "avatars-bucket"
+        assert values["MEMCACHED_LOCATION"] == "127.0.0.1:11211"
+
+    def test_managed_broker_uses_tls(self, boot_config, secrets):
+        values = _settings_namespace(render.render_settings(boot_config, secrets))
+        assert values["RABBITMQ_PORT"] == 5671
+        assert values["RABBITMQ_USE_TLS"] is True
+
+    def test_single_node_uses_local_broker_without_tls(self, boot_config, secrets):
+        config = dataclasses.replace(boot_config, deployment_mode="single-node", redis_host="127.0.0.1")
+        secrets = dataclasses.replace(secrets, rabbitmq_host="127.0.0.1")
+        values = _settings_namespace(render.render_settings(config, secrets))
+        assert values["RABBITMQ_HOST"] == "127.0.0.1"
+        assert values["RABBITMQ_PORT"] == 5672
+        assert values["RABBITMQ_USE_TLS"] is False
+        assert values["REDIS_HOST"] == "127.0.0.1"
+
+    def test_overridden_broker_without_tls(self, boot_config, secrets):
+        config = dataclasses.replace(boot_config, rabbitmq_host="rabbitmq")
+        secrets = dataclasses.replace(secrets, rabbitmq_host="rabbitmq")
+        values = _settings_namespace(render.render_settings(config, secrets))
+        assert values["RABBITMQ_HOST"] == "rabbitmq"
+        assert values["RABBITMQ_PORT"] == 5672
+        assert values["RABBITMQ_USE_TLS"] is False
+
+    def test_s3_endpoint(self, boot_config, secrets):
+        source = render.render_settings(boot_config, secrets)
+        assert "S3_ENDPOINT_URL" not in _settings_namespace(source)
+        assert "# S3_ENDPOINT_URL = None" in source
+
+        config = dataclasses.replace(boot_config, s3_endpoint_url="http://minio:9000")
+        values = _settings_namespace(render.render_settings(config, secrets))
+        assert values["S3_ENDPOINT_URL"] == "http://minio:9000"
+        assert values["S3_ADDRESSING_STYLE"] == "path"
+
+    def test_db_proxy_replaces_cluster_endpoint(self, boot_config, secrets):
+        config = dataclasses.replace(boot_config, db_proxy_host="zulip-db-proxy.proxy-abc.us-east-1.rds.amazonaws.com")
+        values = _settings_namespace(render.render_settings(config, secrets))
+        assert values["REMOTE_POSTGRES_HOST"] == "zulip-db-proxy.proxy-abc.us-east-1.rds.amazonaws.com"
+
+    def test_cdn_serves_avatars(self, boot_config, secrets):
+        assert "S3_AVATAR_PUBLIC_URL_PREFIX" not in _settings_namespace(render.render_settings(boot_config, secrets))
+
+        config = dataclasses.replace(boot_config, cdn_enabled=True)
+        values = _settings_namespace(render.render_settings(config, secrets))
+        assert values["S3_AVATAR_PUBLIC_URL_PREFIX"] == "https://zulip.example.com/user_avatars/"
+
+    def test_shared_memcached(self, boot_config, secrets):
+        secrets = dataclasses.replace(secrets, memcached_location="m.0001.cache:11211,m.0002.cache:11211")
+        values = _settings_namespace(render.render_settings(boot_config, secrets))
+        assert values["MEMCACHED_LOCATION"] == "m.0001.cache:11211,m.0002.cache:11211"
+
+    def test_incoming_email_sets_gateway_pattern(self, boot_config, secrets):
+        values = _settings_namespace(render.render_settings(boot_config, secrets))
+        assert values["EMAIL_GATEWAY_PATTERN"] == "%s@zulip.example.com"
+
+        boot_config = dataclasses.replace(boot_config, enable_incoming_email=False)
+        values = _settings_namespace(render.render_settings(boot_config, secrets))
+        assert values["EMAIL_GATEWAY_PATTERN"] == ""
+
+    def test_optional_settings_are_commented_out_by_default(self, boot_config, secrets):
+        source = render.render_settings(boot_config, secrets)
+        values = _settings_namespace(source)
+        assert "GIPHY_API_KEY" not in values
+        assert "SENTRY_DSN" not in values
+        assert "PUSH_NOTIFICATION_BOUNCER_URL" not in values
+        assert '# GIPHY_API_KEY = "<Your API key from GIPHY>"' in source
+
+    def test_optional_settings_when_given(self, boot_config, secrets):
+        boot_config = dataclasses.replace(
+            boot_config,
+            admin_email="admin@example.com",
+            giphy_api_key="giphy",
+            sentry_dsn="https://key@sentry.example.com/1",
+            enable_mobile_push_notifications=True,
+        )
+        values = _settings_namespace(render.render_settings(boot_config, secrets))
+        assert values["ZULIP_ADMINISTRATOR"] == "admin@example.com"
+        assert values["GIPHY_API_KEY"] == "giphy"
+        assert values["SENTRY_DSN"] == "https://key@sentry.example.com/1"
+        assert values["PUSH_NOTIFICATION_BOUNCER_URL"] == "https://push.zulipchat.com"
+
+
+class TestSecrets:
+
+    def test_secrets_conf(self, boot_config, secrets):
+        parser = configparser.RawConfigParser()
+        parser.read_string(render.render_secrets(boot_config, secrets))
+        section = parser["secrets"]
+        assert section["postgres_password"] == "dbpass"
+        assert section["rabbitmq_password"] == "mqpass"
+        assert section["email_password"] == "smtp"
+        assert section["s3_key"] == "AKIAEXAMPLE"
+        assert section["s3_secret_key"] == "s3secret"
+        assert section["secret_key"] == "django-secret!@#"
+        assert section["zulip_org_id"] == "org-id"
+        assert "redis_password" not in section
+
+    def test_single_node_sets_redis_password(self, boot_config, secrets):
+        config = dataclasses.replace(boot_config, deployment_mode="single-node")
+        parser = configparser.RawConfigParser()
+        parser.read_string(render.render_secrets(config, secrets))
+        assert parser["secrets"]["redis_password"] == "redispass"
+
+
+class TestZulipConf:
+
+    def test_process_model_and_puppet_classes(self, boot_config):
+        parser = configparser.ConfigParser()
+        parser.read_string(render.render_zulip_conf(boot_config, ProcessModel(12, True)))
+
+        assert parser["machine"]["puppet_classes"] == render.PUPPET_CLASSES
+        assert parser["machine"]["deploy_type"] == "production"
+        assert parser["application_server"]["uwsgi_processes"] == "12"
+        assert parser["application_server"]["queue_workers_multiprocess"] == "true"
+        assert not parser.has_section("tornado_sharding")
+
+    def test_single_node_adds_local_service_classes(self, boot_config):
+        config = dataclasses.replace(boot_config, deployment_mode="single-node")
+        parser = configparser.ConfigParser()
+        parser.read_string(render.render_zulip_conf(config, ProcessModel(12, True)))
+
+        classes = [c.strip() for c in parser["machine"]["puppet_classes"].split(",")]
+        assert classes[:3] == [c.strip() for c in render.PUPPET_CLASSES.split(",")]
+        assert "zulip::profile::rabbitmq" in classes
+        assert "zulip::profile::redis" in classes
+
+    def test_s3_cache_size(self, boot_config):
+        parser = configparser.ConfigParser()
+        parser.read_string(render.render_zulip_conf(boot_config, ProcessModel(12, True), s3_disk_cache_mb=20480))
+
+        assert parser["application_server"]["s3_disk_cache_size"] == "20480M"
+        assert parser["application_server"]["s3_memory_cache_size"] == "20M"
+
+    def test_s3_cache_defaults_to_zulip(self, boot_config):
+        parser = configparser.ConfigParser()
+        parser.read_string(render.render_zulip_conf(boot_config, ProcessModel(12, True)))
+
+        assert "s3_disk_cache_size" not in parser["application_server"]
+
+    def test_tornado_sharding(self, boot_config):
+        config = dataclasses.replace(boot_config, tornado_shards="3")
+        parser = configparser.RawConfigParser()
+        parser.read_string(render.render_zulip_conf(config, ProcessModel(12, True)))
+
+        assert dict(parser["tornado_sharding"]) == {
+            "9800": "zulip.example.com",
+            "9800_regex": r"^[0-9a-b][^.]*\.zulip\.example\.com$",
+            "9801_regex": r"^[c-n][^.]*\.zulip\.example\.com$",
+            "9802_regex": r"^[o-z][^.]*\.zulip\.example\.com$",
+        }
+
+
+class TestWriteAll:
+
+    def test_writes_every_file(self, tmp_path, boot_config, secrets):
+        (tmp_path / "settings.py").write_text("# baked\n")
+        rendered = render.render_all(boot_config, secrets, ProcessModel(6, False))
+
+        render.write_all(rendered, etc_dir=str(tmp_path), secrets_group=None)
+
+        assert (tmp_path / "settings.py.orig").read_text() == "# baked\n"
+        for name, contents in rendered.items():
+            assert (tmp_path / name).read_text() == contents
+        assert oct(os.stat(tmp_path / "zulip-secrets.conf").st_mode & 0o777) == "0o640"
+        assert not [p for p in tmp_path.iterdir() if p.name.startswith(".bootstrap-")]
@@ -0,0 +1,34 @@
+"""
+SQL run against the cluster by `zulip-bootstrap configure` and `tune-tables`.
+"""
+
+import subprocess
+
+import pytest
+
+from zulip_bootstrap import database
+
+
+@pytest.fixture
+def statements(monkeypatch):
+    calls = []
+    monkeypatch.setattr(subprocess, "run", lambda cmd, **kwargs: calls.append((cmd, kwargs["env"]["PGPASSWORD"])))
+    return calls
+
+
+def test_prepare_creates_schema_and_pg_stat_statements(boot_config, statements):
+    database.prepare(boot_config, "master", "secret")
+
+    sql = [cmd[-1] for cmd, _ in statements]
+    assert "CREATE SCHEMA IF NOT EXISTS zulip AUTHORIZATION zulip" in sql
+    assert "CREATE EXTENSION IF NOT EXISTS pg_stat_statements" in sql
+    for cmd, password in statements:
+        assert cmd[:7] == ["psql", "-U", "master", "-h", boot_config.db_host, "-d", "zulip"]
+        assert password == "secret"
+
+
+def test_tune_tables_only_touches_existing_tables(boot_config, statements):
+    database.tune_tables(boot_config, "master", "secret")
+
+    assert [cmd[-1] for cmd, _ in statements] == database.TUNE_TABLES_SQL
+    assert all("IF EXISTS" in sql for sql in database.TUNE_TABLES_SQL)
@@ -0,0 +1,204 @@
+"""
+SES incoming email consumer: SQS batches, S3 fetches and email mirror delivery.
+"""
+
+import io
+import json
+
+import boto3
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+from zulip_bootstrap import email_ingest
+
+QUEUE_URL = "https://sqs.us-east-1.amazonaws.com/123456789012/zulip-IncomingEmailQueue"
+
+
+def _client(service):
+    return boto3.client(
+        service,
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+
+
+@pytest.fixture
+def sqs():
+    client = _client("sqs")
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture
+def s3():
+    client = _client("s3")
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+def _notification(key, recipients=("stream.abc123@zulip.example.com",)):
+    ses = {
+        "notificationType": "Received",
+        "receipt": {
+            "recipients": list(recipients),
+            "action": {"type": "S3", "bucketName": "incoming-bucket", "objectKey": key},
+        },
+    }
+    return json.dumps({"Type": "Notification", "Message": json.dumps(ses)})
+
+
+def _object(body):
+    return {"Body": StreamingBody(io.BytesIO(body), len(body))}
+
+
+class TestParseNotification:
+
+    def test_sns_wrapped(self):
+        assert email_ingest.parse_notification(_notification("incoming/abc")) == (
+            "incoming-bucket", "incoming/abc", ["stream.abc123@zulip.example.com"]
+        )
+
+    def test_raw(self):
+        raw = json.loads(json.loads(_notification("incoming/abc"))["Message"])
+        assert email_ingest.parse_notification(json.dumps(raw))[1] == "incoming/abc"
+
+    @pytest.mark.parametrize("body", [
+        "not json",
+        json.dumps({"Type": "Notification", "Message": json.dumps({"notificationType": "AMAZON_SES_SETUP_NOTIFICATION"})}),
+    ])
+    def test_ignores_other_messages(self, body):
+        assert email_ingest.parse_notification(body) is None
+
+
+class TestProcessBatch:
+
+    def test_delivers_and_deletes_batch(self, sqs, s3):
+        sqs_client, sqs_stub = sqs
+        s3_client, s3_stub = s3
+        sqs_stub.add_response("receive_message", {"Messages": [
+            {"MessageId": "1", "ReceiptHandle": "rh-1", "Body": _notification("incoming/one")},
+            {"MessageId": "2", "ReceiptHandle": "rh-2", "Body": "setup notification"},
+        ]}, {"QueueUrl": QUEUE_URL, "MaxNumberOfMessages": 10, "WaitTimeSeconds": 0})
+        s3_stub.add_response("get_object", _object(b"From: a@example.com\r\n\r\nhi"),
+                             {"Bucket": "incoming-bucket", "Key": "incoming/one"})
+        s3_stub.add_response("delete_object", {}, {"Bucket": "incoming-bucket", "Key": "incoming/one"})
+        sqs_stub.add_response("delete_message_batch", {"Successful": [], "Failed": []}, {
+            "QueueUrl": QUEUE_URL,
+            "Entries": [{"Id": "0", "ReceiptHandle": "rh-2"}, {"Id": "1", "ReceiptHandle": "rh-1"}],
+        })
+        delivered = []
+
+        count = email_ingest.process_batch(
+            sqs_client, s3_client, QUEUE_URL,
+            lambda recipient, raw: delivered.append((recipient, raw)),
+            wait_time_seconds=0,
+        )
+
+        assert count == 1
+        assert delivered == [("stream.abc123@zulip.example.com", b"From: a@example.com\r\n\r\nhi")]
+
+    def test_failed_delivery_stays_on_queue(self, sqs, s3):
+        sqs_client, sqs_stub = sqs
+        s3_client, s3_stub = s3
+        sqs_stub.add_response("receive_message", {"Messages": [
+            {"MessageId": "1", "ReceiptHandle": "rh-1", "Body": _notification("incoming/one")},
+        ]})
+        s3_stub.add_response("get_object", _object(b"mail"))
+
+        def deliver(recipient, raw):
+            raise email_ingest.DeliveryError("HTTP 502")
+
+        assert email_ingest.process_batch(sqs_client, s3_client, QUEUE_URL, deliver, wait_time_seconds=0) == 0
+
+    def test_partial_delivery_requeues_failed_recipients(self, sqs, s3):
+        sqs_client, sqs_stub = sqs
+        s3_client, s3_stub = s3
+        recipients = ("stream.one@zulip.example.com", "stream.two@zulip.example.com", "stream.three@zulip.example.com")
+        sqs_stub.add_response("receive_message", {"Messages": [
+            {"MessageId": "1", "ReceiptHandle": "rh-1", "Body": _notification("incoming/one", recipients)},
+        ]})
+        s3_stub.add_response("get_object", _object(b"mail"))
+        sqs_stub.add_response("send_message", {"MessageId": "2"}, {
+            "QueueUrl": QUEUE_URL,
+            "MessageBody": email_ingest.requeue_body(
+                email_ingest.InboundEmail("rh-1", "incoming-bucket", "incoming/one", []),
+                ["stream.two@zulip.example.com"],
+            ),
+            "DelaySeconds": email_ingest.REQUEUE_DELAY_SECONDS,
+        })
+        sqs_stub.add_response("delete_message_batch", {"Successful": [], "Failed": []}, {
+            "QueueUrl": QUEUE_URL,
+            "Entries": [{"Id": "0", "ReceiptHandle": "rh-1"}],
+        })
+        delivered = []
+
+        def deliver(recipient, raw):
+            if recipient == "stream.two@zulip.example.com":
+                raise email_ingest.DeliveryError("HTTP 502")
+            delivered.append(recipient)
+
+        # the stored message is kept for the requeued recipient
+        assert email_ingest.process_batch(sqs_client, s3_client, QUEUE_URL, deliver, wait_time_seconds=0) == 0
+        assert delivered == ["stream.one@zulip.example.com", "stream.three@zulip.example.com"]
+
+    def test_requeued_body_parses_back(self):
+        email = email_ingest.InboundEmail("rh-1", "incoming-bucket", "incoming/one", ["a@zulip.example.com", "b@zulip.example.com"])
+        body = email_ingest.requeue_body(email, ["b@zulip.example.com"])
+        assert email_ingest.parse_notification(body) == ("incoming-bucket", "incoming/one", ["b@zulip.example.com"])
+
+    def test_empty_receive(self, sqs, s3):
+        sqs_client, sqs_stub = sqs
+        sqs_stub.add_response("receive_message", {})
+        assert email_ingest.process_batch(sqs_client, s3[0], QUEUE_URL, lambda *args: None, wait_time_seconds=0) == 0
+
+
+def test_reads_shared_secret(tmp_path):
+    secrets = tmp_path / "zulip-secrets.conf"
+    secrets.write_text("[secrets]\nshared_secret = s3cr3t\n")
+    assert email_ingest.read_shared_secret(str(secrets)) == "s3cr3t"
+
+
+class _Connection:
+    """Stands in for http.client.HTTPSConnection; `response` is set per test."""
+    response = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def request(self, method, path, body=None, headers=None):
+        pass
+
+    def getresponse(self):
+        return self.response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def mirror(monkeypatch):
+    def respond(status):
+        response = io.BytesIO(b"detail")
+        response.status = status
+        monkeypatch.setattr(_Connection, "response", response)
+        return email_ingest.mirror_delivery("zulip.example.com", "s3cr3t")
+
+    monkeypatch.setattr(email_ingest.http.client, "HTTPSConnection", _Connection)
+    return respond
+
+
+class TestMirrorDelivery:
+    def test_accepted(self, mirror):
+        mirror(200)("stream.abc123@zulip.example.com", b"Subject: hi\r\n\r\nhello")
+
+    def test_bad_request_is_dropped(self, mirror):
+        mirror(400)("stream.abc123@zulip.example.com", b"Subject: hi\r\n\r\nhello")
+
+    @pytest.mark.parametrize("status", [403, 404, 429, 502])
+    def test_other_errors_are_retried(self, mirror, status):
+        with pytest.raises(email_ingest.DeliveryError, match=f"HTTP {status}"):
+            mirror(status)("stream.abc123@zulip.example.com", b"Subject: hi\r\n\r\nhello")
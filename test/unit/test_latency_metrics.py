@@ -0,0 +1,107 @@
+"""
+Per-route latency histograms from nginx's JSON access log.
+"""
+
+import json
+
+import pytest
+
+from zulip_bootstrap import latency_metrics
+
+
+def _line(uri, request_time=0.012, upstream="0.010", status=200):
+    return json.dumps({
+        "uri": uri,
+        "status": status,
+        "request_time": request_time,
+        "upstream_response_time": upstream,
+    })
+
+
+@pytest.mark.parametrize("uri, route", [
+    ("/json/messages?anchor=newest&num_before=50", "/json/messages"),
+    ("/json/events?queue_id=1517975029:0&last_event_id=5", "/json/events"),
+    ("/api/v1/messages/123/reactions", "/api/v1/messages/{id}/reactions"),
+    ("/api/v1/users/me/subscriptions/properties", "/api/v1/users/me/subscriptions/properties"),
+    ("/api/v1/users/iago@zulip.example.com", "/api/v1/users/{name}"),
+    ("/json/users/me/42/topics", "/json/users/me/{id}/topics"),
+    ("/json/realm/emoji/party_parrot", "/json/realm/emoji/{name}"),
+    ("/json/user_uploads/2/ab/cdef/image.png", "/json/user_uploads/{id}/{name}/{name}"),
+    ("/api/v1/messages/", "/api/v1/messages"),
+    ("/static/webpack-bundles/app.3f2a1c.js", "/static"),
+    ("/user_uploads/2/ab/cdef/image.png", "/user_uploads"),
+    ("/", "/"),
+    ("/wp-login.php", "other"),
+])
+def test_normalize(uri, route):
+    assert latency_metrics.normalize(uri) == route
+
+
+def test_aggregate_buckets_latencies_per_route():
+    stats = latency_metrics.aggregate([
+        _line("/json/messages", 0.012, "0.010"),
+        _line("/json/messages", 0.013, "0.011"),
+        _line("/json/messages", 1.2, "1.1", status=502),
+        _line("/static/app.js", 0.001, "-"),
+        "not json",
+    ])
+
+    messages = stats["/json/messages"]
+    assert messages.requests == 3
+    assert messages.server_errors == 1
+    assert messages.request_ms == {15: 2, 1500: 1}
+    assert messages.upstream_ms == {10: 1, 15: 1, 1500: 1}
+    assert stats["/static"].upstream_ms == {}
+
+
+def test_retried_upstream_times_are_summed():
+    stats = latency_metrics.aggregate([_line("/json/messages", 0.5, "0.100, 0.300")])
+    assert stats["/json/messages"].upstream_ms == {400: 1}
+
+
+def test_variable_segments_share_a_route():
+    stats = latency_metrics.aggregate([
+        _line(f"/json/streams/{name}/members") for name in ("design", "backend", "général", "design")
+    ])
+    assert set(stats) == {"/json/streams/{name}/members"}
+    assert stats["/json/streams/{name}/members"].requests == 4
+
+
+def test_routes_are_bounded(monkeypatch):
+    monkeypatch.setattr(latency_metrics, "MAX_ROUTES", 2)
+    stats = latency_metrics.aggregate([
+        _line(uri) for uri in ("/json/messages", "/json/events", "/json/typing", "/json/drafts", "/json/register")
+    ])
+    assert set(stats) == {"/json/messages", "/json/events", "other"}
+    assert stats["other"].requests == 3
+
+
+def test_records_are_emf_histograms():
+    stats = latency_metrics.aggregate([_line("/json/messages", 0.012), _line("/json/messages", 0.2)])
+    (record,) = latency_metrics.build_records(stats, {"AutoScalingGroupName": "zulip-Asg"})
+
+    assert record["Route"] == "/json/messages"
+    assert record["RequestLatency"] == {"Values": [15, 200], "Counts": [1, 1]}
+    assert record["RequestCount"] == 2
+    metrics = record["_aws"]["CloudWatchMetrics"][0]
+    assert metrics["Dimensions"] == [["AutoScalingGroupName", "Route"], ["Route"]]
+    assert {"Name": "RequestLatency", "Unit": "Milliseconds"} in metrics["Metrics"]
+    assert len(latency_metrics.BUCKETS_MS) <= 100
+
+
+def test_read_new_lines_resumes_and_handles_rotation(tmp_path):
+    log = tmp_path / "access.json.log"
+    log.write_text("one\ntwo\nparti")
+
+    lines, position = latency_metrics.read_new_lines(str(log), (0, 0))
+    assert lines == ["one", "two"]
+
+    with open(log, "a") as f:
+        f.write("al\nthree\n")
+    lines, position = latency_metrics.read_new_lines(str(log), position)
+    assert lines == ["partial", "three"]
+
+    log.unlink()
+    log.write_text("rotated\n")
+    lines, _ = latency_metrics.read_new_lines(str(log), (position[0] + 1, position[1]))
+    assert lines == ["rotated"]
@@ -0,0 +1,47 @@
+"""
+Tornado long-polls in flight, published as a per-instance load metric.
+"""
+
+import json
+
+from zulip_bootstrap import load_metrics
+
+
+def _line(method, uri, request_time, status=200):
+    return json.dumps({"method": method, "uri": uri, "status": status, "request_time": request_time})
+
+
+def test_averages_open_long_polls_over_the_interval():
+    lines = [
+        _line("GET", "/json/events?queue_id=1:abc&last_event_id=4", "50.000"),
+        _line("GET", "/api/v1/events?queue_id=2:def", "40.000"),
+        _line("GET", "/json/events/", "30.000"),
+    ]
+    # 120s spent open over a 60s interval: two long-polls on average
+    assert load_metrics.in_flight_long_polls(lines, 60) == 2.0
+
+
+def test_other_requests_are_ignored():
+    lines = [
+        _line("DELETE", "/json/events?queue_id=1:abc", "0.004"),
+        _line("POST", "/json/register", "0.250"),
+        _line("GET", "/json/messages", "0.120"),
+        _line("GET", "/static/webpack-bundles/app.js", "0.001"),
+        "not json",
+        json.dumps({"method": "GET", "uri": "/json/events", "request_time": "-"}),
+        _line("GET", "/json/events", "6.000"),
+    ]
+    assert load_metrics.in_flight_long_polls(lines, 60) == 0.1
+
+
+def test_no_interval_is_zero():
+    assert load_metrics.in_flight_long_polls([_line("GET", "/json/events", "50.000")], 0) == 0.0
+
+
+def test_record_is_per_autoscaling_group():
+    (record,) = load_metrics.build_records(41.96, {"AutoScalingGroupName": "zulip-Asg"}, "i-0abc")
+    metrics = record["_aws"]["CloudWatchMetrics"][0]
+    assert metrics["Dimensions"] == [["AutoScalingGroupName"]]
+    assert metrics["Metrics"] == [{"Name": "TornadoLongPollConnections", "Unit": "Count"}]
+    assert record["TornadoLongPollConnections"] == 42.0
+    assert record["InstanceId"] == "i-0abc"
@@ -0,0 +1,19 @@
+"""
+Local RabbitMQ and Redis started in single-node mode.
+"""
+
+import subprocess
+
+from zulip_bootstrap import local_services
+
+
+def test_start_enables_services_then_creates_rabbitmq_user(monkeypatch):
+    calls = []
+    monkeypatch.setattr(subprocess, "run", lambda cmd, **kwargs: calls.append((cmd, kwargs)))
+
+    local_services.start()
+
+    assert calls == [
+        (["systemctl", "enable", "--now", "rabbitmq-server", "redis-server"], {"check": True}),
+        ([local_services.CONFIGURE_RABBITMQ], {"check": True}),
+    ]
@@ -0,0 +1,79 @@
+"""
+Sizing of the instance-local memcached.
+"""
+
+import subprocess
+
+import pytest
+
+from zulip_bootstrap import memcached, process_model
+from zulip_bootstrap.process_model import ProcessModel
+
+DEBIAN_CONF = """\
+# memcached default config file
+-d
+logfile /var/log/memcached.log
+-m 64
+-p 11211
+-u memcache
+-l 127.0.0.1
+# -c 1024
+-P /var/run/memcached/memcached.pid
+"""
+
+
+class TestSize:
+
+    def test_small_instance_keeps_debian_floor(self):
+        cache = memcached.size(2, 400, ProcessModel(2, False))
+        assert cache.memory_mb == memcached.MIN_MEMORY_MB
+        assert cache.max_connections == memcached.MIN_CONNECTIONS
+        assert cache.threads == memcached.MIN_THREADS
+
+    def test_memory_is_an_eighth_of_the_instance(self):
+        assert memcached.size(4, 15400, ProcessModel(12, True)).memory_mb == 15400 // 8
+
+    def test_connections_follow_worker_count(self):
+        cache = memcached.size(64, 262144, ProcessModel(300, True), tornado_processes=16)
+        clients = 300 + 16 + memcached.QUEUE_WORKER_PROCESSES_MULTIPROCESS
+        assert cache.max_connections == clients * memcached.CONNECTIONS_PER_CLIENT
+        assert cache.memory_mb == memcached.MAX_MEMORY_MB
+        assert cache.threads == memcached.MAX_THREADS
+
+    def test_process_model_budgets_for_the_cache(self):
+        without = process_model.plan(8, 4096)
+        with_cache = process_model.plan(8, 4096, memcached_mb=memcached.memory_mb(4096))
+        assert with_cache.uwsgi_processes < without.uwsgi_processes
+
+
+class TestApply:
+
+    @pytest.fixture
+    def commands(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(subprocess, "run", lambda cmd, **kwargs: calls.append(cmd))
+        return calls
+
+    def test_rewrites_debian_conf_and_restarts(self, tmp_path, commands):
+        conf = tmp_path / "memcached.conf"
+        conf.write_text(DEBIAN_CONF)
+
+        assert memcached.apply(memcached.MemcachedSize(1925, 2048, 4), str(conf))
+
+        lines = conf.read_text().splitlines()
+        assert "-m 1925" in lines
+        assert "-c 2048" in lines
+        assert "-t 4" in lines
+        assert "-m 64" not in lines
+        assert "-l 127.0.0.1" in lines
+        assert commands == [["systemctl", "restart", "memcached"]]
+
+    def test_unchanged_conf_is_not_restarted(self, tmp_path, commands):
+        conf = tmp_path / "memcached.conf"
+        conf.write_text(DEBIAN_CONF)
+        size = memcached.MemcachedSize(1925, 2048, 4)
+        memcached.apply(size, str(conf))
+        commands.clear()
+
+        assert not memcached.apply(size, str(conf))
+        assert commands == []
@@ -0,0 +1,121 @@
+"""
+nginx performance profile applied on top of Zulip's puppet-rendered config.
+"""
+
+import subprocess
+
+import pytest
+
+from zulip_bootstrap import nginx
+
+NGINX_CONF = """\
+user zulip;
+worker_processes auto;
+pid /run/nginx.pid;
+
+events {
+    worker_connections 10000;
+    use epoll;
+}
+
+http {
+    include /etc/nginx/conf.d/*.conf;
+}
+"""
+
+
+@pytest.fixture
+def etc(tmp_path):
+    (tmp_path / "conf.d").mkdir()
+    (tmp_path / "nginx.conf").write_text(NGINX_CONF)
+    return tmp_path
+
+
+def _nginx_t(monkeypatch, *returncodes):
+    """Answer successive `nginx -t` runs with `returncodes`."""
+    calls = []
+
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, returncodes[len(calls) - 1], "", "duplicate directive")
+
+    monkeypatch.setattr(nginx.subprocess, "run", run)
+    return calls
+
+
+def test_tune_main_sizes_workers_to_instance():
+    tuned = nginx.tune_main(NGINX_CONF, 8, nginx.PROFILES["aggressive"])
+    assert "worker_processes 8;" in tuned
+    assert "    worker_connections 16384;" in tuned
+    assert "worker_rlimit_nofile 32768;" in tuned
+    assert "use epoll;" in tuned
+
+
+def test_tune_main_keeps_connections_within_file_limit():
+    tuned = nginx.tune_main(NGINX_CONF, 64, nginx.PROFILES["aggressive"])
+    assert "worker_connections 8192;" in tuned
+
+
+@pytest.mark.parametrize("profile", sorted(nginx.PROFILES))
+def test_drop_in_serves_precompressed_assets(profile):
+    drop_in = nginx.render_drop_in(nginx.PROFILES[profile])
+    assert "gzip_static on;" in drop_in
+    assert "brotli_static on;" in drop_in
+    assert "open_file_cache max=" in drop_in
+    assert all(line.startswith("#") or line.endswith((";", "{", "}", "'")) for line in drop_in.splitlines())
+
+
+def test_logging_drop_in_logs_s3_cache_status():
+    drop_in = nginx.render_logging_drop_in()
+    assert "$upstream_cache_status" in drop_in
+    assert f"access_log {nginx.S3_CACHE_LOG} zulip_s3_cache if=$zulip_s3_cache_loggable;" in drop_in
+    assert f"access_log {nginx.JSON_ACCESS_LOG} zulip_json;" in drop_in
+    assert "access_log" not in nginx.render_drop_in(nginx.PROFILES["conservative"])
+
+
+def _apply(etc, profile):
+    return nginx.apply(
+        profile,
+        2,
+        str(etc / "nginx.conf"),
+        str(etc / "conf.d" / "zulip-performance.conf"),
+        str(etc / "conf.d" / "zulip-logging.conf"),
+    )
+
+
+def test_apply_keeps_config_nginx_accepts(etc, monkeypatch):
+    calls = _nginx_t(monkeypatch, 0)
+
+    assert _apply(etc, "conservative")
+
+    assert calls == [["nginx", "-t"]]
+    assert "worker_processes 2;" in (etc / "nginx.conf").read_text()
+    assert (etc / "conf.d" / "zulip-performance.conf").exists()
+    assert (etc / "conf.d" / "zulip-logging.conf").exists()
+    assert not (etc / "nginx.conf.zulip-bootstrap").exists()
+
+
+def test_apply_rolls_back_tuning_but_keeps_logs(etc, monkeypatch):
+    calls = _nginx_t(monkeypatch, 1, 0)
+
+    assert not _apply(etc, "aggressive")
+
+    assert len(calls) == 2
+    assert (etc / "nginx.conf").read_text() == NGINX_CONF
+    assert not (etc / "conf.d" / "zulip-performance.conf").exists()
+    assert (etc / "conf.d" / "zulip-logging.conf").exists()
+
+
+def test_apply_removes_logs_nginx_still_rejects(etc, monkeypatch):
+    _nginx_t(monkeypatch, 1, 1)
+
+    assert not _apply(etc, "aggressive")
+
+    assert (etc / "nginx.conf").read_text() == NGINX_CONF
+    assert not (etc / "conf.d" / "zulip-performance.conf").exists()
+    assert not (etc / "conf.d" / "zulip-logging.conf").exists()
+
+
+def test_apply_rejects_unknown_profile(etc):
+    with pytest.raises(ValueError):
+        _apply(etc, "turbo")
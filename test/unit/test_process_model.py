@@ -0,0 +1,95 @@
+"""
+Sizing of the uwsgi and queue worker process model, and re-applying puppet when it changes.
+"""
+
+import subprocess
+
+import pytest
+
+from zulip_bootstrap import process_model, puppet
+
+
+class TestPlan:
+
+    def test_small_instance_is_threaded_with_minimum_uwsgi(self):
+        # t3.small: 2 vCPUs, ~1.9 GiB
+        model = process_model.plan(2, 1900)
+        assert not model.queue_workers_multiprocess
+        assert model.uwsgi_processes == process_model.MIN_UWSGI_PROCESSES
+
+    def test_large_instance_is_multiprocess_and_cpu_bound(self):
+        # m5.xlarge: 4 vCPUs, ~15.4 GiB
+        model = process_model.plan(4, 15400)
+        assert model.queue_workers_multiprocess
+        assert model.uwsgi_processes == 4 * process_model.UWSGI_PROCESSES_PER_VCPU
+
+    def test_memory_bound_instance(self):
+        # c5.2xlarge-like: 8 vCPUs, 4 GiB
+        model = process_model.plan(8, 4096)
+        assert model.queue_workers_multiprocess
+        budget = 4096 - process_model.RESERVED_MB - process_model.TORNADO_MB - process_model.QUEUE_WORKERS_MULTIPROCESS_MB
+        assert model.uwsgi_processes == budget // process_model.UWSGI_WORKER_MB
+
+    def test_uwsgi_is_capped(self):
+        assert process_model.plan(96, 393216).uwsgi_processes == process_model.MAX_UWSGI_PROCESSES
+
+    def test_overrides_win(self):
+        model = process_model.plan(2, 1900, uwsgi_processes=10, queue_workers_mode="multiprocess")
+        assert model.uwsgi_processes == 10
+        assert model.queue_workers_multiprocess
+
+    def test_web_tier_without_queue_workers_gets_their_memory(self):
+        shared = process_model.plan(4, 4096)
+        web_only = process_model.plan(4, 4096, queue_workers=False)
+        assert not web_only.queue_workers_multiprocess
+        assert web_only.uwsgi_processes > shared.uwsgi_processes
+
+    def test_queue_worker_tier_goes_multiprocess_on_small_instances(self):
+        # too small for multiprocess workers next to a web tier
+        assert not process_model.plan(2, 3000).queue_workers_multiprocess
+        assert process_model.plan(2, 3000, web=False).queue_workers_multiprocess
+
+    def test_single_node_reserves_memory_for_local_services(self):
+        managed = process_model.plan(8, 4096, queue_workers_mode="threaded")
+        local = process_model.plan(8, 4096, queue_workers_mode="threaded", local_services=True)
+        assert local.uwsgi_processes < managed.uwsgi_processes
+
+    def test_rejects_unknown_mode(self):
+        with pytest.raises(ValueError):
+            process_model.plan(2, 4096, queue_workers_mode="forked")
+
+    def test_detect_reads_meminfo(self, tmp_path):
+        meminfo = tmp_path / "meminfo"
+        meminfo.write_text("MemTotal:        8039872 kB\nMemFree:         1234 kB\n")
+        vcpus, mem_mb = process_model.detect(str(meminfo))
+        assert vcpus >= 1
+        assert mem_mb == 7851
+
+
+class TestPuppetApply:
+
+    @pytest.fixture
+    def commands(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(subprocess, "run", lambda cmd, **kwargs: calls.append(cmd))
+        return calls
+
+    def test_skips_when_only_formatting_changed(self, tmp_path, commands):
+        conf = tmp_path / "zulip.conf"
+        applied = tmp_path / "zulip.conf.applied"
+        conf.write_text("[machine]\ndeploy_type = production\n")
+        applied.write_text("[machine]\ndeploy_type=production\n\n")
+
+        assert not puppet.apply_if_changed(str(conf), str(applied))
+        assert commands == []
+
+    def test_applies_and_records_changes(self, tmp_path, commands):
+        conf = tmp_path / "zulip.conf"
+        applied = tmp_path / "zulip.conf.applied"
+        conf.write_text("[application_server]\nuwsgi_processes = 8\n")
+        applied.write_text("[application_server]\nuwsgi_processes = 4\n")
+
+        assert puppet.apply_if_changed(str(conf), str(applied))
+        assert commands == [[puppet.PUPPET_APPLY, "-f"], ["systemctl", "stop", "supervisor"]]
+        assert applied.read_text() == conf.read_text()
+        assert not puppet.apply_if_changed(str(conf), str(applied))
@@ -0,0 +1,169 @@
+"""
+Readiness prober used before cfn-signal.
+"""
+
+import socket
+import subprocess
+import threading
+
+import pytest
+
+from zulip_bootstrap import readiness, roles
+
+
+@pytest.fixture
+def tcp_server():
+    """Start a one-shot TCP server that answers the first read with `reply`."""
+    servers = []
+
+    def start(reply):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+
+        def serve():
+            connection, _ = listener.accept()
+            with connection:
+                connection.recv(64)
+                connection.sendall(reply)
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        servers.append((listener, thread))
+        return listener.getsockname()[1]
+
+    yield start
+    for listener, thread in servers:
+        thread.join(timeout=1)
+        listener.close()
+
+
+class TestComponentChecks:
+
+    def test_postgres(self, tcp_server):
+        port = tcp_server(b"S")
+        assert readiness.check_postgres("127.0.0.1", port)[0]
+
+    def test_redis_pong_and_noauth(self, tcp_server):
+        assert readiness.check_redis("127.0.0.1", tcp_server(b"+PONG\r\n"))[0]
+        assert readiness.check_redis("127.0.0.1", tcp_server(b"-NOAUTH Authentication required.\r\n"))[0]
+        assert not readiness.check_redis("127.0.0.1", tcp_server(b"-LOADING\r\n"))[0]
+
+    def test_memcached_version(self, tcp_server):
+        assert readiness.check_memcached("127.0.0.1", tcp_server(b"VERSION 1.6.22\r\n")) == (True, "VERSION 1.6.22")
+        assert not readiness.check_memcached("127.0.0.1", tcp_server(b"ERROR\r\n"))[0]
+
+    def test_default_checks_cover_every_memcached_node(self):
+        checks = readiness.default_checks(
+            "zulip.example.com", "db", "redis", "mq",
+            memcached_location="m1.cache:11211,m2.cache:11211",
+        )
+        assert [c.name for c in checks if c.name.startswith("memcached")] == ["memcached:m1.cache", "memcached:m2.cache"]
+
+    def test_rabbitmq_handshake(self, tcp_server):
+        port = tcp_server(b"\x01\x00\x00")
+        assert readiness.check_rabbitmq("127.0.0.1", port, use_tls=False)[0]
+
+    def test_refused_connection_is_reported(self):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        ok, detail = readiness._run(readiness.Check("postgres", lambda: readiness.check_postgres("127.0.0.1", port)))
+        assert not ok
+        assert "ConnectionRefusedError" in detail
+
+    def test_supervisor_reports_programs_not_running(self, monkeypatch):
+        output = (
+            "zulip-django                     RUNNING   pid 100, uptime 0:00:05\n"
+            "zulip-tornado                    STARTING\n"
+            "zulip-workers:zulip_events_email BACKOFF   Exited too quickly\n"
+        )
+        monkeypatch.setattr(
+            subprocess, "run",
+            lambda *args, **kwargs: subprocess.CompletedProcess(args, 3, stdout=output, stderr=""),
+        )
+        ok, detail = readiness.check_supervisor()
+        assert not ok
+        assert detail == "zulip-tornado=STARTING, zulip-workers:zulip_events_email=BACKOFF"
+
+    @pytest.mark.parametrize("role,status", [
+        (roles.WEB, (
+            "zulip-django                                       RUNNING   pid 100, uptime 0:00:05\n"
+            "zulip-tornado                                      RUNNING   pid 101, uptime 0:00:05\n"
+            "zulip-workers:zulip_events_email_senders           STOPPED   Not started\n"
+            "zulip-workers:zulip_events_embed_links             STOPPED   Not started\n"
+        )),
+        (roles.QUEUE_WORKER, (
+            "zulip-django                                       STOPPED   Not started\n"
+            "zulip-tornado                                      STOPPED   Not started\n"
+            "zulip-workers:zulip_events_email_senders           RUNNING   pid 102, uptime 0:00:05\n"
+            "zulip-workers:zulip_events_embed_links             RUNNING   pid 103, uptime 0:00:05\n"
+        )),
+    ])
+    def test_supervisor_skips_programs_the_role_disabled(self, monkeypatch, tmp_path, role, status):
+        from test_roles import SUPERVISOR_CONF
+        (tmp_path / "zulip.conf").write_text(SUPERVISOR_CONF)
+        disabled = roles.apply(role, True, str(tmp_path / "*.conf"))
+        monkeypatch.setattr(
+            subprocess, "run",
+            lambda *args, **kwargs: subprocess.CompletedProcess(args, 3, stdout=status, stderr=""),
+        )
+
+        assert readiness.check_supervisor(disabled) == (True, "2 programs running")
+        ok, detail = readiness.check_supervisor()
+        assert not ok
+        assert "STOPPED" in detail
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestWaitUntilReady:
+
+    def test_returns_as_soon_as_everything_is_healthy(self):
+        clock = FakeClock()
+        attempts = {"n": 0}
+
+        def django():
+            attempts["n"] += 1
+            return (attempts["n"] >= 3, f"attempt {attempts['n']}")
+
+        checks = [
+            readiness.Check("django", django),
+            readiness.Check("redis", lambda: (True, "+PONG")),
+        ]
+        ready, results = readiness.wait_until_ready(checks, clock=clock, sleep=clock.sleep)
+
+        assert ready
+        assert results["django"] == (True, "attempt 3")
+        assert clock.sleeps == [0.5, 1.0]
+
+    def test_backoff_is_capped_and_deadline_respected(self, caplog):
+        clock = FakeClock()
+        checks = [readiness.Check("rabbitmq", lambda: (False, "connection refused"))]
+
+        ready, results = readiness.wait_until_ready(checks, deadline_seconds=30, clock=clock, sleep=clock.sleep)
+
+        assert not ready
+        assert max(clock.sleeps) == readiness.MAX_DELAY_SECONDS
+        assert clock.now <= 30
+        assert "still waiting on rabbitmq: connection refused" in caplog.text
+
+    def test_check_exceptions_count_as_not_ready(self):
+        def broken():
+            raise OSError("no route to host")
+
+        results = readiness.probe_once([readiness.Check("postgres", broken)])
+        assert results["postgres"] == (False, "OSError: no route to host")
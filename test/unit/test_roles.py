@@ -0,0 +1,73 @@
+"""
+Splitting web and queue-worker programs between the two Auto Scaling groups.
+"""
+
+from zulip_bootstrap import roles
+
+SUPERVISOR_CONF = """\
+[program:zulip-django]
+command=/home/zulip/deployments/current/manage.py runserver
+autostart=true
+autorestart=true
+
+[program:zulip-tornado]
+command=/home/zulip/deployments/current/manage.py runtornado 9800
+
+[program:zulip_events_email_senders]
+command=/home/zulip/deployments/current/manage.py process_queue --queue_name=email_senders
+autostart=true
+
+[program:zulip_events_embed_links]
+command=/home/zulip/deployments/current/manage.py process_queue --queue_name=embed_links
+
+[group:zulip-workers]
+programs=zulip_events_email_senders,zulip_events_embed_links
+"""
+
+
+def _write(tmp_path):
+    path = tmp_path / "zulip.conf"
+    path.write_text(SUPERVISOR_CONF)
+    return path
+
+
+def _autostart(contents, program):
+    section = contents.split(f"[program:{program}]\n", 1)[1].split("\n[", 1)[0]
+    return [line for line in section.splitlines() if line.startswith("autostart")]
+
+
+def test_resolve_defaults_to_web():
+    assert roles.resolve(lambda key: None) == roles.WEB
+    assert roles.resolve(lambda key: "bogus") == roles.WEB
+    assert roles.resolve({roles.ROLE_TAG: "queue_worker"}.get) == roles.QUEUE_WORKER
+
+
+def test_web_keeps_everything_without_a_queue_worker_tier(tmp_path):
+    path = _write(tmp_path)
+    assert roles.apply(roles.WEB, False, str(tmp_path / "*.conf")) == set()
+    assert path.read_text() == SUPERVISOR_CONF
+
+
+def test_web_disables_queue_workers(tmp_path):
+    path = _write(tmp_path)
+    disabled = roles.apply(roles.WEB, True, str(tmp_path / "*.conf"))
+
+    contents = path.read_text()
+    assert disabled == {"zulip_events_email_senders", "zulip_events_embed_links"}
+    assert _autostart(contents, "zulip_events_email_senders") == ["autostart=false"]
+    assert _autostart(contents, "zulip_events_embed_links") == ["autostart=false"]
+    assert _autostart(contents, "zulip-django") == ["autostart=true"]
+
+
+def test_queue_worker_disables_django_and_tornado(tmp_path):
+    path = _write(tmp_path)
+    disabled = roles.apply(roles.QUEUE_WORKER, True, str(tmp_path / "*.conf"))
+
+    contents = path.read_text()
+    assert disabled == {"zulip-django", "zulip-tornado"}
+    assert _autostart(contents, "zulip-django") == ["autostart=false"]
+    assert _autostart(contents, "zulip-tornado") == ["autostart=false"]
+    assert _autostart(contents, "zulip_events_email_senders") == ["autostart=true"]
+    # idempotent across reboots
+    roles.apply(roles.QUEUE_WORKER, True, str(tmp_path / "*.conf"))
+    assert path.read_text() == contents
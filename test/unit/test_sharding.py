@@ -0,0 +1,43 @@
+"""
+Assignment of realms to Tornado shards.
+"""
+
+import re
+import string
+
+import pytest
+
+from zulip_bootstrap import sharding
+
+
+@pytest.mark.parametrize("shards", [2, 3, 5, 16])
+def test_every_subdomain_lands_on_exactly_one_shard(shards):
+    section = sharding.sharding_section("chat.example.com", shards)
+    regexes = {key: value for key, value in section.items() if key.endswith("_regex")}
+    assert sorted(int(key[:-len("_regex")]) for key in regexes) == sharding.ports(shards)
+
+    for first in string.digits + string.ascii_lowercase:
+        host = f"{first}team.chat.example.com"
+        matches = [key for key, regex in regexes.items() if re.match(regex, host)]
+        assert len(matches) == 1, host
+    assert not any(re.match(regex, "chat.example.com") for regex in regexes.values())
+    assert section["9800"] == "chat.example.com"
+
+
+def test_single_shard_leaves_zulip_defaults():
+    assert sharding.sharding_section("chat.example.com", 1) == {}
+
+
+def test_rejects_out_of_range():
+    with pytest.raises(ValueError):
+        sharding.sharding_section("chat.example.com", sharding.MAX_SHARDS + 1)
+
+
+def test_promote_staged(tmp_path):
+    (tmp_path / "nginx_sharding_map.conf").write_text("old")
+    (tmp_path / "nginx_sharding_map.conf.tmp").write_text("new")
+
+    assert sharding.promote_staged(str(tmp_path))
+    assert (tmp_path / "nginx_sharding_map.conf").read_text() == "new"
+    assert not (tmp_path / "nginx_sharding_map.conf.tmp").exists()
+    assert not sharding.promote_staged(str(tmp_path))
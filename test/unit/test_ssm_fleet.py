@@ -0,0 +1,210 @@
+"""
+SSM fleet runner: ASG instance discovery, backoff polling, and full output from S3.
+"""
+
+import datetime
+import io
+
+import boto3
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+import ssm_fleet
+
+STACK = "oe-patterns-zulip-test"
+COMMAND_ID = "11111111-2222-3333-4444-555555555555"
+BUCKET = "assets-bucket"
+COMMANDS = ["sudo -u zulip /home/zulip/deployments/current/manage.py list_realms"]
+STARTED = datetime.datetime(2026, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
+
+
+def _client(service):
+    return boto3.client(
+        service,
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+
+
+def _stubbed(service):
+    client = _client(service)
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture
+def ssm():
+    yield from _stubbed("ssm")
+
+
+@pytest.fixture
+def s3():
+    yield from _stubbed("s3")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time: sleeps advance the clock instantly and are recorded."""
+    class Clock:
+        def __init__(self):
+            self.now = 0.0
+            self.sleeps = []
+
+        def monotonic(self):
+            return self.now
+
+        def sleep(self, seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+    fake = Clock()
+    monkeypatch.setattr(ssm_fleet, "time", fake)
+    return fake
+
+
+def _send_command(stub, instance_ids, output_bucket=None, timeout=600):
+    expected = {
+        "InstanceIds": instance_ids,
+        "DocumentName": "AWS-RunShellScript",
+        "Parameters": {"commands": COMMANDS, "executionTimeout": [str(timeout)]},
+        "MaxConcurrency": "100%",
+        "MaxErrors": "100%",
+    }
+    if output_bucket:
+        expected.update(OutputS3BucketName=output_bucket, OutputS3KeyPrefix="ssm-output")
+    stub.add_response("send_command", {"Command": {"CommandId": COMMAND_ID}}, expected)
+
+
+def _invocation(instance_id, status, response_code=0, seconds=2):
+    invocation = {"InstanceId": instance_id, "CommandId": COMMAND_ID, "Status": status}
+    if status in ssm_fleet.TERMINAL_STATUSES:
+        invocation["CommandPlugins"] = [{
+            "Name": "aws:runShellScript",
+            "ResponseCode": response_code,
+            "ResponseStartDateTime": STARTED,
+            "ResponseFinishDateTime": STARTED + datetime.timedelta(seconds=seconds),
+        }]
+    return invocation
+
+
+def _list(stub, *invocations):
+    stub.add_response(
+        "list_command_invocations",
+        {"CommandInvocations": list(invocations)},
+        {"CommandId": COMMAND_ID, "Details": True},
+    )
+
+
+def _output(stub, instance_id, stdout, stderr=None):
+    key = f"ssm-output/{COMMAND_ID}/{instance_id}/awsrunShellScript/0.awsrunShellScript"
+    stub.add_response("get_object", {"Body": StreamingBody(io.BytesIO(stdout), len(stdout))},
+                      {"Bucket": BUCKET, "Key": f"{key}/stdout"})
+    if stderr is None:
+        stub.add_client_error("get_object", "NoSuchKey", http_status_code=404,
+                              expected_params={"Bucket": BUCKET, "Key": f"{key}/stderr"})
+    else:
+        stub.add_response("get_object", {"Body": StreamingBody(io.BytesIO(stderr), len(stderr))},
+                          {"Bucket": BUCKET, "Key": f"{key}/stderr"})
+    stub.add_response("delete_objects", {}, {"Bucket": BUCKET, "Delete": {
+        "Objects": [{"Key": f"{key}/stdout"}, {"Key": f"{key}/stderr"}],
+        "Quiet": True,
+    }})
+
+
+class TestAsgInstanceIds:
+
+    def test_in_service_instances_of_present_groups(self):
+        cloudformation, autoscaling = _client("cloudformation"), _client("autoscaling")
+        with Stubber(cloudformation) as cfn_stub, Stubber(autoscaling) as asg_stub:
+            cfn_stub.add_response("describe_stack_resource", {"StackResourceDetail": {
+                "LogicalResourceId": "Asg",
+                "PhysicalResourceId": "zulip-Asg-ABC",
+                "ResourceType": "AWS::AutoScaling::AutoScalingGroup",
+                "LastUpdatedTimestamp": STARTED,
+                "ResourceStatus": "CREATE_COMPLETE",
+            }}, {"StackName": STACK, "LogicalResourceId": "Asg"})
+            cfn_stub.add_client_error("describe_stack_resource", "ValidationError",
+                                      expected_params={"StackName": STACK, "LogicalResourceId": "QueueWorkerAsg"})
+            asg_stub.add_response("describe_auto_scaling_groups", {"AutoScalingGroups": [{
+                "AutoScalingGroupName": "zulip-Asg-ABC",
+                "MinSize": 1,
+                "MaxSize": 3,
+                "DesiredCapacity": 3,
+                "DefaultCooldown": 300,
+                "AvailabilityZones": ["us-east-1a"],
+                "HealthCheckType": "ELB",
+                "CreatedTime": STARTED,
+                "Instances": [
+                    {"InstanceId": f"i-{name}", "AvailabilityZone": "us-east-1a", "LifecycleState": state,
+                     "HealthStatus": "Healthy", "ProtectedFromScaleIn": False}
+                    for name, state in [("b", "InService"), ("a", "InService"), ("c", "Terminating")]
+                ],
+            }]}, {"AutoScalingGroupNames": ["zulip-Asg-ABC"]})
+
+            assert ssm_fleet.asg_instance_ids(
+                cloudformation, autoscaling, STACK, [ssm_fleet.APP_ASG, ssm_fleet.QUEUE_WORKER_ASG]
+            ) == ["i-a", "i-b"]
+
+
+class TestRun:
+
+    def test_fans_out_and_reads_full_output_from_s3(self, ssm, s3, clock):
+        ssm_client, ssm_stub = ssm
+        s3_client, s3_stub = s3
+        long_output = b"realm\n" * 10000  # past the 24,000 character console limit
+        _send_command(ssm_stub, ["i-a", "i-b"], output_bucket=BUCKET)
+        # not listed yet right after sending
+        _list(ssm_stub)
+        _list(ssm_stub, _invocation("i-a", "Success", seconds=3), _invocation("i-b", "InProgress"))
+        _output(s3_stub, "i-a", long_output)
+        _list(ssm_stub, _invocation("i-a", "Success"), _invocation("i-b", "Failed", response_code=1))
+        _output(s3_stub, "i-b", b"", b"Traceback\n")
+
+        fleet = ssm_fleet.run(ssm_client, ["i-a", "i-b"], COMMANDS, s3=s3_client, output_bucket=BUCKET,
+                              output_workers=1)
+
+        assert fleet.command_id == COMMAND_ID
+        assert not fleet.ok
+        assert fleet.results["i-a"].stdout == long_output.decode()
+        assert fleet.results["i-a"].stderr == ""
+        assert fleet.results["i-a"].execution_seconds == 3
+        assert fleet.results["i-a"].wall_seconds == pytest.approx(0.5 + 0.75)
+        assert [result.instance_id for result in fleet.failed()] == ["i-b"]
+        assert fleet.results["i-b"].response_code == 1
+        assert fleet.results["i-b"].stderr == "Traceback\n"
+
+    def test_backoff_is_capped(self, ssm, clock):
+        ssm_client, ssm_stub = ssm
+        _send_command(ssm_stub, ["i-a"])
+        for _ in range(7):
+            _list(ssm_stub, _invocation("i-a", "InProgress"))
+        _list(ssm_stub, _invocation("i-a", "Success"))
+        ssm_stub.add_response("get_command_invocation", {
+            "StandardOutputContent": "ok\n",
+            "StandardErrorContent": "",
+        }, {"CommandId": COMMAND_ID, "InstanceId": "i-a"})
+
+        fleet = ssm_fleet.run(ssm_client, ["i-a"], COMMANDS)
+
+        assert fleet.ok
+        assert fleet.results["i-a"].stdout == "ok\n"
+        assert clock.sleeps[:3] == [0.5, 0.75, 1.125]
+        assert max(clock.sleeps) == ssm_fleet.POLL_MAX_SECONDS
+
+    def test_cancels_instances_past_the_deadline(self, ssm, clock, monkeypatch):
+        ssm_client, ssm_stub = ssm
+        monkeypatch.setattr(ssm_fleet, "DELIVERY_GRACE_SECONDS", 0)
+        _send_command(ssm_stub, ["i-a", "i-b"], timeout=1)
+        _list(ssm_stub, _invocation("i-a", "Success"), _invocation("i-b", "InProgress"))
+        ssm_stub.add_response("get_command_invocation", {"StandardOutputContent": "done\n"},
+                              {"CommandId": COMMAND_ID, "InstanceId": "i-a"})
+        _list(ssm_stub, _invocation("i-a", "Success"), _invocation("i-b", "InProgress"))
+        ssm_stub.add_response("cancel_command", {}, {"CommandId": COMMAND_ID, "InstanceIds": ["i-b"]})
+
+        fleet = ssm_fleet.run(ssm_client, ["i-a", "i-b"], COMMANDS, timeout=1)
+
+        assert fleet.results["i-a"].ok
+        assert fleet.results["i-b"].status == "TimedOut"
@@ -0,0 +1,69 @@
+"""
+Placement and sizing of the nginx cache for uploads proxied from S3.
+"""
+
+import os
+import subprocess
+
+import pytest
+
+from zulip_bootstrap import uploads_cache
+
+
+@pytest.fixture
+def commands(monkeypatch):
+    calls = []
+    monkeypatch.setattr(subprocess, "run", lambda cmd, **kwargs: calls.append(cmd))
+    return calls
+
+
+def test_finds_instance_store_devices_without_partitions(tmp_path):
+    (tmp_path / "nvme1n1").touch()
+    (tmp_path / "nvme2n1").touch()
+    by_id = tmp_path / "by-id"
+    by_id.mkdir()
+    os.symlink(tmp_path / "nvme2n1", by_id / "nvme-Amazon_EC2_NVMe_Instance_Storage_AWS2")
+    os.symlink(tmp_path / "nvme1n1", by_id / "nvme-Amazon_EC2_NVMe_Instance_Storage_AWS1")
+    os.symlink(tmp_path / "nvme1n1", by_id / "nvme-Amazon_EC2_NVMe_Instance_Storage_AWS1_1")
+    os.symlink(tmp_path / "nvme1n1", by_id / "nvme-Amazon_EC2_NVMe_Instance_Storage_AWS1-part1")
+
+    devices = uploads_cache.instance_store_devices(str(by_id / "nvme-Amazon_EC2_NVMe_Instance_Storage_*"))
+
+    assert devices == [str(tmp_path / "nvme1n1"), str(tmp_path / "nvme2n1")]
+
+
+def test_mounts_first_instance_store_device(tmp_path, commands):
+    cache_dir = str(tmp_path / "cache")
+
+    assert uploads_cache.prepare("auto", cache_dir, ["/dev/nvme1n1", "/dev/nvme2n1"]) == "/dev/nvme1n1"
+
+    assert commands == [
+        ["mkfs.ext4", "-q", "-F", "-L", "zulip-cache", "/dev/nvme1n1"],
+        ["mount", "-o", "noatime", "/dev/nvme1n1", cache_dir],
+        ["chown", "zulip:zulip", cache_dir],
+    ]
+
+
+@pytest.mark.parametrize("placement, devices", [("auto", []), ("root-volume", ["/dev/nvme1n1"])])
+def test_stays_on_root_volume(tmp_path, commands, placement, devices):
+    assert uploads_cache.prepare(placement, str(tmp_path / "cache"), devices) is None
+    assert commands == []
+
+
+def test_rejects_unknown_placement(tmp_path):
+    with pytest.raises(ValueError):
+        uploads_cache.prepare("tmpfs", str(tmp_path / "cache"), [])
+
+
+def test_size_is_capped_to_the_filesystem(tmp_path):
+    stat = os.statvfs(tmp_path)
+    capacity_mb = stat.f_blocks * stat.f_frsize // (1024 * 1024)
+
+    assert uploads_cache.disk_cache_mb(1, str(tmp_path / "missing" / "cache")) == min(1024, int(capacity_mb * 0.8))
+    assert uploads_cache.disk_cache_mb(10 ** 6, str(tmp_path)) == int(capacity_mb * uploads_cache.MAX_FILESYSTEM_FRACTION)
+
+
+def test_memory_cache_scales_with_disk_cache():
+    assert uploads_cache.memory_cache_mb(200) == 1
+    assert uploads_cache.memory_cache_mb(1024) == 1
+    assert uploads_cache.memory_cache_mb(10240) == 10